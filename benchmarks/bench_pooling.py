@@ -0,0 +1,57 @@
+"""
+Compares the cost of API calls made over fresh connections (the pre-pooling behaviour, one TCP handshake per call)
+against calls made over the client's pooled keep-alive connections. Runs against a local fake Pardot server, so no
+Pardot account is needed:
+
+    python -m benchmarks.bench_pooling --calls 2000
+"""
+import argparse
+import time
+
+import requests
+
+from pypardot.client import PardotAPI
+from pypardot.fake import FakePardot, FakePardotServer
+
+
+def run(label, call, calls):
+    start = time.time()
+    for _ in range(calls):
+        call()
+    elapsed = time.time() - start
+    print('{0:<28} {1:>8.1f} calls/s {2:>8.3f} ms/call'.format(label, calls / elapsed, 1000.0 * elapsed / calls))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=1000)
+    args = parser.parse_args()
+
+    fake = FakePardot()
+    fake.generate('prospect', 1)
+    server = FakePardotServer(fake).start()
+    base_uri = server.base_uri
+    url = '{0}/api/prospect/version/3/do/read/id/1'.format(base_uri)
+
+    login = PardotAPI('email', 'password', 'user_key', base_uri=base_uri)
+    login.authenticate()
+    headers = {'Authorization': 'Pardot api_key={0}, user_key=user_key'.format(login.api_key)}
+    run('module-level requests.post', lambda: requests.post(url, params={'format': 'json'}, headers=headers),
+        args.calls)
+
+    before = PardotAPI('email', 'password', 'user_key', base_uri=base_uri, keep_alive=False)
+    before_elapsed = run('client, keep_alive=False', lambda: before.prospects.read_by_id(id=1), args.calls)
+
+    after = PardotAPI('email', 'password', 'user_key', base_uri=base_uri)
+    after_elapsed = run('client, pooled', lambda: after.prospects.read_by_id(id=1), args.calls)
+
+    print('speedup from pooling: {0:.2f}x'.format(before_elapsed / after_elapsed))
+    before.close()
+    after.close()
+    login.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
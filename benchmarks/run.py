@@ -0,0 +1,432 @@
+"""
+Benchmark suite for the client: per-call overhead, pagination and batch throughput, concurrency scaling, the data
+saved by lighter query output formats, local mirror and snapshot lookups, and memory use per 100k records as dicts
+and as columns. Runs against pypardot.fake, so no Pardot account is needed, and writes its results as JSON so
+they can be kept and compared between releases:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --only overhead pagination
+    python -m benchmarks.run --compare baseline.json
+
+With --compare, metrics that got worse than the baseline by more than --threshold are listed and the exit status is
+1. Metric names say which way is better: rates (*_per_s, *_speedup) and savings (*_saved_*) should go up, times
+(*_us, *_ms) and sizes (*_bytes, *_mb) down.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from pypardot.client import PardotAPI
+from pypardot.columnar import read_columns
+from pypardot.fake import FakePardot, FakePardotServer, FakeResponse, FakeTransport
+from pypardot.hooks import RequestHook
+from pypardot.mirror import Mirror
+from pypardot.snapshot import Snapshot, write_snapshot
+from pypardot.paging import PAGE_SIZE
+
+
+class CannedTransport(object):
+    """Answers every request with the same pre-encoded body, so timings only include the client's own work."""
+
+    def __init__(self, body):
+        self.content = json.dumps(body).encode('utf-8')
+        self.headers = {'Content-Type': 'application/json'}
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        return FakeResponse(200, self.headers, self.content)
+
+    def close(self):
+        pass
+
+
+class SyntheticPagesTransport(object):
+    """
+    Serves a query over <total> prospects generated page by page on demand, so that large result sets can be read
+    without the fake holding them all in memory.
+    """
+
+    def __init__(self, total):
+        self.total = total
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        if '/api/login/' in url:
+            body = {'@attributes': {'stat': 'ok', 'version': 1}, 'api_key': 'synthetic'}
+        else:
+            first = int(params.get('id_greater_than', params.get('offset', 0))) + 1
+            last = min(self.total, first + int(params.get('limit', PAGE_SIZE)) - 1)
+            body = {'@attributes': {'stat': 'ok', 'version': 1},
+                    'result': {'total_results': self.total, 'prospect': [prospect(i) for i in range(first, last + 1)]}}
+        return FakeResponse(200, {'Content-Type': 'application/json'}, json.dumps(body).encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+def prospect(record_id):
+    """A prospect shaped like the ones Pardot returns from a query with the default (full) output."""
+    return {'id': record_id, 'email': 'prospect{0}@example.com'.format(record_id),
+            'first_name': 'First{0}'.format(record_id), 'last_name': 'Last{0}'.format(record_id),
+            'company': 'Company {0}'.format(record_id % 500), 'score': record_id % 300, 'grade': 'B',
+            'is_do_not_email': False, 'created_at': '2015-01-01 00:00:00', 'updated_at': '2015-01-01 00:00:00',
+            'campaign': {'id': record_id % 20, 'name': 'Campaign {0}'.format(record_id % 20)}}
+
+
+def ok(**fields):
+    body = {'@attributes': {'stat': 'ok', 'version': 1}}
+    body.update(fields)
+    return body
+
+
+def client(transport, **kwargs):
+    pardot = PardotAPI(email='email', password='password', user_key='user_key', transport=transport, **kwargs)
+    pardot.api_key = 'canned-api-key'
+    pardot.api_key_issued_at = time.time()
+    return pardot
+
+
+def best_time(function, number, repeat=5):
+    """Returns the fastest of <repeat> runs of <number> calls to <function>, in seconds per call."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_overhead(args):
+    """Time the client spends on a call, with the network taken out of the picture by a canned transport."""
+    number = 500 if args.quick else 5000
+    page = ok(result={'total_results': PAGE_SIZE, 'prospect': [prospect(i) for i in range(1, PAGE_SIZE + 1)]})
+    single = ok(result={'total_results': 1, 'prospect': prospect(1)})
+
+    read = client(CannedTransport(ok(prospect=prospect(1))))
+    query_page = client(CannedTransport(page))
+    query_single = client(CannedTransport(single))
+    page_content = query_page.transport.content
+
+    def build_request():
+        read._full_path('prospect', '/do/read/id/1')
+        return {'Authorization': 'Pardot api_key={}, user_key={}'.format(read.api_key, read.user_key)}
+
+    results = OrderedDict()
+    results['build_request_us'] = 1e6 * best_time(build_request, number)
+    results['read_call_us'] = 1e6 * best_time(lambda: read.prospects.read_by_id(id=1), number)
+    results['query_single_call_us'] = 1e6 * best_time(lambda: query_single.prospects.query(), number)
+    results['json_decode_page_us'] = 1e6 * best_time(lambda: json.loads(page_content), number // 10)
+    results['query_page_call_us'] = 1e6 * best_time(lambda: query_page.prospects.query(), number // 10)
+    results['query_page_overhead_us'] = max(0.0, results['query_page_call_us'] - results['json_decode_page_us'])
+    return results
+
+
+def bench_pagination(args):
+    """Records read per second by iter_query with offset and keyset paging, and with prefetching."""
+    records = 4000 if args.quick else 20000
+    fake = FakePardot()
+    fake.generate('prospect', records)
+    results = OrderedDict()
+    for name, latency, kwargs in (('offset', 0, {}), ('keyset', 0, {'keyset': True}),
+                                  ('keyset_latency', args.latency, {'keyset': True}),
+                                  ('keyset_prefetch_latency', args.latency, {'keyset': True, 'prefetch': True})):
+        fake.latency = latency
+        pardot = client(FakeTransport(fake))
+
+        def consume():
+            for record in pardot.prospects.iter_query(**kwargs):
+                # Stand-in for the caller's own per-record work, which prefetching overlaps with fetching.
+                if latency:
+                    time.sleep(args.latency / PAGE_SIZE)
+
+        start = time.perf_counter()
+        consume()
+        results['{0}_records_per_s'.format(name)] = records / (time.perf_counter() - start)
+    results['records'] = records
+    return results
+
+
+def bench_batch(args):
+    """Prospects upserted per second by batch_upsert, sequentially and with concurrent batches."""
+    count = 1000 if args.quick else 5000
+    results = OrderedDict()
+    for workers in (1, 4):
+        fake = FakePardot(latency=args.latency)
+        fake.generate('prospect', count // 2)
+        pardot = client(FakeTransport(fake))
+        prospects = [{'email': 'prospect{0}@example.com'.format(i), 'score': i} for i in range(1, count + 1)]
+        start = time.perf_counter()
+        upserted = pardot.prospects.batch_upsert(prospects, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        assert all(result['success'] for result in upserted)
+        results['workers_{0}_records_per_s'.format(workers)] = count / elapsed
+    results['records'] = count
+    return results
+
+
+def bench_concurrency(args):
+    """Calls per second against the fake over HTTP as the number of threads sharing one client grows."""
+    calls = 20 if args.quick else 100
+    fake = FakePardot(latency=args.latency)
+    fake.generate('prospect', 1)
+    results = OrderedDict()
+    with FakePardotServer(fake) as server:
+        pardot = PardotAPI(email='email', password='password', user_key='user_key', base_uri=server.base_uri,
+                           pool_maxsize=max(args.threads))
+        pardot.authenticate()
+        for threads in args.threads:
+            barrier = threading.Barrier(threads + 1)
+
+            def work():
+                barrier.wait()
+                for _ in range(calls):
+                    pardot.prospects.read_by_id(id=1)
+
+            workers = [threading.Thread(target=work) for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            results['threads_{0}_calls_per_s'.format(threads)] = threads * calls / (time.perf_counter() - start)
+        pardot.close()
+    results['threads_{0}_speedup'.format(max(args.threads))] = (
+        results['threads_{0}_calls_per_s'.format(max(args.threads))] /
+        results['threads_{0}_calls_per_s'.format(min(args.threads))])
+    return results
+
+
+class ResponseTotals(RequestHook):
+    """Adds up the response sizes and JSON decode times of the calls made by a client."""
+
+    def __init__(self):
+        self.response_bytes = 0
+        self.decode = 0.0
+
+    def on_request_end(self, event):
+        self.response_bytes += event.response_bytes
+        self.decode += event.decode or 0.0
+
+
+def bench_output(args):
+    """Bytes transferred, decode time and records per second of a full export with each query output format."""
+    records = 4000 if args.quick else 20000
+    fake = FakePardot()
+    fake.generate('prospect', records)
+    results = OrderedDict()
+    for name, kwargs in (('full', {}), ('simple', {'output': 'simple'}), ('bulk', {'output': 'bulk'}),
+                         ('bulk_fields', {'output': 'bulk', 'fields': ['email', 'score', 'updated_at']})):
+        totals = ResponseTotals()
+        pardot = client(FakeTransport(fake), hooks=[totals])
+        start = time.perf_counter()
+        count = sum(1 for _ in pardot.prospects.iter_query(keyset=True, **kwargs))
+        elapsed = time.perf_counter() - start
+        assert count == records
+        results['{0}_bytes_per_record'.format(name)] = totals.response_bytes / float(records)
+        results['{0}_decode_us_per_record'.format(name)] = 1e6 * totals.decode / records
+        results['{0}_records_per_s'.format(name)] = records / elapsed
+    results['bulk_fields_transfer_speedup'] = results['full_bytes_per_record'] / results['bulk_fields_bytes_per_record']
+    results['records'] = records
+    return results
+
+
+def bench_mirror(args):
+    """Time taken by reads and queries answered by a SQLite mirror, and by a refresh that finds one change."""
+    number = 1000 if args.quick else 10000
+    records = 2000 if args.quick else 20000
+    fake = FakePardot()
+    fake.generate('prospect', records)
+    pardot = client(FakeTransport(fake))
+    directory = tempfile.mkdtemp()
+    results = OrderedDict()
+    try:
+        mirror = Mirror(pardot, os.path.join(directory, 'mirror.db'), objects=['prospects'])
+        start = time.perf_counter()
+        mirror.refresh()
+        results['initial_refresh_records_per_s'] = records / (time.perf_counter() - start)
+        results['read_by_id_us'] = 1e6 * best_time(lambda: mirror.prospects.read_by_id(id=records // 2), number)
+        results['read_by_email_us'] = 1e6 * best_time(
+            lambda: mirror.prospects.read_by_email(email='prospect{0}@example.com'.format(records // 2)), number)
+        results['query_page_us'] = 1e6 * best_time(
+            lambda: mirror.prospects.query(id_greater_than=records // 2, output='bulk'), number // 10)
+        pardot.prospects.update_by_id(id=1, score=1)
+        start = time.perf_counter()
+        mirror.refresh()
+        results['incremental_refresh_ms'] = 1e3 * (time.perf_counter() - start)
+        assert mirror.misses == 0
+        mirror.close()
+    finally:
+        shutil.rmtree(directory)
+    results['records'] = records
+    return results
+
+
+def bench_snapshot(args):
+    """Size and write rate of a memory-mapped prospect snapshot, and the time taken by its id and email lookups."""
+    number = 2000 if args.quick else 20000
+    records = 20000 if args.quick else 100000
+    pardot = client(SyntheticPagesTransport(records))
+    directory = tempfile.mkdtemp()
+    results = OrderedDict()
+    try:
+        path = os.path.join(directory, 'prospects.snapshot')
+        start = time.perf_counter()
+        write_snapshot(path, pardot.prospects.iter_query(keyset=True))
+        results['write_records_per_s'] = records / (time.perf_counter() - start)
+        results['file_bytes_per_record'] = os.path.getsize(path) / float(records)
+        with Snapshot(path) as snapshot:
+            results['by_id_us'] = 1e6 * best_time(lambda: snapshot.by_id(records // 2), number)
+            results['by_email_us'] = 1e6 * best_time(
+                lambda: snapshot.by_email('prospect{0}@example.com'.format(records // 2)), number)
+            results['by_email_miss_us'] = 1e6 * best_time(lambda: snapshot.by_email('nobody@example.com'), number)
+    finally:
+        shutil.rmtree(directory)
+    results['records'] = records
+    return results
+
+
+def bench_memory(args):
+    """Memory held by 100k records read into a list, and the peak while streaming them without keeping them."""
+    records = 20000 if args.quick else 100000
+    pardot = client(SyntheticPagesTransport(records))
+    results = OrderedDict()
+
+    gc.collect()
+    tracemalloc.start()
+    loaded = list(pardot.prospects.iter_query(keyset=True))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(loaded) == records
+    del loaded
+    results['list_mb_per_100k_records'] = current * 100000.0 / records / 1e6
+    results['list_peak_mb_per_100k_records'] = peak * 100000.0 / records / 1e6
+
+    gc.collect()
+    tracemalloc.start()
+    for _ in pardot.prospects.iter_query(keyset=True):
+        pass
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results['streaming_peak_mb'] = peak / 1e6
+    results['records'] = records
+    return results
+
+
+def bench_columnar(args):
+    """Memory held by 100k records read into columns with read_columns, and the peak saved against a list of dicts."""
+    records = 20000 if args.quick else 100000
+    pardot = client(SyntheticPagesTransport(records))
+    results = OrderedDict()
+    for name, load in (('list', lambda: list(pardot.prospects.iter_query(keyset=True))),
+                       ('columns', lambda: read_columns(pardot.prospects.iter_query(keyset=True)))):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        loaded = load()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(loaded) == records
+        del loaded
+        results['{0}_mb_per_100k_records'.format(name)] = current * 100000.0 / records / 1e6
+        results['{0}_peak_mb_per_100k_records'.format(name)] = peak * 100000.0 / records / 1e6
+        results['{0}_records_per_s'.format(name)] = records / elapsed
+    results['peak_saved_mb_per_100k_records'] = (results['list_peak_mb_per_100k_records'] -
+                                                 results['columns_peak_mb_per_100k_records'])
+    results['records'] = records
+    return results
+
+
+BENCHMARKS = OrderedDict([
+    ('overhead', bench_overhead),
+    ('pagination', bench_pagination),
+    ('batch', bench_batch),
+    ('concurrency', bench_concurrency),
+    ('output', bench_output),
+    ('mirror', bench_mirror),
+    ('snapshot', bench_snapshot),
+    ('memory', bench_memory),
+    ('columnar', bench_columnar),
+])
+
+
+def environment():
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return OrderedDict([('timestamp', time.strftime('%Y-%m-%dT%H:%M:%S%z')), ('git_revision', revision),
+                        ('python', platform.python_version()), ('implementation', platform.python_implementation()),
+                        ('platform', platform.platform())])
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s') or metric.endswith('_speedup') or '_saved_' in metric
+
+
+def compare(results, baseline, threshold):
+    """Returns a line for every metric that is worse than in <baseline> by more than <threshold> (a fraction)."""
+    regressions = []
+    for name, metrics in results['benchmarks'].items():
+        baseline_metrics = baseline.get('benchmarks', {}).get(name, {})
+        if metrics.get('records') != baseline_metrics.get('records'):
+            # Workloads of different sizes (e.g. --quick against a full run) are not comparable.
+            continue
+        for metric, value in metrics.items():
+            before = baseline_metrics.get(metric)
+            if metric == 'records' or not before:
+                continue
+            change = (value - before) / float(before)
+            if (-change if higher_is_better(metric) else change) > threshold:
+                regressions.append('{0}.{1}: {2:.4g} -> {3:.4g} ({4:+.1%})'.format(name, metric, before, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='benchmarks to run (default: all)')
+    parser.add_argument('--quick', action='store_true', help='smaller workloads, for a fast sanity check')
+    parser.add_argument('--latency', type=float, default=0.005, help='simulated API latency in seconds')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--output', help='file to write the JSON results to (default: stdout)')
+    parser.add_argument('--compare', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    results = OrderedDict([('environment', environment()), ('benchmarks', OrderedDict())])
+    for name in args.only or BENCHMARKS:
+        start = time.time()
+        results['benchmarks'][name] = BENCHMARKS[name](args)
+        sys.stderr.write('{0} ({1:.1f}s)\n'.format(name, time.time() - start))
+        for metric, value in results['benchmarks'][name].items():
+            sys.stderr.write('  {0:<36} {1:>14.2f}\n'.format(metric, value))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            sys.stderr.write('REGRESSION {0}\n'.format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
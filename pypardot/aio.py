@@ -0,0 +1,337 @@
+import asyncio
+import inspect
+
+from .client import BASE_URI, DEFAULT_TIMEOUT
+from .objects.lists import Lists
+from .objects.emails import Emails
+from .objects.prospects import Prospects
+from .objects.opportunities import Opportunities
+from .objects.accounts import Accounts
+from .objects.users import Users
+from .objects.visits import Visits
+from .objects.visitors import Visitors
+from .objects.visitoractivities import VisitorActivities
+from .objects.campaigns import Campaigns
+
+from .errors import PardotAPIError
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncPardotAPI(object):
+    """
+    asyncio counterpart of PardotAPI. Exposes the same object accessors (prospects, visits, visitoractivities, ...),
+    whose methods take the same arguments but must be awaited. All calls share one pooled aiohttp session; <limit> is
+    the total number of open connections and <limit_per_host> the number of connections to a single host (0 means
+    no per-host limit). Requests time out after <timeout> seconds, a number or a (connect, read) tuple, as with
+    PardotAPI; give an operation a total time budget with asyncio.wait_for(). Requires aiohttp.
+    """
+
+    def __init__(self, email, password, user_key, base_uri=BASE_URI, limit=100, limit_per_host=0,
+                 keepalive_timeout=15, timeout=DEFAULT_TIMEOUT):
+        if aiohttp is None:
+            raise ImportError('AsyncPardotAPI requires aiohttp, install it with: pip install aiohttp')
+        self.email = email
+        self.password = password
+        self.user_key = user_key
+        self.api_key = None
+        self.base_uri = base_uri
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.session = None
+        self._auth_lock = None
+        self.lists = AsyncObject(self, Lists)
+        self.emails = AsyncObject(self, Emails)
+        self.prospects = AsyncObject(self, Prospects)
+        self.opportunities = AsyncObject(self, Opportunities)
+        self.accounts = AsyncObject(self, Accounts)
+        self.users = AsyncObject(self, Users)
+        self.visits = AsyncObject(self, Visits)
+        self.visitors = AsyncObject(self, Visitors)
+        self.visitoractivities = AsyncObject(self, VisitorActivities)
+        self.campaigns = AsyncObject(self, Campaigns)
+
+    async def post(self, object_name, path=None, params=None, retries=0, data=None):
+        """
+        Makes a POST request to the API. Behaves like PardotAPI.post: PardotAPIErrors are raised for invalid requests,
+        an expired API key is refreshed once, and either the JSON response or the HTTP status code is returned.
+        """
+        response, _ = await self._request('post', object_name, path=path, params=params, retries=retries, data=data)
+        return response
+
+    async def get(self, object_name, path=None, params=None, retries=0):
+        """
+        Makes a GET request to the API. Behaves like PardotAPI.get: PardotAPIErrors are raised for invalid requests,
+        an expired API key is refreshed once, and either the JSON response or the HTTP status code is returned.
+        """
+        response, _ = await self._request('get', object_name, path=path, params=params, retries=retries)
+        return response
+
+    async def authenticate(self):
+        """
+        Authenticates the user and sets the API key if successful. Returns True if authentication is successful,
+        False if authentication fails.
+        """
+        try:
+            data = {'email': self.email, 'password': self.password, 'user_key': self.user_key}
+            auth = await self.post('login', data=data)
+            self.api_key = auth.get('api_key')
+            if self.api_key is not None:
+                return True
+            return False
+        except PardotAPIError:
+            return False
+
+    async def close(self):
+        """Closes the pooled connections held by the client."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _request(self, method, object_name, path=None, params=None, retries=0, data=None):
+        """
+        Issues the request and returns a (response, body) tuple, where response is what get() and post() return and
+        body is the raw JSON payload (None when the response was not JSON).
+        """
+        params = _clean(params)
+        params['format'] = 'json'
+        await self._check_auth(object_name=object_name)
+        api_key = self.api_key
+        headers = {'Authorization': "Pardot api_key={}, user_key={}".format(api_key, self.user_key)} \
+            if api_key else {}
+        session = self._get_session()
+        try:
+            async with session.request(method.upper(), self._full_path(object_name, path), params=params,
+                                       data=_clean(data) if data else None, headers=headers) as request:
+                return await self._check_response(request)
+        except PardotAPIError as err:
+            if err.message == 'Invalid API key or user key':
+                return await self._handle_expired_api_key(err, retries, api_key, method, object_name, path, params,
+                                                          data=data)
+            raise err
+
+    async def _handle_expired_api_key(self, err, retries, api_key, method, object_name, path, params, data=None):
+        """
+        Tries to refresh an expired API key and re-issue the request. Concurrent callers that were rejected with the
+        same key share a single login instead of each authenticating. If the refresh has already been attempted, an
+        error is raised.
+        """
+        if retries != 0:
+            raise err
+        async with self._get_auth_lock():
+            if self.api_key is None or self.api_key == api_key:
+                self.api_key = None
+                if not await self.authenticate():
+                    raise err
+        return await self._request(method, object_name, path=path, params=params, retries=1, data=data)
+
+    async def _check_auth(self, object_name):
+        if object_name == 'login' or self.api_key is not None:
+            return
+        async with self._get_auth_lock():
+            if self.api_key is None:
+                await self.authenticate()
+
+    @staticmethod
+    async def _check_response(response):
+        """
+        Checks the HTTP response to see if it contains JSON. If it does, checks the JSON for error codes and messages.
+        Raises PardotAPIError if an error was found.
+        """
+        if response.headers.get('content-type') == 'application/json':
+            body = await response.read()
+            json_response = json.loads(body)
+            if json_response.get('err'):
+                raise PardotAPIError(json_response=json_response)
+            return json_response, body
+        return response.status, None
+
+    def _get_session(self):
+        # aiohttp sessions are bound to the running event loop, so the session is only created on first use.
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=None, connect=connect,
+                                                                               sock_read=read))
+        return self.session
+
+    def _get_auth_lock(self):
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        return self._auth_lock
+
+    def _full_path(self, object_name, path=None, version=3):
+        """Builds the full path for the API request"""
+        full = '{0}/api/{1}/version/{2}'.format(self.base_uri, object_name, version)
+        if path:
+            return full + '{0}'.format(path)
+        return full
+
+
+class AsyncObject(object):
+    """
+    Awaitable version of one of the object classes (Prospects, Visits, ...). Calling a method runs the synchronous
+    implementation against a stand-in client; whenever it needs an API response the request is awaited on the
+    AsyncPardotAPI and the method is run again with the responses received so far. Argument checks, paths and result
+    normalization therefore stay exactly those of the synchronous classes. A request that fails is raised inside the
+    method on its next run, where the method's own error handling sees it as it would in the synchronous client.
+    """
+
+    def __init__(self, client, object_class):
+        self.client = client
+        self.object_class = object_class
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not callable(getattr(self.object_class, name, None)):
+            raise AttributeError('{0} has no API method {1}'.format(self.object_class.__name__, name))
+        if name.startswith('batch_'):
+            return self._batch_method(name)
+        return self._replay(name)
+
+    def _replay(self, name):
+        """Returns a coroutine function running the object class's method <name> as described above."""
+
+        async def method(*args, **kwargs):
+            responses = []
+            while True:
+                recorder = _RecordingClient(responses)
+                try:
+                    result = getattr(self.object_class(recorder), name)(*args, **kwargs)
+                except _PendingRequest as pending:
+                    try:
+                        response = await self.client._request(pending.method, pending.object_name, path=pending.path,
+                                                              params=pending.params, data=pending.data)
+                    except Exception as err:
+                        responses.append(_RecordedResponse(None, None, error=err))
+                    else:
+                        responses.append(_RecordedResponse(*response))
+                    continue
+                if inspect.isgenerator(result):
+                    raise TypeError('{0}.{1} is an iterator and has no asynchronous version, page through '
+                                    'query() instead'.format(self.object_class.__name__, name))
+                return result
+
+        method.__name__ = name
+        method.__doc__ = getattr(self.object_class, name).__doc__
+        return method
+
+    def _batch_method(self, name):
+        """
+        Batch methods split their input and send every chunk through _batch_chunk. Here the synchronous method only
+        plans the chunks, each chunk's results are placeholders, and the chunks are then sent concurrently, each
+        replayed through _batch_chunk, filling in the placeholders. A chunk that still fails as a whole only fails its
+        own records, as in the synchronous client.
+        """
+        send_chunk = self._replay('_batch_chunk')
+
+        async def method(*args, **kwargs):
+            chunks = []
+
+            def defer(operation, records):
+                placeholders = [{} for _ in records]
+                chunks.append((operation, records, placeholders))
+                return placeholders
+
+            planner = self.object_class(_RecordingClient([]))
+            planner._batch_chunk = defer
+            results = getattr(planner, name)(*args, **kwargs)
+
+            async def send(operation, records, placeholders):
+                for placeholder, result in zip(placeholders, await send_chunk(operation, records)):
+                    placeholder.update(result)
+
+            outcomes = await asyncio.gather(*[send(*chunk) for chunk in chunks], return_exceptions=True)
+            for (operation, records, placeholders), outcome in zip(chunks, outcomes):
+                if isinstance(outcome, Exception):
+                    for record, placeholder in zip(records, placeholders):
+                        placeholder.update({'prospect': record, 'success': False,
+                                            'error': str(outcome) or type(outcome).__name__})
+            return results
+
+        method.__name__ = name
+        method.__doc__ = getattr(self.object_class, name).__doc__
+        return method
+
+
+class _PendingRequest(BaseException):
+    """
+    Raised by _RecordingClient when the object method needs a response that has not been fetched yet. Derives from
+    BaseException so that object methods catching Exception cannot swallow it.
+    """
+
+    def __init__(self, method, object_name, path, params, data):
+        self.method = method
+        self.object_name = object_name
+        self.path = path
+        self.params = params
+        self.data = data
+
+
+class _RecordedResponse(object):
+    """A response fetched for an AsyncObject method call, or the <error> the request failed with. The decoded response
+    is handed out once, later replays decode a fresh copy from the body because object methods normalize their results
+    in place."""
+
+    def __init__(self, response, body, error=None):
+        self.response = response
+        self.body = body
+        self.error = error
+        self.consumed = False
+
+    def replay(self):
+        if self.error is not None:
+            raise self.error
+        if not self.consumed:
+            self.consumed = True
+            return self.response
+        if self.body is None:
+            return self.response
+        return json.loads(self.body)
+
+
+class _RecordingClient(object):
+    """
+    Stands in for PardotAPI while an AsyncObject method runs, returning already fetched responses in order, or raising
+    the errors they failed with.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.index = 0
+
+    def get(self, object_name, path=None, params=None):
+        return self._next('get', object_name, path, params, None)
+
+    def post(self, object_name, path=None, params=None, data=None, coalesce=False):
+        return self._next('post', object_name, path, params, data)
+
+    def _next(self, method, object_name, path, params, data):
+        if self.index < len(self.responses):
+            self.index += 1
+            return self.responses[self.index - 1].replay()
+        raise _PendingRequest(method, object_name, path, dict(params or {}), data)
+
+
+def _clean(params):
+    """aiohttp only accepts string values, so convert them the way requests would and drop None values."""
+    if not params:
+        return {}
+    return dict((key, str(value)) for key, value in params.items() if value is not None)
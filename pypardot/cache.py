@@ -0,0 +1,161 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecordCache(object):
+    """
+    In-process cache of API read responses, holding at most <max_size> records for up to <ttl> seconds each and
+    evicting the least recently used record first when full. A record can be looked up by its id or its email address
+    (case-insensitively), both of which lead to the same entry. Lookups return a copy, so callers may modify it.
+
+    <hits> and <misses> count lookups, for hit ratios (see MetricsRegistry.track_cache). The cache is thread-safe and
+    can be shared by several clients of the same Pardot account.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = 0
+        self._entries = OrderedDict()
+        self._emails = {}
+        self._lock = threading.Lock()
+
+    def get(self, id=None, email=None):
+        """Returns a copy of the response cached for the record with <id> or <email>, or None."""
+        with self._lock:
+            key = self._key(id, email)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def set(self, record, value, version=None):
+        """
+        Caches <value>, the response holding <record>, under the record's id and email. With <version>, the value of
+        <version> read before the request that returned it, nothing is cached if the cache was invalidated since, as
+        the response could then be older than the write that invalidated it.
+        """
+        if record.get('id') is None:
+            return
+        key = str(record['id'])
+        email = record.get('email')
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, copy.deepcopy(value), email.lower() if email else None)
+            if email:
+                self._emails[email.lower()] = key
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, id=None, email=None):
+        """Forgets the record with <id> and the one with <email>."""
+        with self._lock:
+            self.version += 1
+            for key in (self._key(id, None), self._key(None, email)):
+                if key is not None:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._emails.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, id, email):
+        if id is not None:
+            return str(id)
+        if email:
+            return self._emails.get(email.lower())
+        return None
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[2] is not None and self._emails.get(entry[2]) == key:
+            del self._emails[entry[2]]
+
+
+class NegativeCache(object):
+    """
+    Remembers, for <ttl> seconds, the ids and email addresses that the API reported as not found, along with the
+    error response, so that looking them up again fails straight away without an API call. Holds at most <max_size>
+    entries, evicting the oldest first. <hits> and <misses> count lookups. The cache is thread-safe.
+    """
+
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, id=None, email=None):
+        """Returns the error response cached for <id> or <email>, or None if they are not known to be missing."""
+        key = _negative_key(id, email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def add(self, response, id=None, email=None, version=None):
+        """
+        Records that <id> or <email> was not found, with the error <response>. With <version>, the value of <version>
+        read before the lookup, nothing is recorded if the cache was invalidated since, as the record may have been
+        created in the meantime.
+        """
+        key = _negative_key(id, email)
+        with self._lock:
+            if key is None or (version is not None and version != self.version):
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self.ttl, response)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, id=None, email=None):
+        """Forgets that <id> and <email> were not found, e.g. because a record with that email was just created."""
+        with self._lock:
+            self.version += 1
+            for key in (_negative_key(id, None), _negative_key(None, email)):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _negative_key(id, email):
+    if id is not None:
+        return ('id', str(id))
+    if email:
+        return ('email', email.lower())
+    return None
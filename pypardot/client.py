@@ -1,4 +1,7 @@
-import requests
+import re
+import threading
+import time
+
 from .objects.lists import Lists
 from .objects.emails import Emails
 from .objects.prospects import Prospects
@@ -10,7 +13,12 @@ from .objects.visitors import Visitors
 from .objects.visitoractivities import VisitorActivities
 from .objects.campaigns import Campaigns
 
-from .errors import PardotAPIError
+from .deadline import capped_timeout, current_deadline, current_timeout
+from .errors import PardotAPIError, PardotDeadlineExceeded
+from .hooks import RequestEvent
+from .keystore import key_identity
+from .singleflight import SingleFlight
+from .transport import RequestsTransport
 
 # Issue #1 (http://code.google.com/p/pybing/issues/detail?id=1)
 # Python 2.6 has json built in, 2.5 needs simplejson
@@ -21,16 +29,80 @@ except ImportError:
 
 BASE_URI = 'https://pi.pardot.com'
 
+# Default (connect, read) timeouts in seconds of every API request.
+DEFAULT_TIMEOUT = (10.0, 120.0)
+
+# Actions that only read data, which retries may repeat safely. Logins are safe to repeat too.
+READ_ACTIONS = ('query', 'read', 'describe')
+
+_ACTION = re.compile(r'/api/(?P<object>\w+)/version/\d+(?:/do/(?P<action>\w+))?')
+
 
 class PardotAPI(object):
-    def __init__(self, email, password, user_key):
+    def __init__(self, email, password, user_key, base_uri=BASE_URI, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, rate_limiter=None, retry_policy=None, api_key_lifetime=3600,
+                 refresh_margin=300, auto_refresh=False, key_store=None, transport=None, hooks=None,
+                 timeout=DEFAULT_TIMEOUT, prospect_cache=None, prospect_negative_cache=None, coalesce_reads=False):
+        """
+        All API calls go through one <transport>, by default a RequestsTransport (see pypardot.transport) sharing a
+        pool of keep-alive connections. <pool_connections>, <pool_maxsize>, <pool_block> and <keep_alive> configure
+        that pool. Pass a pypardot.fake.FakeTransport to run against an in-process fake Pardot instead.
+
+        <rate_limiter> is an optional RateLimiter (see pypardot.ratelimit) that every call waits on before it is sent.
+        The time the last call made by the current thread spent waiting is available as <rate_limit_wait>.
+
+        <retry_policy> is an optional RetryPolicy (see pypardot.retry) deciding which transient failures are retried,
+        and how. Without one, failures are raised to the caller straight away.
+
+        API keys are valid for <api_key_lifetime> seconds after login. A key known to be past its lifetime is replaced
+        before the next call instead of letting that call fail first. With <auto_refresh>, a background timer logs in
+        again <refresh_margin> seconds before the key expires, so calls never wait for a login.
+
+        <key_store> is an optional FileKeyStore or SQLiteKeyStore (see pypardot.keystore) through which processes
+        share API keys: a still-valid stored key is used instead of logging in, new keys are stored for the others, and
+        a key the API rejects is removed from the store.
+
+        <hooks> is an optional list of RequestHooks (see pypardot.hooks) told about every call the client makes, with
+        a RequestEvent holding its timings, response size, retries, logins and rate limiter wait.
+
+        Requests time out after <timeout> seconds, either a number or a (connect, read) tuple; None waits forever. The
+        timeout can be changed for a single call with the <timeout> argument of get() and post(), or for the calls in
+        a with block with pypardot.deadline.request_timeout(). pypardot.deadline.deadline() gives all the calls
+        made by an operation a total time budget.
+
+        <prospect_cache> is an optional RecordCache (see pypardot.cache) serving repeated prospect reads by id or email
+        without an API call. Prospect writes made through the client refresh or invalidate the cached prospects.
+        <prospect_negative_cache> is an optional NegativeCache making lookups of prospects that were just found not
+        to exist fail without an API call, until a prospect with that email is created through the client.
+
+        With <coalesce_reads>, identical reads (read_by_id, read_by_email, read, ...) made by several threads at the
+        same time share a single API call. <single_flight> then counts the reads made and those saved.
+        """
         self.email = email
         self.password = password
         self.user_key = user_key
         self.api_key = None
+        self.api_key_issued_at = None
+        self.api_key_lifetime = api_key_lifetime
+        self.refresh_margin = refresh_margin
+        self.auto_refresh = auto_refresh
+        self.key_store = key_store
+        self.base_uri = base_uri
+        if transport is None:
+            transport = RequestsTransport(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                          pool_block=pool_block, keep_alive=keep_alive)
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.hooks = list(hooks or [])
+        self.timeout = timeout
+        self.single_flight = SingleFlight() if coalesce_reads else None
+        self._local = threading.local()
+        self._auth_lock = threading.RLock()
+        self._refresh_timer = None
         self.lists = Lists(self)
         self.emails = Emails(self)
-        self.prospects = Prospects(self)
+        self.prospects = Prospects(self, cache=prospect_cache, negative_cache=prospect_negative_cache)
         self.opportunities = Opportunities(self)
         self.accounts = Accounts(self)
         self.users = Users(self)
@@ -39,71 +111,236 @@ class PardotAPI(object):
         self.visitoractivities = VisitorActivities(self)
         self.campaigns = Campaigns(self)
 
-    def post(self, object_name, path=None, params=None, retries=0, data=None):
+    def post(self, object_name, path=None, params=None, retries=0, data=None, timeout=None, coalesce=False):
         """
         Makes a POST request to the API. Checks for invalid requests that raise PardotAPIErrors. If the API key is
         invalid, one re-authentication request is made, in case the key has simply expired. If no errors are raised,
-        returns either the JSON response, or if no JSON was returned, returns the HTTP response status code.
+        returns either the JSON response, or if no JSON was returned, returns the HTTP response status code. <timeout>
+        overrides the client's timeout for this call. <coalesce> marks an idempotent read, which shares the response of
+        an identical call in flight if the client coalesces reads.
         """
+        if coalesce and self.single_flight is not None:
+            return self._coalesce('post', object_name, path, params, data,
+                                  lambda: self.post(object_name, path, params, retries, data, timeout))
+        if not self.hooks:
+            return self._post(object_name, path, params, retries, data, timeout)
+        return self._observe('post', object_name, path, self._post, params=params, retries=retries, data=data,
+                             timeout=timeout)
+
+    def _post(self, object_name, path=None, params=None, retries=0, data=None, timeout=None):
+        """Makes the POST request for post()."""
         if params is None:
             params = {}
         params.update({'format': 'json'})
 
         try:
             self._check_auth(object_name=object_name)
-            headers = {'Authorization': "Pardot api_key={}, user_key={}".format(self.api_key, self.user_key)} \
-                if self.api_key else {}
-            request = requests.post(self._full_path(object_name, path), params=params, data=data, headers=headers)
-            response = self._check_response(request)
+            api_key = self.api_key
+            headers = {'Authorization': "Pardot api_key={}, user_key={}".format(api_key, self.user_key)} \
+                if api_key else {}
+            response = self._call('post', self._full_path(object_name, path), params=params, data=data, headers=headers,
+                                  timeout=timeout)
             return response
         except PardotAPIError as err:
             if err.message == 'Invalid API key or user key':
-                response = self._handle_expired_api_key(err, retries, 'post', object_name, path, params)
+                response = self._handle_expired_api_key(err, retries, api_key, 'post', object_name, path, params,
+                                                        data=data, timeout=timeout)
                 return response
             else:
                 raise err
 
-    def get(self, object_name, path=None, params=None, retries=0):
+    def get(self, object_name, path=None, params=None, retries=0, timeout=None, coalesce=False):
         """
         Makes a GET request to the API. Checks for invalid requests that raise PardotAPIErrors. If the API key is
         invalid, one re-authentication request is made, in case the key has simply expired. If no errors are raised,
-        returns either the JSON response, or if no JSON was returned, returns the HTTP response status code.
+        returns either the JSON response, or if no JSON was returned, returns the HTTP response status code. <timeout>
+        overrides the client's timeout for this call. <coalesce> marks an idempotent read, which shares the response of
+        an identical call in flight if the client coalesces reads.
         """
+        if coalesce and self.single_flight is not None:
+            return self._coalesce('get', object_name, path, params, None,
+                                  lambda: self.get(object_name, path, params, retries, timeout))
+        if not self.hooks:
+            return self._get(object_name, path, params, retries, timeout)
+        return self._observe('get', object_name, path, self._get, params=params, retries=retries, timeout=timeout)
+
+    def _get(self, object_name, path=None, params=None, retries=0, timeout=None):
+        """Makes the GET request for get()."""
         if params is None:
             params = {}
         params.update({'format': 'json'})
         try:
             self._check_auth(object_name=object_name)
-            headers = {'Authorization': "Pardot api_key={}, user_key={}".format(self.api_key, self.user_key)} \
-                if self.api_key else {}
-            request = requests.get(self._full_path(object_name, path), params=params, headers=headers)
-            response = self._check_response(request)
+            api_key = self.api_key
+            headers = {'Authorization': "Pardot api_key={}, user_key={}".format(api_key, self.user_key)} \
+                if api_key else {}
+            response = self._call('get', self._full_path(object_name, path), params=params, headers=headers,
+                                  timeout=timeout)
             return response
         except PardotAPIError as err:
             if err.message == 'Invalid API key or user key':
-                response = self._handle_expired_api_key(err, retries, 'get', object_name, path, params)
+                response = self._handle_expired_api_key(err, retries, api_key, 'get', object_name, path, params,
+                                                        timeout=timeout)
                 return response
             else:
                 raise err
 
-    def _handle_expired_api_key(self, err, retries, method, object_name, path, params):
+    @property
+    def rate_limit_wait(self):
+        """Seconds the current thread's last call waited on the rate limiter."""
+        return getattr(self._local, 'rate_limit_wait', 0.0)
+
+    @property
+    def retry_count(self):
+        """Number of times the current thread's last call was retried."""
+        return getattr(self._local, 'retry_count', 0)
+
+    def _coalesce(self, method, object_name, path, params, data, call):
+        """Makes <call>, or waits for an identical call in flight, for no longer than the thread's deadline."""
+        key = (method, object_name, path, repr(sorted((params or {}).items())), repr(sorted((data or {}).items())))
+        deadline = current_deadline()
+        return self.single_flight.do(key, call, timeout=deadline.remaining() if deadline is not None else None)
+
+    def _observe(self, method, object_name, path, call, **kwargs):
+        """
+        Makes the call through <call>, reporting it to the hooks, if any. Requests made on behalf of a call being
+        observed, such as re-issuing it after a login, are reported as part of that call. A login is reported as a
+        call of its own, and the call it was made for is flagged as having refreshed its API key.
+        """
+        current = getattr(self._local, 'event', None)
+        if current is not None and object_name != 'login':
+            return call(object_name, path=path, **kwargs)
+        if current is not None:
+            current.auth_refreshed = True
+        event = RequestEvent(method, object_name, path)
+        self._local.event = event
+        for hook in self.hooks:
+            hook.on_request_start(event)
+        try:
+            return call(object_name, path=path, **kwargs)
+        except Exception as err:
+            event.error = err
+            raise
+        finally:
+            self._local.event = current
+            event.finish()
+            for hook in self.hooks:
+                hook.on_request_end(event)
+
+    def _call(self, method, url, **kwargs):
+        """
+        Sends the request and checks the response, retrying transient failures as the retry policy and the thread's
+        deadline, if any, allow. Returns what _check_response returns for the last attempt, or raises its error.
+        """
+        policy = self.retry_policy
+        self._local.retry_count = 0
+        if policy is None:
+            return self._attempt(method, url, **kwargs)
+        policy.record_call()
+        write = _is_write(url)
+        started = time.time()
+        attempt = 1
+        while True:
+            error = None
+            try:
+                response = self._attempt(method, url, **kwargs)
+                delay = policy.next_delay(attempt, started, status=response, write=write) \
+                    if isinstance(response, int) else None
+            except Exception as err:
+                error = err
+                delay = policy.next_delay(attempt, started, error=err, write=write)
+            deadline = current_deadline()
+            if delay is not None and deadline is not None and deadline.remaining() <= delay:
+                delay = None
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            time.sleep(delay)
+            attempt += 1
+            self._local.retry_count += 1
+            event = getattr(self._local, 'event', None)
+            if event is not None:
+                event.retries += 1
+
+    def _attempt(self, method, url, **kwargs):
+        """Sends the request once and checks the response, adding its timings to the event of the call, if any."""
+        event = getattr(self._local, 'event', None) if self.hooks else None
+        if event is None:
+            return self._check_response(self._send(method, url, **kwargs))
+        event.attempts += 1
+        response = self._send(method, url, **kwargs)
+        event.record_response(response)
+        start = time.time()
+        try:
+            return self._check_response(response)
+        finally:
+            event.add_timing('decode', time.time() - start)
+
+    def _send(self, method, url, timeout=None, **kwargs):
+        """Sends the HTTP request through the transport, once the rate limiter, if any, allows it."""
+        if self.rate_limiter is None:
+            return self._request(method, url, timeout, **kwargs)
+        with self.rate_limiter.limit() as permit:
+            self._local.rate_limit_wait = permit.waited
+            event = getattr(self._local, 'event', None)
+            if event is not None:
+                event.rate_limit_wait += permit.waited
+            return self._request(method, url, timeout, **kwargs)
+
+    def _request(self, method, url, timeout, **kwargs):
+        """
+        Sends the HTTP request with the call's <timeout>, or else the thread's request_timeout() or the client's
+        timeout, shortened to the time left before the thread's deadline. Raises PardotDeadlineExceeded if the
+        deadline has passed before the request is sent, or once the request has failed.
+        """
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired():
+            raise PardotDeadlineExceeded('Deadline exceeded before sending the request to {0}'.format(url))
+        if timeout is None:
+            timeout = current_timeout(self.timeout)
+        try:
+            return self.transport.request(method, url, timeout=capped_timeout(timeout, deadline), **kwargs)
+        except Exception:
+            if deadline is not None and deadline.expired():
+                raise PardotDeadlineExceeded('Deadline exceeded waiting for the response from {0}'.format(url))
+            raise
+
+    def _handle_expired_api_key(self, err, retries, api_key, method, object_name, path, params, data=None,
+                                timeout=None):
         """
         Tries to refresh an expired API key and re-issue the HTTP request. If the refresh has already been attempted,
-        an error is raised.
+        an error is raised. <api_key> is the key the request was rejected with: when several threads are rejected at
+        once, only the first one to get here logs in again and the others re-issue their requests with its new key.
         """
         if retries != 0:
             raise err
-        self.api_key = None
-        if self.authenticate():
-            response = getattr(self, method)(object_name=object_name, path=path, params=params, retries=1)
-            return response
-        else:
-            raise err
+        with self._auth_lock:
+            if self.api_key is None or self.api_key == api_key:
+                self.api_key = None
+                if self.key_store is not None:
+                    self.key_store.invalidate(self._key_identity(), api_key)
+                if not self._load_stored_key(rejected=api_key) and not self.authenticate():
+                    raise err
+        kwargs = {'data': data} if method == 'post' else {}
+        response = getattr(self, method)(object_name=object_name, path=path, params=params, retries=1,
+                                         timeout=timeout, **kwargs)
+        return response
 
-    @staticmethod
-    def _full_path(object_name, path=None, version=3):
+    def close(self):
+        """Closes the pooled connections held by the client and stops refreshing its API key."""
+        self._cancel_refresh()
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _full_path(self, object_name, path=None, version=3):
         """Builds the full path for the API request"""
-        full = '{0}/api/{1}/version/{2}'.format(BASE_URI, object_name, version)
+        full = '{0}/api/{1}/version/{2}'.format(self.base_uri, object_name, version)
         if path:
             return full + '{0}'.format(path)
         return full
@@ -125,10 +362,68 @@ class PardotAPI(object):
             return response.status_code
 
     def _check_auth(self, object_name):
-        if object_name == 'login':
+        if object_name == 'login' or (self.api_key is not None and not self._api_key_expired()):
             return
-        if self.api_key is None:
-            self.authenticate()
+        with self._auth_lock:
+            if self.api_key is None or self._api_key_expired():
+                if not self._load_stored_key():
+                    self.authenticate()
+
+    def _key_identity(self):
+        return key_identity(self.email, self.user_key, self.base_uri)
+
+    def _load_stored_key(self, rejected=None, newer_than=None):
+        """
+        Adopts the API key held in the key store if it is still valid, is not the <rejected> key and, if given, was
+        issued after <newer_than>. Returns True if a key was adopted.
+        """
+        if self.key_store is None:
+            return False
+        stored = self.key_store.get(self._key_identity())
+        if stored is None:
+            return False
+        api_key, issued_at = stored
+        if api_key == rejected or time.time() >= issued_at + self.api_key_lifetime:
+            return False
+        if newer_than is not None and issued_at <= newer_than:
+            return False
+        self.api_key = api_key
+        self.api_key_issued_at = issued_at
+        if self.auto_refresh:
+            self._schedule_refresh()
+        return True
+
+    def _api_key_expired(self):
+        return self.api_key_issued_at is not None and time.time() >= self.api_key_issued_at + self.api_key_lifetime
+
+    def _schedule_refresh(self, delay=None):
+        """Starts the background timer refreshing the API key <refresh_margin> seconds before it expires."""
+        self._cancel_refresh()
+        if delay is None:
+            delay = self.api_key_issued_at + self.api_key_lifetime - self.refresh_margin - time.time()
+        self._refresh_timer = threading.Timer(max(0, delay), self._refresh_api_key)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _cancel_refresh(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _refresh_api_key(self):
+        """
+        Logs in again while the current key is still valid. Calls keep using the current key until the new one is set.
+        If another process already stored a newer key, that key is used instead. If the login fails, it is retried a
+        little later, and calls fall back to re-authenticating once the key has actually expired.
+        """
+        with self._auth_lock:
+            try:
+                if self._load_stored_key(newer_than=self.api_key_issued_at) or self.authenticate():
+                    return
+            except Exception:
+                pass
+            if self.api_key_issued_at is not None and not self._api_key_expired():
+                self._schedule_refresh(delay=min(30, self.refresh_margin / 2.0))
 
     def authenticate(self):
         """
@@ -140,7 +435,20 @@ class PardotAPI(object):
             auth = self.post('login', data=data)
             self.api_key = auth.get('api_key')
             if self.api_key is not None:
+                self.api_key_issued_at = time.time()
+                if self.key_store is not None:
+                    self.key_store.set(self._key_identity(), self.api_key, self.api_key_issued_at)
+                if self.auto_refresh:
+                    self._schedule_refresh()
                 return True
             return False
         except PardotAPIError:
             return False
+
+
+def _is_write(url):
+    """Returns True if the API request to <url> may change data, i.e. it is not a login or one of READ_ACTIONS."""
+    match = _ACTION.search(url)
+    if match is None:
+        return True
+    return match.group('object') != 'login' and match.group('action') not in READ_ACTIONS
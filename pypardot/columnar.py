@@ -0,0 +1,356 @@
+import sys
+import time
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from .util import DATE_FORMAT, flatten, is_datetime, parse_datetime
+
+# Column kinds, from the value of the first record that has the column (see Column).
+INT = 'int'
+FLOAT = 'float'
+BOOL = 'bool'
+DATETIME = 'datetime'
+CATEGORY = 'category'
+STRING = 'string'
+OBJECT = 'object'
+
+# Distinct values a string column can have and still be stored as a categorical.
+MAX_CATEGORIES = 1000
+
+
+def read_columns(records, columns=None, max_categories=MAX_CATEGORIES):
+    """
+    Reads <records>, e.g. p.visitoractivities.iter_query(keyset=True), into a ColumnarResult, one record at a time, so
+    that only the page being read is ever held as dicts:
+
+        result = read_columns(p.visitoractivities.iter_query(keyset=True, output='bulk'))
+        frame = result.to_pandas()
+
+    Nested objects are flattened into dotted column names (e.g. campaign.name). <columns>, a list of such names,
+    restricts the result to those columns, in that order; otherwise every column seen is kept, except nested lists
+    (e.g. a prospect's visitor activities in full output), which have no columnar form and are only kept if named.
+    """
+    result = ColumnarResult(columns, max_categories)
+    for record in records:
+        result.append(record)
+    return result
+
+
+class ColumnarResult(object):
+    """
+    Query results stored as one typed buffer per column (see Column) instead of one dict per record. Columns are
+    appended to with append() and handed over with to_numpy(), to_pandas() or to_arrow(), which wrap the buffers
+    without copying them where the target library allows. Appending after an export is allowed: a column copies its
+    buffer before growing it again, so the arrays already handed over keep the values they had. <nbytes> is the
+    memory held by the buffers.
+    """
+
+    def __init__(self, columns=None, max_categories=MAX_CATEGORIES):
+        self.length = 0
+        self.max_categories = max_categories
+        self.columns = OrderedDict()
+        self._paths = None
+        if columns is not None:
+            self._paths = [(name, name.split('.')) for name in columns]
+            for name in columns:
+                self.columns[name] = Column(name, max_categories=max_categories)
+
+    def append(self, record):
+        if self._paths is not None:
+            for name, path in self._paths:
+                self.columns[name].append(_lookup(record, path))
+        else:
+            for name, value in flatten(record):
+                if isinstance(value, list):
+                    continue
+                column = self.columns.get(name)
+                if column is None:
+                    column = self.columns[name] = Column(name, missing=self.length, max_categories=self.max_categories)
+                column.append(value)
+            for column in self.columns.values():
+                if column.length == self.length:
+                    column.append(None)
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def to_numpy(self):
+        """
+        Returns a dict of NumPy arrays by column name. Integer and boolean columns with missing values become
+        float arrays with NaN, datetimes datetime64[s] arrays with NaT, and categorical columns are decoded to object
+        arrays of strings. Requires numpy.
+        """
+        _require(numpy, 'to_numpy', 'numpy')
+        return OrderedDict((name, column.to_numpy()) for name, column in self.columns.items())
+
+    def to_pandas(self):
+        """
+        Returns a pandas DataFrame, with pandas' nullable Int64 and boolean types for integer and boolean columns
+        with missing values and Categorical columns for categoricals. Requires pandas.
+        """
+        _require(pandas, 'to_pandas', 'pandas')
+        return pandas.DataFrame(OrderedDict((name, column.to_pandas()) for name, column in self.columns.items()))
+
+    def to_arrow(self):
+        """Returns a pyarrow Table, with dictionary-encoded columns for categoricals. Requires pyarrow."""
+        _require(pyarrow, 'to_arrow', 'pyarrow')
+        return pyarrow.table(OrderedDict((name, column.to_arrow()) for name, column in self.columns.items()))
+
+    def to_records(self):
+        """Returns the records as a list of flat dicts, mostly for testing and debugging."""
+        values = [column.to_list() for column in self.columns.values()]
+        return [dict(zip(self.columns, row)) for row in zip(*values)] if values else [{} for _ in range(self.length)]
+
+
+class Column(object):
+    """
+    The values of one column, in a buffer whose kind is chosen from the first value that is not None: ints are
+    stored in an array of 64-bit integers, floats in an array of doubles, booleans in an array of bytes, Pardot
+    dates and times as seconds since the epoch in an array of 64-bit integers, and strings as categoricals (an
+    array of 32-bit codes into a list of the distinct strings). Missing values are tracked in a bytearray of
+    validity flags, allocated only once the first one is appended.
+
+    A value that does not fit the kind widens it: ints become floats when a float comes along, categoricals plain
+    strings once they have more than <max_categories> distinct values, and anything else an object column holding
+    the Python values as they are.
+    """
+
+    def __init__(self, name, missing=0, max_categories=MAX_CATEGORIES):
+        self.name = name
+        self.kind = None
+        self.length = 0
+        self.max_categories = max_categories
+        self.values = None
+        self.valid = None
+        self.categories = None
+        self._codes = None
+        self._exported = False
+        for _ in range(missing):
+            self.append(None)
+
+    def append(self, value):
+        if self._exported:
+            # Arrays handed out by an export share the buffer, which cannot be resized under them.
+            self.values = self.values[:]
+            self._exported = False
+        if value is None:
+            self._append_missing()
+            return
+        if self.kind is None:
+            self._convert(_kind_of(value))
+        try:
+            self._append(value)
+        except (TypeError, ValueError, OverflowError):
+            self._convert(self._widened(value))
+            self._append(value)
+        if self.valid is not None:
+            self.valid.append(1)
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def nbytes(self):
+        size = len(self.valid) if self.valid is not None else 0
+        if isinstance(self.values, array):
+            size += len(self.values) * self.values.itemsize
+        elif self.values is not None:
+            size += sys.getsizeof(self.values) + sum(sys.getsizeof(value) for value in self.values)
+        if self.categories is not None:
+            size += sum(sys.getsizeof(category) for category in self.categories)
+        return size
+
+    def to_list(self):
+        """Returns the column's values as Python values, None for missing ones."""
+        if self.kind is None:
+            return [None] * self.length
+        if self.kind == CATEGORY:
+            values = [self.categories[code] if code >= 0 else None for code in self.values]
+        elif self.kind == DATETIME:
+            values = [time.strftime(DATE_FORMAT, time.gmtime(value)) for value in self.values]
+        elif self.kind == BOOL:
+            values = [bool(value) for value in self.values]
+        else:
+            values = list(self.values)
+        if self.valid is not None:
+            values = [value if valid else None for value, valid in zip(values, self.valid)]
+        return values
+
+    def to_numpy(self):
+        _require(numpy, 'to_numpy', 'numpy')
+        if self.kind in (INT, FLOAT, BOOL, DATETIME):
+            dtype = {INT: numpy.int64, FLOAT: numpy.float64, BOOL: numpy.int8, DATETIME: numpy.int64}[self.kind]
+            values = self._buffer(dtype)
+            if self.kind == BOOL:
+                values = values.astype(bool)
+            if self.kind == DATETIME:
+                values = values.astype('datetime64[s]')
+            if self.valid is None:
+                return values
+            missing = numpy.frombuffer(bytes(self.valid), dtype=numpy.uint8) == 0
+            if self.kind == DATETIME:
+                values = values.copy()
+                values[missing] = numpy.datetime64('NaT')
+                return values
+            values = values.astype(numpy.float64)
+            values[missing] = numpy.nan
+            return values
+        if self.kind == CATEGORY:
+            categories = numpy.empty(len(self.categories) + 1, dtype=object)
+            categories[:-1] = self.categories
+            return categories[self._numpy_codes()]
+        values = numpy.empty(self.length, dtype=object)
+        values[:] = self.to_list()
+        return values
+
+    def to_pandas(self):
+        _require(pandas, 'to_pandas', 'pandas')
+        if self.kind == CATEGORY:
+            return pandas.Categorical.from_codes(self._numpy_codes(), self.categories)
+        if self.kind in (INT, BOOL) and self.valid is not None:
+            mask = numpy.frombuffer(bytes(self.valid), dtype=numpy.uint8) == 0
+            values = self._buffer(numpy.int64 if self.kind == INT else numpy.int8)
+            return pandas.arrays.IntegerArray(values, mask) if self.kind == INT else \
+                pandas.arrays.BooleanArray(values.astype(bool), mask)
+        return self.to_numpy()
+
+    def to_arrow(self):
+        _require(pyarrow, 'to_arrow', 'pyarrow')
+        mask = None
+        if self.valid is not None:
+            mask = numpy.frombuffer(bytes(self.valid), dtype=numpy.uint8) == 0
+        if self.kind == CATEGORY:
+            indices = pyarrow.array(self._numpy_codes(), mask=mask)
+            return pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(self.categories, pyarrow.string()))
+        if self.kind == INT:
+            return pyarrow.array(self._buffer(numpy.int64), pyarrow.int64(), mask=mask)
+        if self.kind == FLOAT:
+            return pyarrow.array(self._buffer(numpy.float64), pyarrow.float64(), mask=mask)
+        if self.kind == BOOL:
+            return pyarrow.array(self._buffer(numpy.int8).astype(bool), pyarrow.bool_(), mask=mask)
+        if self.kind == DATETIME:
+            return pyarrow.array(self._buffer(numpy.int64), pyarrow.timestamp('s'), mask=mask)
+        return pyarrow.array(self.to_list())
+
+    def _numpy_codes(self):
+        return self._buffer(numpy.int32)
+
+    def _buffer(self, dtype):
+        """Wraps the column's buffer in a NumPy array of <dtype> without copying it."""
+        if not len(self.values):
+            return numpy.zeros(0, dtype)
+        self._exported = True
+        return numpy.frombuffer(self.values, dtype=dtype)
+
+    def _append(self, value):
+        kind = self.kind
+        if kind == INT:
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise TypeError(value)
+            self.values.append(value)
+        elif kind == FLOAT:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise TypeError(value)
+            self.values.append(value)
+        elif kind == BOOL:
+            if not isinstance(value, bool):
+                raise TypeError(value)
+            self.values.append(value)
+        elif kind == DATETIME:
+            self.values.append(parse_datetime(value))
+        elif kind == CATEGORY:
+            code = self._codes.get(value)
+            if code is None:
+                if not isinstance(value, str) or len(self.categories) >= self.max_categories:
+                    raise TypeError(value)
+                code = self._codes[value] = len(self.categories)
+                self.categories.append(value)
+            self.values.append(code)
+        elif kind == STRING:
+            if not isinstance(value, str):
+                raise TypeError(value)
+            self.values.append(value)
+        else:
+            self.values.append(value)
+
+    def _append_missing(self):
+        if self.valid is None:
+            self.valid = bytearray(b'\x01') * self.length
+        self.valid.append(0)
+        if self.kind is not None:
+            self.values.append(_PLACEHOLDERS[self.kind])
+        self.length += 1
+
+    def _widened(self, value):
+        if self.kind == INT and isinstance(value, float):
+            return FLOAT
+        if self.kind in (CATEGORY, DATETIME) and isinstance(value, str):
+            return STRING
+        return OBJECT
+
+    def _convert(self, kind):
+        """Switches the column to <kind>, converting the values appended so far."""
+        values = self.to_list() if self.kind is not None else [None] * self.length
+        self.kind = kind
+        self.length = 0
+        self.valid = None
+        self.categories = self._codes = None
+        if kind == CATEGORY:
+            self.categories, self._codes = [], {}
+        self.values = array(_TYPECODES[kind]) if kind in _TYPECODES else []
+        for value in values:
+            self.append(value)
+
+
+_TYPECODES = {INT: 'q', FLOAT: 'd', BOOL: 'b', DATETIME: 'q', CATEGORY: 'i'}
+
+_PLACEHOLDERS = {INT: 0, FLOAT: float('nan'), BOOL: 0, DATETIME: 0, CATEGORY: -1, STRING: None, OBJECT: None}
+
+
+def _kind_of(value):
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, int):
+        return INT
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, str):
+        return DATETIME if is_datetime(value) else CATEGORY
+    return OBJECT
+
+
+def _lookup(record, path):
+    for key in path:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def _require(module, method, name):
+    if module is None:
+        raise ImportError('{0}() requires {1}, install it with: pip install {1}'.format(method, name))
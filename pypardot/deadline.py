@@ -0,0 +1,106 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class Deadline(object):
+    """A point in time, <expires_at> as returned by time.time(), by which an operation must be done."""
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+
+    def remaining(self):
+        """Seconds left until the deadline, negative once it has passed."""
+        return self.expires_at - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return '<Deadline in {0:.3f}s>'.format(self.remaining())
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Gives the API calls made by the current thread inside the with block a total budget of <seconds>:
+
+        with deadline(300):
+            for prospect in p.prospects.iter_query(prefetch=True):
+                ...
+
+    Every call's timeouts are shortened to the time left, retries are not attempted past it, and a call started after
+    it has passed, or timing out because of it, raises PardotDeadlineExceeded. Nested deadlines can only shorten the
+    budget. Background threads started by the library for the operation (prefetching, partitioned exports, batches)
+    inherit the deadline.
+    """
+    previous = current_deadline()
+    expires_at = time.time() + seconds
+    if previous is not None:
+        expires_at = min(expires_at, previous.expires_at)
+    _local.deadline = Deadline(expires_at)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+@contextmanager
+def request_timeout(timeout):
+    """
+    Overrides the client's timeout for the API calls made by the current thread inside the with block. <timeout> is
+    a number of seconds, a (connect, read) tuple, or None to wait forever.
+    """
+    previous = getattr(_local, 'timeout', _NOT_SET)
+    _local.timeout = timeout
+    try:
+        yield
+    finally:
+        _local.timeout = previous
+
+
+def current_deadline():
+    """Returns the current thread's Deadline, or None."""
+    return getattr(_local, 'deadline', None)
+
+
+def current_timeout(default):
+    """Returns the timeout set for the current thread by request_timeout(), or <default>."""
+    timeout = getattr(_local, 'timeout', _NOT_SET)
+    return default if timeout is _NOT_SET else timeout
+
+
+def propagate(function):
+    """
+    Wraps <function> so that it runs with the calling thread's deadline and request timeout, for use as the target
+    of a background thread working on the caller's behalf.
+    """
+    deadline_ = current_deadline()
+    timeout = getattr(_local, 'timeout', _NOT_SET)
+
+    def run(*args, **kwargs):
+        _local.deadline = deadline_
+        _local.timeout = timeout
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.deadline = None
+            _local.timeout = _NOT_SET
+    return run
+
+
+def capped_timeout(timeout, deadline_):
+    """Shortens <timeout> (a number, a (connect, read) tuple or None) to the time left before <deadline_>."""
+    if deadline_ is None:
+        return timeout
+    remaining = max(0.001, deadline_.remaining())
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+    return min(timeout, remaining)
+
+
+_NOT_SET = object()
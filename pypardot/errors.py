@@ -18,3 +18,13 @@ class PardotAPIError(Exception):
 
 class PardotAPIArgumentError(Exception):
     pass
+
+
+class PardotDeadlineExceeded(Exception):
+    """Raised when an API call cannot be completed before the deadline set with pypardot.deadline.deadline()."""
+    pass
+
+
+class PardotMirrorStale(Exception):
+    """Raised by a pypardot.mirror.Mirror read when the object's mirror is older than the staleness bound."""
+    pass
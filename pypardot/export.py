@@ -0,0 +1,222 @@
+import inspect
+import threading
+import time
+from datetime import timedelta
+
+try:
+    from queue import Queue, Empty, Full
+except ImportError:
+    from Queue import Queue, Empty, Full
+
+from .deadline import propagate
+from .errors import PardotDeadlineExceeded
+from .util import DATE_FORMAT
+
+
+class Shard(object):
+    """
+    One independent slice of a partitioned export, either the ids in (<id_after>, <id_until>] or the records whose
+    <date_field> ('created' or 'updated') falls in [<date_from>, <date_to>). Progress is tracked on the shard so that a
+    failed shard can be resumed where it stopped instead of starting over.
+    """
+
+    def __init__(self, id_after=None, id_until=None, date_field=None, date_from=None, date_to=None):
+        self.id_after = id_after
+        self.id_until = id_until
+        self.date_field = date_field
+        self.date_from = date_from
+        self.date_to = date_to
+        self.records = 0
+        self.attempts = 0
+        self.position = 0
+        self.last_id = None
+        self.done = False
+        self.error = None
+
+    @property
+    def name(self):
+        if self.date_field:
+            return '{0} {1} - {2}'.format(self.date_field, self.date_from, self.date_to)
+        return 'id {0} - {1}'.format(self.id_after, self.id_until)
+
+    def criteria(self):
+        """Returns the query criteria selecting the shard's records."""
+        criteria = {}
+        if self.id_after is not None:
+            criteria['id_greater_than'] = self.id_after
+        if self.id_until is not None:
+            criteria['id_less_than'] = self.id_until + 1
+        if self.date_field:
+            # The API's after/before bounds are widened by a second and the exact window is applied by contains(), so
+            # records sitting on a window boundary are exported exactly once whatever the API's inclusivity.
+            criteria['{0}_after'.format(self.date_field)] = _format_date(self.date_from - timedelta(seconds=1))
+            criteria['{0}_before'.format(self.date_field)] = _format_date(self.date_to + timedelta(seconds=1))
+        return criteria
+
+    def contains(self, record):
+        """Returns True if <record> belongs to the shard."""
+        if self.id_after is not None and int(record['id']) <= self.id_after:
+            return False
+        if self.id_until is not None and int(record['id']) > self.id_until:
+            return False
+        if self.date_field:
+            value = record.get('{0}_at'.format(self.date_field))
+            return value is not None and _format_date(self.date_from) <= value < _format_date(self.date_to)
+        return True
+
+    def __repr__(self):
+        return '<Shard {0}: {1} records, {2} attempts{3}>'.format(
+            self.name, self.records, self.attempts, ', done' if self.done else '')
+
+
+def id_shards(first_id, last_id, count):
+    """Splits the ids from <first_id> to <last_id> (inclusive) into <count> contiguous shards."""
+    step = max(1, -(-(last_id - first_id + 1) // count))
+    return [Shard(id_after=start - 1, id_until=min(start + step - 1, last_id))
+            for start in range(first_id, last_id + 1, step)]
+
+
+def date_shards(start, end, count, field='created'):
+    """
+    Splits the time between the datetimes <start> and <end> into <count> windows over the <field>_at timestamp, where
+    <field> is 'created' or 'updated'.
+    """
+    step = (end - start) / count
+    bounds = [start + step * i for i in range(count)] + [end]
+    return [Shard(date_field=field, date_from=bounds[i], date_to=bounds[i + 1]) for i in range(count)]
+
+
+class PartitionedExport(object):
+    """
+    Exports the records of one object (any accessor with an iter_query method, e.g. client.prospects) by reading
+    independent <shards> concurrently, at most <max_workers> at a time, and merging them into a single stream:
+
+        export = PartitionedExport(p.prospects, id_shards(1, 9000000, 64), max_workers=8)
+        for prospect in export:
+            ...
+
+    Records are yielded in no particular order. A shard that fails is retried up to <max_retries> times, resuming
+    after the last record it read, with an exponential delay starting at <retry_delay> seconds. If a shard still
+    fails the export stops and its error is raised. Each shard records the progress of the records taken from the
+    export, so iterating the export again after it stopped, failed or not, resumes every unfinished shard after the
+    last record taken. <on_progress>, if given, is called with the Shard every 200 records and when the shard
+    completes. Extra keyword arguments are passed to every query as criteria. Workers inherit the deadline and request
+    timeout of the thread iterating the export (see pypardot.deadline), and a PardotDeadlineExceeded error is raised
+    straight away rather than retried.
+    """
+
+    def __init__(self, objects, shards, max_workers=4, max_retries=3, retry_delay=1.0, on_progress=None,
+                 buffer_size=1000, **criteria):
+        self.objects = objects
+        self.shards = list(shards)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_progress = on_progress
+        self.buffer_size = buffer_size
+        self.criteria = criteria
+        self.keyset = 'keyset' in inspect.signature(objects.iter_query).parameters
+
+    @property
+    def records(self):
+        """Total number of records delivered so far."""
+        return sum(shard.records for shard in self.shards)
+
+    def __iter__(self):
+        # The workers queue (shard, record, progress, error) items: a record with the shard's progress after it, the
+        # progress of a completed shard without a record, or a shard's error. (None, None, None, None) ends a worker.
+        queue = Queue(maxsize=self.buffer_size)
+        stop = threading.Event()
+        pending = Queue()
+        shards = [shard for shard in self.shards if not shard.done]
+        for shard in shards:
+            pending.put(shard)
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def work():
+            while not stop.is_set():
+                try:
+                    shard = pending.get_nowait()
+                except Empty:
+                    break
+                try:
+                    self._export_shard(shard, put, stop)
+                except Exception as err:
+                    put((shard, None, None, err))
+                    return
+            put((None, None, None, None))
+
+        workers = [threading.Thread(target=propagate(work), name='pypardot-export-{0}'.format(i))
+                   for i in range(min(self.max_workers, len(shards)))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            finished = 0
+            while finished < len(workers):
+                shard, record, progress, error = queue.get()
+                if error is not None:
+                    shard.error = error
+                    raise error
+                if shard is None:
+                    finished += 1
+                    continue
+                shard.position, shard.last_id = progress
+                if record is None:
+                    shard.done = True
+                    if self.on_progress:
+                        self.on_progress(shard)
+                    continue
+                shard.records += 1
+                if self.on_progress and shard.records % 200 == 0:
+                    self.on_progress(shard)
+                yield record
+        finally:
+            stop.set()
+
+    def _export_shard(self, shard, put, stop):
+        """
+        Reads one shard into the output queue, retrying and resuming it on errors. Retries resume after the last
+        record queued; the shard itself only records the progress of the records taken from the queue.
+        """
+        position, last_id = shard.position, shard.last_id
+        attempt = 0
+        while True:
+            attempt += 1
+            shard.attempts += 1
+            try:
+                for record in self._iter_shard(shard, position, last_id):
+                    position += 1
+                    last_id = record['id']
+                    if shard.contains(record) and not put((shard, record, (position, last_id), None)):
+                        return
+                break
+            except Exception as err:
+                if stop.is_set() or attempt > self.max_retries or isinstance(err, PardotDeadlineExceeded):
+                    raise
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+        put((shard, None, (position, last_id), None))
+
+    def _iter_shard(self, shard, position, last_id):
+        """
+        Iterates the shard's query results from where it got to: after <last_id> when the object supports keyset
+        paging, otherwise at the offset <position> in id order.
+        """
+        criteria = dict(self.criteria, **shard.criteria())
+        if self.keyset:
+            start_id = last_id if last_id is not None else criteria.pop('id_greater_than', None)
+            return self.objects.iter_query(keyset=True, start_id=start_id, **criteria)
+        criteria.update({'sort_by': 'id', 'sort_order': 'ascending', 'offset': position})
+        return self.objects.iter_query(**criteria)
+
+
+def _format_date(value):
+    return value.strftime(DATE_FORMAT)
@@ -0,0 +1,634 @@
+"""
+An in-process stand-in for the Pardot API, for tests and benchmarks that must not touch a real account.
+
+FakePardot keeps its objects in memory and implements the login, query, read, create, update, upsert, assign,
+delete and batch endpoints of every object in pypardot.objects, with configurable latency, error injection and rate
+limits. It can be reached through a FakeTransport, without any sockets:
+
+    fake = FakePardot()
+    fake.generate('prospect', 1000)
+    p = PardotAPI(email='email', password='password', user_key='user_key', transport=FakeTransport(fake))
+
+or over real HTTP on localhost through a FakePardotServer, e.g. for the asynchronous client or connection pooling
+benchmarks:
+
+    with FakePardotServer(fake) as server:
+        p = PardotAPI(email='email', password='password', user_key='user_key', base_uri=server.base_uri)
+"""
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl, unquote, urlsplit
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import parse_qsl, urlsplit
+
+from requests.exceptions import ReadTimeout
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from .util import DATE_FORMAT
+
+# Key under which each object is returned, where it differs from the object name in the URL.
+RESULT_KEYS = {'visitorActivity': 'visitor_activity', 'listMembership': 'list_membership'}
+
+# Fields returned with output=mobile.
+MOBILE_FIELDS = ('id', 'email', 'first_name', 'last_name', 'company', 'name', 'type_name', 'created_at')
+
+# Pardot error codes and messages used by the fake.
+INVALID_API_KEY = (1, 'Invalid API key or user key')
+INVALID_ACTION = (2, 'Invalid action')
+INVALID_ID = (3, 'Invalid ID')
+INVALID_EMAIL = (4, 'Invalid prospect email address')
+LOGIN_FAILED = (15, 'Login failed')
+EMAIL_EXISTS = (16, 'A prospect with the specified email address already exists')
+TOO_MANY_CONCURRENT_REQUESTS = (66, 'You have exceeded your concurrent request limit. Please wait, before trying '
+                                    'this request again')
+DAILY_LIMIT_MET = (122, 'Daily API rate limit met')
+
+_PATH = re.compile(r'^/api/(?P<object>\w+)/version/\d+(?:/do/(?P<action>[^/]+)(?P<rest>/.*)?)?$')
+_AUTHORIZATION = re.compile(r'api_key=([^,\s]+)')
+_TYPE_NAMES = ('Visit', 'Email', 'Form', 'Click', 'File', 'Event', 'Webinar', 'Form Handler')
+
+
+class FakePardotError(Exception):
+    def __init__(self, error):
+        Exception.__init__(self, error[1])
+        self.err_code, self.message = error
+
+
+class FakePardot(object):
+    """
+    In-memory Pardot account. Logins are checked against <email>, <password> and <user_key> when given; each login
+    issues a new API key valid for <api_key_lifetime> seconds. Every request takes <latency> seconds (a number, or a
+    callable returning one). With <max_concurrent>, requests beyond that many in flight fail with error 66, and
+    with <daily_limit>, requests beyond that many fail with error 122.
+
+    Counters of logins, requests and requests rejected for an invalid API key are kept on the instance.
+    """
+
+    def __init__(self, email=None, password=None, user_key=None, api_key_lifetime=3600, latency=0,
+                 max_concurrent=None, daily_limit=None, seed=0):
+        self.email = email
+        self.password = password
+        self.user_key = user_key
+        self.api_key_lifetime = api_key_lifetime
+        self.latency = latency
+        self.max_concurrent = max_concurrent
+        self.daily_limit = daily_limit
+        self.objects = {}
+        self.api_keys = {}
+        self.logins = 0
+        self.requests = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failures = []
+        self._next_ids = {}
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+
+    # Test set-up helpers.
+
+    def add(self, object_name, **fields):
+        """Stores a new <object_name> object with the given fields and returns it. Missing ids and dates are set."""
+        with self._lock:
+            now = _now()
+            record = {'id': self._next_id(object_name, fields.get('id')), 'created_at': now, 'updated_at': now}
+            record.update(fields)
+            self.objects.setdefault(object_name, {})[int(record['id'])] = record
+            return record
+
+    def generate(self, object_name, count, start=datetime(2015, 1, 1), interval=timedelta(minutes=1), **fields):
+        """
+        Stores <count> objects of <object_name> with plausible data, created <interval> apart from <start>. Extra
+        keyword arguments override generated fields. Returns the new records.
+        """
+        records = []
+        for index in range(count):
+            created = (start + interval * index).strftime(DATE_FORMAT)
+            record = self._generated_fields(object_name, self._peek_id(object_name))
+            record.update({'created_at': created, 'updated_at': created})
+            record.update(fields)
+            records.append(self.add(object_name, **record))
+        return records
+
+    def fail_next(self, err_code=None, message='Injected error', status=None, count=1, match=None):
+        """
+        Makes the next <count> requests whose path contains <match> (any request if None) fail, either with a
+        Pardot error <err_code> and <message>, or with a non-JSON response with HTTP <status>.
+        """
+        with self._lock:
+            self._failures.append({'error': (err_code, message), 'status': status, 'count': count, 'match': match})
+
+    def expire_api_keys(self):
+        """Invalidates every API key issued so far, as if they had all expired."""
+        with self._lock:
+            self.api_keys.clear()
+
+    # Request handling.
+
+    def handle(self, method, url, params=None, data=None, headers=None, timeout=None):
+        """
+        Handles one API request and returns its (status, headers, body). <params> and <data> are dicts of the query
+        string and form parameters. If the request's latency exceeds its read <timeout>, raises ReadTimeout once the
+        timeout has elapsed, like requests would.
+        """
+        path = unquote(urlsplit(url).path)
+        params = _stringify(params)
+        params.update(_stringify(data))
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            in_flight = self.in_flight
+            requests = self.requests
+        try:
+            latency = self.latency() if callable(self.latency) else self.latency
+            read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+            if read_timeout is not None and latency > read_timeout:
+                time.sleep(read_timeout)
+                raise ReadTimeout('Fake Pardot read timed out. (read timeout={0})'.format(read_timeout))
+            if latency:
+                time.sleep(latency)
+            status = self._injected_failure(path)
+            if status is not None:
+                return status, {'Content-Type': 'text/html'}, b'<html>Service unavailable</html>'
+            if self.max_concurrent is not None and in_flight > self.max_concurrent:
+                raise FakePardotError(TOO_MANY_CONCURRENT_REQUESTS)
+            if self.daily_limit is not None and requests > self.daily_limit:
+                raise FakePardotError(DAILY_LIMIT_MET)
+            result = self._dispatch(path, params, headers or {})
+        except FakePardotError as err:
+            result = {'@attributes': {'stat': 'fail', 'version': 1, 'err_code': err.err_code}, 'err': err.message}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if result is None:
+            return 204, {}, b''
+        body = json.dumps(result).encode('utf-8')
+        return 200, {'Content-Type': 'application/json', 'Content-Length': str(len(body))}, body
+
+    def _injected_failure(self, path):
+        """Raises or returns the HTTP status of the next injected failure matching <path>, if any."""
+        with self._lock:
+            for failure in self._failures:
+                if failure['match'] is None or failure['match'] in path:
+                    failure['count'] -= 1
+                    if failure['count'] <= 0:
+                        self._failures.remove(failure)
+                    break
+            else:
+                return None
+        if failure['status'] is not None:
+            return failure['status']
+        raise FakePardotError(failure['error'])
+
+    def _dispatch(self, path, params, headers):
+        match = _PATH.match(path)
+        if match is None:
+            raise FakePardotError(INVALID_ACTION)
+        object_name, action = match.group('object'), match.group('action')
+        if object_name == 'login':
+            return self._login(params)
+        self._check_api_key(params, headers)
+        rest = [part for part in (match.group('rest') or '').split('/') if part]
+        selector = dict(zip(rest[::2], rest[1::2]))
+        handler = getattr(self, '_do_' + (action or ''), None)
+        if handler is None:
+            raise FakePardotError(INVALID_ACTION)
+        with self._lock:
+            return handler(object_name, selector, params)
+
+    def _login(self, params):
+        for field in ('email', 'password', 'user_key'):
+            expected = getattr(self, field)
+            if expected is not None and params.get(field) != expected:
+                raise FakePardotError(LOGIN_FAILED)
+        with self._lock:
+            self.logins += 1
+            api_key = 'fake-api-key-{0}'.format(self.logins)
+            self.api_keys[api_key] = time.time()
+        return {'@attributes': {'stat': 'ok', 'version': 1}, 'api_key': api_key}
+
+    def _check_api_key(self, params, headers):
+        match = _AUTHORIZATION.search(CaseInsensitiveDict(headers).get('Authorization', ''))
+        api_key = match.group(1) if match else params.get('api_key')
+        with self._lock:
+            issued_at = self.api_keys.get(api_key)
+            if issued_at is None or time.time() >= issued_at + self.api_key_lifetime:
+                self.rejected += 1
+                raise FakePardotError(INVALID_API_KEY)
+
+    # Endpoints, called with the lock held. <selector> holds the /id/<id> or /email/<email> part of the path.
+
+    def _do_query(self, object_name, selector, params):
+        records = [record for record in self.objects.get(object_name, {}).values() if _matches(record, params)]
+        sort_by = params.get('sort_by', 'id')
+        records.sort(key=lambda record: _sort_key(record.get(sort_by)),
+                     reverse=params.get('sort_order') == 'descending')
+        offset = int(params.get('offset', 0))
+        limit = min(int(params.get('limit', 200)), 200)
+        output = params.get('output', 'full')
+        fields = params['fields'].split(',') if params.get('fields') else None
+        page = [_output(record, output, fields) for record in records[offset:offset + limit]]
+        result = {}
+        if output != 'bulk':
+            result['total_results'] = len(records)
+        if len(page) == 1 and output != 'bulk':
+            result[_result_key(object_name)] = page[0]
+        elif page:
+            result[_result_key(object_name)] = page
+        return _ok(result=result)
+
+    def _do_read(self, object_name, selector, params):
+        return _ok(**{_result_key(object_name): self._find(object_name, selector)})
+
+    def _do_create(self, object_name, selector, params):
+        fields = _fields(params)
+        if 'email' in selector:
+            if object_name == 'prospect' and self._find_by_email(object_name, selector['email']) is not None:
+                raise FakePardotError(EMAIL_EXISTS)
+            fields['email'] = selector['email']
+        for key in ('prospect_id', 'prospect_email'):
+            if key in selector:
+                prospect = self._find('prospect', {key[len('prospect_'):]: selector[key]})
+                fields['prospect_id'] = prospect['id']
+        return _ok(**{_result_key(object_name): self.add(object_name, **fields)})
+
+    def _do_update(self, object_name, selector, params):
+        record = self._find(object_name, selector)
+        record.update(_fields(params))
+        record['updated_at'] = _now()
+        return _ok(**{_result_key(object_name): record})
+
+    def _do_upsert(self, object_name, selector, params):
+        try:
+            return self._do_update(object_name, selector, params)
+        except FakePardotError:
+            fields = _fields(params)
+            email = selector.get('email', fields.get('email'))
+            if email is not None and self._find_by_email(object_name, email) is not None:
+                return self._do_update(object_name, {'email': email}, params)
+            if email is None:
+                raise
+            return self._do_create(object_name, {'email': email}, params)
+
+    def _do_delete(self, object_name, selector, params):
+        record = self._find(object_name, selector)
+        del self.objects[object_name][int(record['id'])]
+        self.objects.setdefault('deleted_' + object_name, {})[int(record['id'])] = record
+        return None
+
+    def _do_undelete(self, object_name, selector, params):
+        record = self.objects.get('deleted_' + object_name, {}).pop(int(selector.get('id', 0)), None)
+        if record is None:
+            raise FakePardotError(INVALID_ID)
+        self.objects[object_name][int(record['id'])] = record
+        return None
+
+    def _do_assign(self, object_name, selector, params):
+        record = self._find(object_name, selector)
+        if object_name == 'visitor':
+            prospect = self._find('prospect', {'id': params['prospect_id']} if 'prospect_id' in params
+                                  else {'email': params.get('prospect_email')})
+            record['prospect_id'] = prospect['id']
+        else:
+            record['assigned_to'] = dict((key, params[key]) for key in ('user_email', 'user_id', 'group_id')
+                                         if key in params)
+        record['updated_at'] = _now()
+        return _ok(**{_result_key(object_name): record})
+
+    def _do_unassign(self, object_name, selector, params):
+        record = self._find(object_name, selector)
+        record.pop('assigned_to', None)
+        record['updated_at'] = _now()
+        return _ok(**{_result_key(object_name): record})
+
+    def _do_send(self, object_name, selector, params):
+        if 'prospect_email' in selector or 'prospect_id' in selector:
+            key = 'prospect_email' if 'prospect_email' in selector else 'prospect_id'
+            self._find('prospect', {key[len('prospect_'):]: selector[key]})
+        email = self.add('email', name=params.get('name', 'Email'), subject=params.get('subject'))
+        return _ok(email=email)
+
+    def _do_describe(self, object_name, selector, params):
+        fields = set()
+        for record in self.objects.get(object_name, {}).values():
+            fields.update(record)
+        return _ok(result={'field': [{'id': name, 'type': 'text'} for name in sorted(fields)]})
+
+    def _do_batchCreate(self, object_name, selector, params):
+        return self._batch(params, lambda fields: self._do_create(object_name, {'email': fields.get('email')},
+                                                                  fields))
+
+    def _do_batchUpdate(self, object_name, selector, params):
+        return self._batch(params, lambda fields: self._do_update(object_name, _selector(fields), fields))
+
+    def _do_batchUpsert(self, object_name, selector, params):
+        return self._batch(params, lambda fields: self._do_upsert(object_name, _selector(fields), fields))
+
+    def _batch(self, params, operation):
+        """Applies <operation> to every prospect in the batch, reporting failures under <errors> by position."""
+        try:
+            prospects = json.loads(params.get('prospects', ''))['prospects']
+        except (ValueError, KeyError, TypeError):
+            raise FakePardotError(INVALID_ACTION)
+        if isinstance(prospects, dict):
+            prospects = [dict(fields, **_selector_for_key(key)) for key, fields in prospects.items()]
+        if len(prospects) > 50:
+            raise FakePardotError((67, 'Batch size exceeds the limit of 50 prospects'))
+        errors = {}
+        for index, fields in enumerate(prospects):
+            if not fields.get('email') and not fields.get('id'):
+                errors[str(index)] = INVALID_EMAIL[1]
+                continue
+            try:
+                operation(dict((key, _stringify_value(value)) for key, value in fields.items()))
+            except FakePardotError as err:
+                errors[str(index)] = err.message
+        result = _ok()
+        if errors:
+            result['errors'] = errors
+        return result
+
+    # Lookups.
+
+    def _find(self, object_name, selector):
+        if 'id' in selector:
+            try:
+                record = self.objects.get(object_name, {}).get(int(selector['id']))
+            except ValueError:
+                record = None
+            if record is None:
+                raise FakePardotError(INVALID_ID)
+            return record
+        if 'email' in selector:
+            record = self._find_by_email(object_name, selector['email'])
+            if record is None:
+                raise FakePardotError(INVALID_EMAIL)
+            return record
+        raise FakePardotError(INVALID_ACTION)
+
+    def _find_by_email(self, object_name, email):
+        email = (email or '').lower()
+        for record in self.objects.get(object_name, {}).values():
+            if str(record.get('email', '')).lower() == email:
+                return record
+        return None
+
+    def _peek_id(self, object_name):
+        return self._next_ids.get(object_name, 1)
+
+    def _next_id(self, object_name, requested=None):
+        if requested is not None:
+            self._next_ids[object_name] = max(self._peek_id(object_name), int(requested) + 1)
+            return int(requested)
+        next_id = self._peek_id(object_name)
+        self._next_ids[object_name] = next_id + 1
+        return next_id
+
+    def _generated_fields(self, object_name, record_id):
+        """Plausible fields for generated objects, including the nested data Pardot returns with full output."""
+        rand = self._random
+        campaign = {'id': rand.randint(1, 20), 'name': 'Campaign {0}'.format(rand.randint(1, 20))}
+        if object_name == 'prospect':
+            return {
+                'email': 'prospect{0}@example.com'.format(record_id),
+                'first_name': 'First{0}'.format(record_id),
+                'last_name': 'Last{0}'.format(record_id),
+                'company': 'Company {0}'.format(rand.randint(1, 500)),
+                'score': rand.randint(0, 300),
+                'grade': rand.choice(('A', 'B', 'C', 'D', 'F')),
+                'is_do_not_email': False,
+                'campaign': campaign,
+                'visitor_activities': {'visitor_activity': [
+                    {'id': record_id * 10 + index, 'type': 2, 'type_name': rand.choice(_TYPE_NAMES),
+                     'details': 'Activity {0}'.format(index)} for index in range(3)]},
+                'lists': {'list_subscription': [
+                    {'id': record_id * 10 + index, 'did_opt_in': False, 'did_opt_out': False,
+                     'list': {'id': index + 1, 'name': 'List {0}'.format(index + 1)}} for index in range(2)]},
+            }
+        if object_name == 'visitorActivity':
+            type_index = rand.randrange(len(_TYPE_NAMES))
+            return {'prospect_id': rand.randint(1, 1000), 'visitor_id': rand.randint(1, 1000),
+                    'type': type_index + 1, 'type_name': _TYPE_NAMES[type_index],
+                    'details': 'https://www.example.com/page-{0}'.format(rand.randint(1, 100)), 'campaign': campaign}
+        if object_name == 'visitor':
+            return {'prospect_id': rand.randint(1, 1000), 'page_view_count': rand.randint(1, 50),
+                    'ip_address': '10.0.{0}.{1}'.format(rand.randint(0, 255), rand.randint(1, 254))}
+        if object_name == 'visit':
+            return {'visitor_id': rand.randint(1, 1000), 'prospect_id': rand.randint(1, 1000),
+                    'visitor_page_view_count': rand.randint(1, 20), 'duration_in_seconds': rand.randint(1, 600)}
+        if object_name == 'opportunity':
+            return {'name': 'Opportunity {0}'.format(record_id), 'value': rand.randint(100, 100000),
+                    'probability': rand.randint(0, 100), 'stage': 'Prospecting', 'campaign': campaign}
+        if object_name == 'user':
+            return {'email': 'user{0}@example.com'.format(record_id), 'first_name': 'User',
+                    'last_name': str(record_id), 'role': 'Sales'}
+        return {'name': '{0} {1}'.format(object_name, record_id)}
+
+
+class FakeResponse(object):
+    """The subset of requests.Response used by PardotAPI."""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeTransport(object):
+    """PardotAPI transport answering every request from a FakePardot, in process."""
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        start = time.time()
+        response = FakeResponse(*self.fake.handle(method, url, params=params, data=data, headers=headers,
+                                                  timeout=timeout))
+        response.timings = {'server': time.time() - start}
+        return response
+
+    def close(self):
+        pass
+
+
+class FakePardotServer(object):
+    """
+    Serves a FakePardot over HTTP on <host>:<port> (a free port by default) from a background thread. Use as a
+    context manager, or call start() and stop(); clients reach it at <base_uri>.
+    """
+
+    def __init__(self, fake=None, host='127.0.0.1', port=0):
+        self.fake = fake if fake is not None else FakePardot()
+        self.server = _ThreadingHTTPServer((host, port), _FakePardotHandler)
+        self.server.fake = self.fake
+        self.thread = None
+
+    @property
+    def base_uri(self):
+        return 'http://{0}:{1}'.format(*self.server.server_address[:2])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='pypardot-fake-server')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _FakePardotHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode('utf-8'))) if length else {}
+        url = urlsplit(self.path)
+        status, headers, body = self.server.fake.handle(self.command, self.path, params=dict(parse_qsl(url.query)),
+                                                        data=form, headers=dict(self.headers.items()))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(body)))
+        if self.headers.get('Connection', '').lower() == 'close':
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _ok(**fields):
+    result = {'@attributes': {'stat': 'ok', 'version': 1}}
+    result.update(fields)
+    return result
+
+
+def _now():
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def _result_key(object_name):
+    return RESULT_KEYS.get(object_name, object_name)
+
+
+def _stringify_value(value):
+    if isinstance(value, (dict, list)):
+        return value
+    return str(value)
+
+
+def _stringify(params):
+    """Converts parameter values the way requests sends them, dropping None values."""
+    return dict((key, str(value)) for key, value in (params or {}).items() if value is not None)
+
+
+def _fields(params):
+    """The object fields set by a request, i.e. its parameters minus the API's own."""
+    return dict((key, value) for key, value in params.items()
+                if key not in ('format', 'api_key', 'user_key', 'output', 'prospects', 'id'))
+
+
+def _selector(fields):
+    return {'id': fields['id']} if fields.get('id') else {'email': fields.get('email')}
+
+
+def _selector_for_key(key):
+    return {'email': key} if '@' in key else {'id': key}
+
+
+def _sort_key(value):
+    if value is None:
+        return (0, 0)
+    try:
+        return (1, float(value))
+    except (TypeError, ValueError):
+        return (2, str(value))
+
+
+def _parse_time(value):
+    """Parses a search criteria time: a date, a date and time, or one of the relative keywords the fake supports."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    keywords = {'today': today, 'yesterday': today - timedelta(days=1),
+                'last_7_days': today - timedelta(days=7), 'this_month': today.replace(day=1)}
+    if value in keywords:
+        return keywords[value].strftime(DATE_FORMAT)
+    for date_format in (DATE_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, date_format).strftime(DATE_FORMAT)
+        except ValueError:
+            continue
+    raise FakePardotError((32, 'Invalid time specified'))
+
+
+def _matches(record, params):
+    """Applies the supported search criteria to <record>."""
+    record_id = int(record['id'])
+    if 'id_greater_than' in params and record_id <= int(params['id_greater_than']):
+        return False
+    if 'id_less_than' in params and record_id >= int(params['id_less_than']):
+        return False
+    for criterion, value in params.items():
+        if criterion == 'ids' or criterion.endswith('_ids'):
+            field = 'id' if criterion == 'ids' else criterion[:-len('s')]
+            if str(record.get(field)) not in value.replace(' ', '').split(','):
+                return False
+        for suffix, keep in (('_after', lambda field, bound: field > bound),
+                             ('_before', lambda field, bound: field < bound)):
+            if criterion in ('created' + suffix, 'updated' + suffix):
+                field = record.get(criterion[:-len(suffix)] + '_at')
+                if field is None or not keep(field, _parse_time(value)):
+                    return False
+    return True
+
+
+def _output(record, output, fields=None):
+    """Shapes a query result for the requested output format and <fields>."""
+    if fields is not None:
+        return dict((key, value) for key, value in record.items() if key == 'id' or key in fields)
+    if output == 'mobile':
+        return dict((key, value) for key, value in record.items() if key in MOBILE_FIELDS)
+    if output in ('simple', 'bulk'):
+        return dict((key, value) for key, value in record.items() if not isinstance(value, (dict, list)))
+    return record
@@ -0,0 +1,81 @@
+import time
+
+
+class RequestEvent(object):
+    """
+    Describes one API call made through PardotAPI.get or post, from the first attempt to the final response or error,
+    including any retries. Times are in seconds, and add up over all the attempts of the call:
+
+    <dns>, <connect> and <tls> are the time spent resolving the host, opening the TCP connection and negotiating TLS.
+    They are None when no new connection was opened or the transport cannot tell; the default transport measures
+    name resolution together with the connection, so <dns> is always None with it.
+    <server> is the time from sending the request until the response headers arrived, <transfer> the time spent
+    reading the response body and <decode> the time spent decoding and checking the JSON response.
+    <rate_limit_wait> is the time spent waiting on the client's rate limiter.
+
+    <response_bytes> is the size of the response bodies, <status_code> the HTTP status of the last response,
+    <attempts> the number of requests sent, <retries> the number of retries made by the retry policy and
+    <auth_refreshed> whether the client had to log in during the call (the login itself is reported as a call of its
+    own, and the request re-sent after it counts as an attempt). <error> is the exception the call raised,
+    if any, and <duration> the total time the call took.
+    """
+
+    def __init__(self, method, object_name, path):
+        self.method = method
+        self.object_name = object_name
+        self.path = path
+        self.started = time.time()
+        self.duration = None
+        self.dns = None
+        self.connect = None
+        self.tls = None
+        self.server = None
+        self.transfer = None
+        self.decode = None
+        self.rate_limit_wait = 0.0
+        self.response_bytes = 0
+        self.status_code = None
+        self.attempts = 0
+        self.retries = 0
+        self.auth_refreshed = False
+        self.error = None
+
+    @property
+    def err_code(self):
+        """The Pardot error code of the call's error, or None."""
+        return getattr(self.error, 'err_code', None)
+
+    def add_timing(self, name, seconds):
+        if seconds is not None:
+            setattr(self, name, (getattr(self, name) or 0.0) + seconds)
+
+    def record_response(self, response):
+        """Adds the size and the transport's timings (if any) of one attempt's <response>."""
+        self.status_code = response.status_code
+        self.response_bytes += len(response.content or b'')
+        timings = getattr(response, 'timings', None) or {}
+        for name in ('dns', 'connect', 'tls', 'server', 'transfer'):
+            self.add_timing(name, timings.get(name))
+
+    def finish(self):
+        self.duration = time.time() - self.started
+
+    def __repr__(self):
+        return '<RequestEvent {0} {1}{2} {3}>'.format(self.method.upper(), self.object_name, self.path or '',
+                                                      'in progress' if self.duration is None else
+                                                      '{0:.3f}s'.format(self.duration))
+
+
+class RequestHook(object):
+    """
+    Base class for the <hooks> passed to PardotAPI, which are told about every API call the client makes. Hooks are
+    called on the thread making the call, so they must be thread-safe, quick, and must not raise.
+    """
+
+    def on_request_start(self, event):
+        """Called with a new RequestEvent before the call's first attempt."""
+        pass
+
+    def on_request_end(self, event):
+        """Called with the completed RequestEvent once the call has returned or raised."""
+        pass
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import sqlite3
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from .util import write_atomic
+
+
+def key_identity(email, user_key, base_uri):
+    """
+    Returns the name under which a user's API key is stored: a hash of the credentials it belongs to, so that the
+    store never contains the email address or user key themselves.
+    """
+    return hashlib.sha256('{0}\0{1}\0{2}'.format(email, user_key, base_uri).encode('utf-8')).hexdigest()
+
+
+class FileKeyStore(object):
+    """
+    Shares API keys between processes, and across restarts, through a JSON file at <path>. Reads and writes are
+    serialized with a lock file next to it, and the file is replaced atomically so readers never see a partial write.
+    The file is only readable by its owner, as it holds live API keys. Requires fcntl (POSIX systems only).
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError('FileKeyStore requires fcntl (POSIX systems only), use SQLiteKeyStore instead.')
+        self.path = path
+        self.lock_path = path + '.lock'
+
+    def get(self, identity):
+        """Returns the (api_key, issued_at) stored for <identity>, or None."""
+        with self._locked(fcntl.LOCK_SH):
+            entry = self._read().get(identity)
+        if entry is None:
+            return None
+        return entry['api_key'], entry['issued_at']
+
+    def set(self, identity, api_key, issued_at):
+        with self._locked(fcntl.LOCK_EX):
+            keys = self._read()
+            keys[identity] = {'api_key': api_key, 'issued_at': issued_at}
+            self._write(keys)
+
+    def invalidate(self, identity, api_key):
+        """Forgets the key stored for <identity> if it is <api_key>, the key the API just rejected."""
+        with self._locked(fcntl.LOCK_EX):
+            keys = self._read()
+            if keys.get(identity, {}).get('api_key') == api_key:
+                del keys[identity]
+                self._write(keys)
+
+    def _locked(self, operation):
+        return _FileLock(self.lock_path, operation)
+
+    def _read(self):
+        try:
+            with open(self.path) as keys:
+                return json.load(keys)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write(self, keys):
+        write_atomic(self.path, json.dumps(keys))
+
+
+class SQLiteKeyStore(object):
+    """Shares API keys between processes, and across restarts, through an SQLite database at <path>."""
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS api_keys '
+                               '(identity TEXT PRIMARY KEY, api_key TEXT NOT NULL, issued_at REAL NOT NULL)')
+
+    def get(self, identity):
+        """Returns the (api_key, issued_at) stored for <identity>, or None."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT api_key, issued_at FROM api_keys WHERE identity = ?',
+                                     (identity,)).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, identity, api_key, issued_at):
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO api_keys (identity, api_key, issued_at) VALUES (?, ?, ?)',
+                               (identity, api_key, issued_at))
+
+    def invalidate(self, identity, api_key):
+        """Forgets the key stored for <identity> if it is <api_key>, the key the API just rejected."""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM api_keys WHERE identity = ? AND api_key = ?', (identity, api_key))
+
+    def _connect(self):
+        # A connection per operation keeps the store safe to use from any thread or process.
+        return _closing_connection(sqlite3.connect(self.path, timeout=self.timeout))
+
+
+class _FileLock(object):
+    def __init__(self, path, operation):
+        self.path = path
+        self.operation = operation
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, self.operation)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+class _closing_connection(object):
+    """Commits (or rolls back) and then closes an SQLite connection when the with block ends."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
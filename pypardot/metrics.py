@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from .errors import PardotAPIError
+from .hooks import RequestHook
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsRegistry(RequestHook):
+    """
+    Collects metrics about the calls made by the clients it is a hook of, and renders them in the Prometheus text
+    exposition format:
+
+    pardot_request_duration_seconds, a histogram of call latency per object and operation (e.g. prospect, read);
+    pardot_api_calls_total, the requests counting against the account's daily API quota, retries and logins
+    included; pardot_errors_total, failed calls per Pardot error code, or per exception type for calls that failed
+    without a Pardot error; pardot_requests_in_flight, the calls currently in progress; and the retries, logins,
+    response bytes and rate limiter wait of calls.
+
+    pardot_api_quota_used counts the requests sent since midnight, which is midnight UTC shifted by <timezone_offset>
+    seconds to match the account's time zone. With <daily_limit>, the account's daily API call limit,
+    pardot_api_quota_remaining reports what is left of it. Caches registered with track_cache() are reported as
+    pardot_cache_hits_total, pardot_cache_misses_total and pardot_cache_hit_ratio.
+
+    One registry can be shared by several clients, and is thread-safe.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, daily_limit=None, timezone_offset=0):
+        self.buckets = tuple(sorted(buckets))
+        self.daily_limit = daily_limit
+        self.timezone_offset = timezone_offset
+        self.latency = {}
+        self.calls = {}
+        self.errors = {}
+        self.retries = {}
+        self.response_bytes = {}
+        self.rate_limit_wait = {}
+        self.auth_refreshes = 0
+        self.in_flight = 0
+        self.quota_day = None
+        self.quota_used = 0
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def on_request_start(self, event):
+        with self._lock:
+            self.in_flight += 1
+
+    def on_request_end(self, event):
+        labels = (event.object_name, _operation(event.path))
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self.latency.get(labels)
+            if histogram is None:
+                histogram = self.latency[labels] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            histogram['counts'][bisect_left(self.buckets, event.duration)] += 1
+            histogram['sum'] += event.duration
+
+            _increment(self.calls, labels, event.attempts)
+            _increment(self.retries, labels, event.retries)
+            _increment(self.response_bytes, labels, event.response_bytes)
+            _increment(self.rate_limit_wait, labels, event.rate_limit_wait)
+            if event.auth_refreshed:
+                self.auth_refreshes += 1
+            if event.error is not None:
+                if isinstance(event.error, PardotAPIError):
+                    code = str(event.error.err_code)
+                else:
+                    code = type(event.error).__name__
+                _increment(self.errors, labels + (code,), 1)
+
+            day = self._today()
+            if day != self.quota_day:
+                self.quota_day, self.quota_used = day, 0
+            self.quota_used += event.attempts
+
+    def track_cache(self, name, cache):
+        """Reports the hit ratio of <cache>, any object with <hits> and <misses> counters, under <name>."""
+        with self._lock:
+            self.caches[name] = cache
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.extend(_header('pardot_request_duration_seconds', 'histogram',
+                                 'Latency of API calls, retries included.'))
+            for labels, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), histogram['counts']):
+                    cumulative += count
+                    lines.append(_sample('pardot_request_duration_seconds_bucket',
+                                         _labels(labels, ('le', _format_bound(bound))), cumulative))
+                lines.append(_sample('pardot_request_duration_seconds_sum', _labels(labels), histogram['sum']))
+                lines.append(_sample('pardot_request_duration_seconds_count', _labels(labels), cumulative))
+
+            for name, kind, description, values, extra in (
+                    ('pardot_api_calls_total', 'counter', 'API requests sent, retries and logins included.',
+                     self.calls, ()),
+                    ('pardot_errors_total', 'counter', 'Failed API calls by Pardot error code or exception type.',
+                     self.errors, ('err_code',)),
+                    ('pardot_retries_total', 'counter', 'Retries made by the retry policy.', self.retries, ()),
+                    ('pardot_response_bytes_total', 'counter', 'Size of API response bodies.',
+                     self.response_bytes, ()),
+                    ('pardot_rate_limit_wait_seconds_total', 'counter', 'Time calls waited on the rate limiter.',
+                     self.rate_limit_wait, ())):
+                lines.extend(_header(name, kind, description))
+                for labels, value in sorted(values.items()):
+                    lines.append(_sample(name, _labels(labels[:2], *zip(extra, labels[2:])), value))
+
+            lines.extend(_header('pardot_auth_refreshes_total', 'counter', 'Calls that had to log in first.'))
+            lines.append(_sample('pardot_auth_refreshes_total', '', self.auth_refreshes))
+            lines.extend(_header('pardot_requests_in_flight', 'gauge', 'API calls in progress.'))
+            lines.append(_sample('pardot_requests_in_flight', '', self.in_flight))
+
+            quota_used = self.quota_used if self.quota_day == self._today() else 0
+            lines.extend(_header('pardot_api_quota_used', 'gauge', 'API requests sent today.'))
+            lines.append(_sample('pardot_api_quota_used', '', quota_used))
+            if self.daily_limit is not None:
+                lines.extend(_header('pardot_api_quota_remaining', 'gauge', 'API requests left in the daily quota.'))
+                lines.append(_sample('pardot_api_quota_remaining', '', max(0, self.daily_limit - quota_used)))
+
+            caches = sorted(self.caches.items())
+        if caches:
+            stats = [(name, cache.hits, cache.misses) for name, cache in caches]
+            for name, kind, description, value in (
+                    ('pardot_cache_hits_total', 'counter', 'Cache hits.', lambda hits, misses: hits),
+                    ('pardot_cache_misses_total', 'counter', 'Cache misses.', lambda hits, misses: misses),
+                    ('pardot_cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits.',
+                     lambda hits, misses: float(hits) / (hits + misses) if hits + misses else 0.0)):
+                lines.extend(_header(name, kind, description))
+                for cache, hits, misses in stats:
+                    lines.append(_sample(name, _labels((), ('cache', cache)), value(hits, misses)))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9120, host='127.0.0.1'):
+        """
+        Serves the metrics over HTTP at http://<host>:<port>/metrics from a background thread, for Prometheus to
+        scrape. Returns the server; call its shutdown() method to stop it.
+        """
+        server = _MetricsServer((host, port), _MetricsHandler)
+        server.registry = self
+        thread = threading.Thread(target=server.serve_forever, name='pypardot-metrics')
+        thread.daemon = True
+        thread.start()
+        return server
+
+    def _today(self):
+        return int((time.time() + self.timezone_offset) // 86400)
+
+
+class _MetricsServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _operation(path):
+    """The operation of a call from its path, e.g. 'read' for '/do/read/id/1'."""
+    parts = (path or '').strip('/').split('/')
+    if len(parts) >= 2 and parts[0] == 'do':
+        return parts[1]
+    return parts[0]
+
+
+def _increment(values, labels, amount):
+    values[labels] = values.get(labels, 0) + amount
+
+
+def _header(name, kind, description):
+    return ['# HELP {0} {1}'.format(name, description), '# TYPE {0} {1}'.format(name, kind)]
+
+
+def _labels(object_operation, *extra):
+    pairs = list(zip(('object', 'operation'), object_operation)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _sample(name, labels, value):
+    if isinstance(value, float):
+        value = repr(value)
+    return '{0}{1} {2}'.format(name, labels, value)
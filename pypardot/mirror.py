@@ -0,0 +1,355 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from .errors import PardotMirrorStale
+from .paging import PAGE_SIZE, iter_records
+from .sync import IncrementalSync
+from .util import DATE_FORMAT
+
+# What to do with a read when the mirror of its object is older than the staleness bound: send it to the API, raise
+# PardotMirrorStale, or refresh the object's mirror first.
+STALE_FALLBACK = 'fallback'
+STALE_RAISE = 'raise'
+STALE_REFRESH = 'refresh'
+
+# The mirrored objects, by the name of their accessor on the client: the key of their records in API responses, the
+# read methods served locally with the field each looks records up by, how changes are found ('updated' or 'id' for
+# an IncrementalSync by that field, 'full' to read every record each time, 'visitors' for visits, which are read for
+# the visitors that changed) and the fields stored in indexed columns, which queries can filter on.
+OBJECTS = OrderedDict([
+    ('prospects', {'key': 'prospect', 'reads': {'read_by_id': 'id', 'read_by_email': 'email'}, 'sync': 'updated',
+                   'columns': ('email',)}),
+    ('accounts', {'key': 'prospectAccount', 'reads': {'read': 'id'}, 'sync': 'updated', 'columns': ()}),
+    ('campaigns', {'key': 'campaign', 'reads': {'read_by_id': 'id'}, 'sync': 'full', 'columns': ()}),
+    ('lists', {'key': 'list', 'reads': {'read': 'id'}, 'sync': 'updated', 'columns': ()}),
+    ('users', {'key': 'user', 'reads': {'read_by_id': 'id', 'read_by_email': 'email'}, 'sync': 'updated',
+               'columns': ('email',)}),
+    ('opportunities', {'key': 'opportunity', 'reads': {'read': 'id'}, 'sync': 'updated', 'columns': ()}),
+    ('visitors', {'key': 'visitor', 'reads': {'read': 'id'}, 'sync': 'updated', 'columns': ('prospect_id',)}),
+    ('visits', {'key': 'visit', 'reads': {'read': 'id'}, 'sync': 'visitors',
+                'columns': ('visitor_id', 'prospect_id')}),
+    ('visitoractivities', {'key': 'visitor_activity', 'reads': {'read': 'id'}, 'sync': 'id',
+                           'columns': ('prospect_id', 'visitor_id')}),
+])
+
+# Visitors whose visits are read with each visits query.
+VISITS_BATCH = 100
+
+
+class Mirror(object):
+    """
+    A local copy of Pardot objects in the SQLite database at <path>, kept up to date by refresh(), which reads the
+    records that changed since its previous call with IncrementalSync (see pypardot.sync). The mirror has the same
+    accessors as the client, and they have the same read and query methods as the client's, answered from the
+    database:
+
+        mirror = Mirror(p, '/var/lib/pardot/mirror.db', max_staleness=900)
+        mirror.refresh()
+        prospect = mirror.prospects.read_by_email(email='joe@company.com')['prospect']
+        for activity in mirror.visitoractivities.iter_query(prospect_ids='1,2,3'):
+            ...
+
+    Records are looked up by id, and email for prospects and users, through the primary key and indexes. Queries
+    are run locally if their criteria are ones the mirror can apply: ids, id_greater_than, id_less_than,
+    created_after/before and updated_after/before (as dates or dates and times), the *_ids criteria of the indexed
+    columns (e.g. prospect_ids for visitor activities), sort_by id, created_at or updated_at, limit, offset, fields
+    and output (full, simple or bulk). Anything else, a read that misses, and every other method (e.g. writes) go to
+    the API through the client.
+
+    Reads are answered locally only if the object's mirror was last refreshed within <max_staleness> seconds, so
+    they never reflect Pardot as it was more than that long ago, give or take the sync's overlap (see
+    IncrementalSync). Otherwise, with <stale> 'fallback' (the default) the read goes to the API, with 'refresh' the
+    object is refreshed first, and with 'raise' PardotMirrorStale is raised. Records deleted in Pardot are not
+    removed from the mirror. <objects> lists the accessor names to mirror, all of OBJECTS by default. <hits> and
+    <misses> count the reads answered locally and those sent to the API (see MetricsRegistry.track_cache).
+    """
+
+    def __init__(self, client, path, objects=None, max_staleness=900, stale=STALE_FALLBACK, overlap=300):
+        if stale not in (STALE_FALLBACK, STALE_RAISE, STALE_REFRESH):
+            raise ValueError('stale must be one of fallback, raise or refresh, not {0!r}'.format(stale))
+        self.client = client
+        self.path = path
+        self.names = list(objects or OBJECTS)
+        if 'visits' in self.names and 'visitors' not in self.names:
+            raise ValueError('Visits can only be mirrored along with visitors')
+        self.max_staleness = max_staleness
+        self.stale = stale
+        self.overlap = overlap
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._refreshed = {}
+        connection = self._connection()
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS mirror_state '
+                               '(name TEXT PRIMARY KEY, refreshed_at REAL, watermark TEXT)')
+            for name in self.names:
+                columns = OBJECTS[name]['columns']
+                connection.execute('CREATE TABLE IF NOT EXISTS {0} (id INTEGER PRIMARY KEY, created_at TEXT, '
+                                   'updated_at TEXT, {1}data TEXT NOT NULL)'.format(
+                                       name, ''.join('{0} {1}, '.format(column, _column_type(column))
+                                                     for column in columns)))
+                for column in ('created_at', 'updated_at') + columns:
+                    connection.execute('CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})'.format(name, column))
+        for name in self.names:
+            setattr(self, name, MirroredObject(self, name))
+
+    def refresh(self, objects=None):
+        """
+        Brings the mirror of <objects> (accessor names, all mirrored objects by default) up to date, and returns the
+        number of records read for each. Visits are read for the visitors that changed, so they should be refreshed
+        along with visitors.
+        """
+        counts = OrderedDict()
+        with self._refresh_lock:
+            for name in objects or self.names:
+                started = time.time()
+                counts[name] = getattr(self, '_refresh_' + OBJECTS[name]['sync'])(name)
+                connection = self._connection()
+                with connection:
+                    connection.execute('INSERT OR IGNORE INTO mirror_state (name) VALUES (?)', (name,))
+                    connection.execute('UPDATE mirror_state SET refreshed_at = ? WHERE name = ?', (started, name))
+                self._refreshed[name] = started
+        return counts
+
+    def refreshed_at(self, name):
+        """The time (as returned by time.time()) the object's last refresh started, or None."""
+        refreshed = self._refreshed.get(name)
+        if refreshed is None or time.time() - refreshed > self.max_staleness:
+            # Another process sharing the database may have refreshed it since.
+            row = self._connection().execute('SELECT refreshed_at FROM mirror_state WHERE name = ?',
+                                             (name,)).fetchone()
+            if row is not None and row[0] is not None:
+                refreshed = self._refreshed[name] = row[0]
+        return refreshed
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _fresh(self, name):
+        """Whether reads of <name> can be answered locally, refreshing it first or raising as <stale> says."""
+        refreshed = self.refreshed_at(name)
+        if refreshed is not None and time.time() - refreshed <= self.max_staleness:
+            return True
+        if self.stale == STALE_RAISE:
+            raise PardotMirrorStale('The mirror of {0} was last refreshed {1}'.format(
+                name, 'never' if refreshed is None else '{0:.0f}s ago'.format(time.time() - refreshed)))
+        if self.stale == STALE_REFRESH:
+            self.refresh([name])
+            return True
+        return False
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _store(self, connection, name, records):
+        columns = OBJECTS[name]['columns']
+        statement = 'INSERT OR REPLACE INTO {0} (id, created_at, updated_at, {1}data) VALUES (?, ?, ?, {2}?)'.format(
+            name, ''.join(column + ', ' for column in columns), '?, ' * len(columns))
+        connection.executemany(statement, (
+            [record['id'], record.get('created_at'), record.get('updated_at')] +
+            [record.get(column) for column in columns] + [json.dumps(record)] for record in records))
+
+    def _sync(self, name, field):
+        connection = self._connection()
+        page = []
+
+        def commit():
+            # The records delivered so far must be stored before the sync's checkpoint moves past them.
+            self._store(connection, name, page)
+            connection.commit()
+            del page[:]
+
+        sync = IncrementalSync(getattr(self.client, name), self._checkpoint_path(name), field=field,
+                               overlap=self.overlap, on_checkpoint=commit)
+        for record in sync:
+            page.append(record)
+        return sync.delivered
+
+    def _refresh_updated(self, name):
+        return self._sync(name, 'updated')
+
+    def _refresh_id(self, name):
+        return self._sync(name, 'id')
+
+    def _refresh_full(self, name):
+        connection = self._connection()
+        records = list(getattr(self.client, name).iter_query())
+        with connection:
+            connection.execute('DELETE FROM {0}'.format(name))
+            self._store(connection, name, records)
+        return len(records)
+
+    def _refresh_visitors(self, name):
+        """Reads the visits of the visitors updated since the visits were last refreshed, less the overlap."""
+        connection = self._connection()
+        row = connection.execute('SELECT watermark FROM mirror_state WHERE name = ?', (name,)).fetchone()
+        watermark = row[0] if row else None
+        since = _before(watermark, self.overlap) if watermark else ''
+        visitors = connection.execute('SELECT id, updated_at FROM visitors WHERE updated_at > ? ORDER BY id',
+                                      (since,)).fetchall()
+        count = 0
+        for start in range(0, len(visitors), VISITS_BATCH):
+            ids = ','.join(str(visitor_id) for visitor_id, updated_at in visitors[start:start + VISITS_BATCH])
+            records = list(getattr(self.client, name).iter_query(visitor_ids=ids))
+            with connection:
+                self._store(connection, name, records)
+            count += len(records)
+        latest = max([updated_at for visitor_id, updated_at in visitors if updated_at] or [watermark])
+        with connection:
+            connection.execute('INSERT OR IGNORE INTO mirror_state (name) VALUES (?)', (name,))
+            connection.execute('UPDATE mirror_state SET watermark = ? WHERE name = ?', (latest, name))
+        return count
+
+    def _checkpoint_path(self, name):
+        return '{0}.{1}.sync.json'.format(os.path.splitext(self.path)[0], name)
+
+
+class MirroredObject(object):
+    """
+    One object of a Mirror, with the read and query methods of the client's accessor answered from the mirror when
+    it is fresh enough. Other methods are the client's.
+    """
+
+    def __init__(self, mirror, name):
+        self.mirror = mirror
+        self.name = name
+        self.objects = getattr(mirror.client, name)
+        self.key = OBJECTS[name]['key']
+        self.columns = OBJECTS[name]['columns']
+        self.reads = OBJECTS[name]['reads']
+
+    def __getattr__(self, attribute):
+        field = self.__dict__.get('reads', {}).get(attribute)
+        if field is None:
+            return getattr(self.objects, attribute)
+
+        def read(*args, **kwargs):
+            value = args[0] if args else kwargs.pop(field, None)
+            if not kwargs and value is not None and self.mirror._fresh(self.name):
+                record = self._read(field, value)
+                if record is not None:
+                    self.mirror.hits += 1
+                    return {self.key: record}
+            self.mirror.misses += 1
+            return getattr(self.objects, attribute)(**dict(kwargs, **{field: value}))
+        return read
+
+    def query(self, output=None, fields=None, **criteria):
+        """Returns the records matching <criteria>, like the client's query method."""
+        select = _select(self.name, self.columns, criteria) if output in (None, 'full', 'simple', 'bulk') else None
+        if select is None or not self.mirror._fresh(self.name):
+            self.mirror.misses += 1
+            return self.objects.query(output=output, fields=fields, **criteria)
+        self.mirror.hits += 1
+        where, parameters, order, limit, offset = select
+        connection = self.mirror._connection()
+        rows = connection.execute('SELECT data FROM {0}{1}{2} LIMIT ? OFFSET ?'.format(self.name, where, order),
+                                  parameters + [limit, offset]).fetchall()
+        result = {self.key: [_project(json.loads(row[0]), output, fields) for row in rows]}
+        if output != 'bulk':
+            result['total_results'] = connection.execute('SELECT COUNT(*) FROM {0}{1}'.format(self.name, where),
+                                                         parameters).fetchone()[0]
+        return result
+
+    def iter_query(self, prefetch=False, keyset=False, start_id=None, **criteria):
+        """Yields the records matching <criteria> one at a time, like the client's iter_query method."""
+        return iter_records(self.query, self.key, prefetch=prefetch, keyset=keyset, start_id=start_id, **criteria)
+
+    def _read(self, field, value):
+        if field == 'email':
+            row = self.mirror._connection().execute(
+                'SELECT data FROM {0} WHERE email = ? LIMIT 1'.format(self.name), (value,)).fetchone()
+        else:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return None
+            row = self.mirror._connection().execute(
+                'SELECT data FROM {0} WHERE id = ?'.format(self.name), (value,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+
+def _select(name, columns, criteria):
+    """
+    Translates query <criteria> to a WHERE clause, its parameters, an ORDER BY clause, the limit and the offset, or
+    returns None if the mirror cannot apply them.
+    """
+    conditions, parameters = [], []
+    sort_by, sort_order = 'id', 'ascending'
+    limit, offset = PAGE_SIZE, 0
+    for criterion, value in criteria.items():
+        if criterion == 'limit':
+            limit = min(int(value), PAGE_SIZE)
+        elif criterion == 'offset':
+            offset = int(value)
+        elif criterion == 'sort_by':
+            if value not in ('id', 'created_at', 'updated_at'):
+                return None
+            sort_by = value
+        elif criterion == 'sort_order':
+            if value not in ('ascending', 'descending'):
+                return None
+            sort_order = value
+        elif criterion in ('id_greater_than', 'id_less_than'):
+            conditions.append('id {0} ?'.format('>' if criterion == 'id_greater_than' else '<'))
+            parameters.append(int(value))
+        elif criterion in ('created_after', 'created_before', 'updated_after', 'updated_before'):
+            timestamp = _timestamp(value)
+            if timestamp is None:
+                return None
+            field, bound = criterion.split('_')
+            conditions.append('{0}_at {1} ?'.format(field, '>' if bound == 'after' else '<'))
+            parameters.append(timestamp)
+        elif criterion == 'ids' or (criterion.endswith('_ids') and criterion[:-1] in columns):
+            ids = [int(part) for part in str(value).replace(' ', '').split(',') if part]
+            conditions.append('{0} IN ({1})'.format('id' if criterion == 'ids' else criterion[:-1],
+                                                    ', '.join('?' * len(ids))))
+            parameters.extend(ids)
+        else:
+            return None
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    order = ' ORDER BY {0} {1}, id'.format(sort_by, 'DESC' if sort_order == 'descending' else 'ASC')
+    return where, parameters, order, limit, offset
+
+
+def _timestamp(value):
+    """A date, or date and time, criterion in the format of the stored timestamps, or None for relative times."""
+    value = str(value)
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        return value + ' 00:00:00'
+    if len(value) == 19 and value[4] == '-' and value[10] == ' ':
+        return value
+    return None
+
+
+def _before(timestamp, seconds):
+    return (datetime.strptime(timestamp, DATE_FORMAT) - timedelta(seconds=seconds)).strftime(DATE_FORMAT)
+
+
+def _project(record, output, fields):
+    if fields is not None:
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        return dict((key, value) for key, value in record.items() if key == 'id' or key in fields)
+    if output in ('simple', 'bulk'):
+        return dict((key, value) for key, value in record.items() if not isinstance(value, (dict, list)))
+    return record
+
+
+def _column_type(column):
+    return 'TEXT COLLATE NOCASE' if column == 'email' else 'INTEGER'
@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Accounts(object):
     """
     A class to query and use Pardot accounts.
@@ -7,21 +10,23 @@ class Accounts(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the prospect accounts matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/prospect-accounts/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['prospectAccount'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['prospectAccount'] = []
-        elif result['total_results'] == 1:
-            result['prospectAccount'] = [result['prospectAccount']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'prospectAccount')
 
-        return result
+    def iter_query(self, prefetch=False, **kwargs):
+        """
+        Yields the prospect accounts matching the specified criteria parameters one at a time, paging through all
+        results. Set <prefetch> to fetch the next page on a background thread while the current one is being
+        consumed.
+        """
+        return iter_records(self.query, 'prospectAccount', prefetch=prefetch, **kwargs)
 
     def create(self, **kwargs):
         """Creates a new prospect account."""
@@ -41,7 +46,7 @@ class Accounts(object):
         Returns the data for the prospect account specified by <id>. <id> is the Pardot ID of the target prospect
         account.
         """
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
+        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs, coalesce=True)
         return response
 
     def update(self, id=None, **kwargs):
@@ -59,9 +64,9 @@ class Accounts(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='prospectAccount', path=None, params=None):
+    def _post(self, object_name='prospectAccount', path=None, params=None, coalesce=False):
         """POST requests for the Account object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
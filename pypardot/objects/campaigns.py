@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Campaigns(object):
     """
     A class to query and use Pardot campaigns.
@@ -7,26 +10,27 @@ class Campaigns(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the campaigns matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/campaigns/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['campaign'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['campaign'] = []
-        elif result['total_results'] == 1:
-            result['campaign'] = [result['campaign']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'campaign')
 
-        return result
+    def iter_query(self, prefetch=False, **kwargs):
+        """
+        Yields the campaigns matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        """
+        return iter_records(self.query, 'campaign', prefetch=prefetch, **kwargs)
 
     def read_by_id(self, id=None, **kwargs):
         """
         Returns the data for the campaign specified by <id>. <id> is the Pardot ID of the target campaign."""
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
+        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs, coalesce=True)
         return response
 
     def _get(self, object_name='campaign', path=None, params=None):
@@ -36,9 +40,9 @@ class Campaigns(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='campaign', path=None, params=None):
+    def _post(self, object_name='campaign', path=None, params=None, coalesce=False):
         """POST requests for the Campaign object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
@@ -38,7 +38,7 @@ class Emails(object):
 
     def read(self, id=None):
         """Returns the data for the email specified by <id>. <id> is the Pardot ID of the target email."""
-        response = self._post(path='/do/read/id/{id}'.format(id=id))
+        response = self._post(path='/do/read/id/{id}'.format(id=id), coalesce=True)
         return response
 
     def _get(self, object_name='email', path=None, params=None):
@@ -48,9 +48,9 @@ class Emails(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='email', path=None, params=None):
+    def _post(self, object_name='email', path=None, params=None, coalesce=False):
         """POST requests for the Email object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
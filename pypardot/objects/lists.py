@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Lists(object):
     """
     A class to query and use Pardot lists.
@@ -7,27 +10,28 @@ class Lists(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the lists matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/lists/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['list'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['list'] = []
-        elif result['total_results'] == 1:
-            result['list'] = [result['list']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'list')
 
-        return result
+    def iter_query(self, prefetch=False, **kwargs):
+        """
+        Yields the lists matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        """
+        return iter_records(self.query, 'list', prefetch=prefetch, **kwargs)
 
     def read(self, id=None):
         """
         Returns the data for the list specified by <id>.<id> is the Pardot ID of the target list.
         """
-        response = self._post(path='/do/read/id/{id}'.format(id=id))
+        response = self._post(path='/do/read/id/{id}'.format(id=id), coalesce=True)
         return response
 
     def _get(self, object_name='list', path=None, params=None):
@@ -37,9 +41,9 @@ class Lists(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='list', path=None, params=None):
+    def _post(self, object_name='list', path=None, params=None, coalesce=False):
         """POST requests for the List object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
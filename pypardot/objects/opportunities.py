@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Opportunities(object):
     """
     A class to query and use Pardot opportunities.
@@ -7,21 +10,22 @@ class Opportunities(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the opportunities matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/opportunities/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['opportunity'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['opportunity'] = []
-        elif result['total_results'] == 1:
-            result['opportunity'] = [result['opportunity']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'opportunity')
 
-        return result
+    def iter_query(self, prefetch=False, **kwargs):
+        """
+        Yields the opportunities matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        """
+        return iter_records(self.query, 'opportunity', prefetch=prefetch, **kwargs)
 
     def create_by_email(self, prospect_email=None, name=None, value=None, probability=None, **kwargs):
         """
@@ -48,7 +52,7 @@ class Opportunities(object):
         Returns the data for the opportunity specified by <id>, including campaign assignment and associated visitor
         activities. <id> is the Pardot ID for the target opportunity.
         """
-        response = self._post(path='/do/read/id/{id}'.format(id=id))
+        response = self._post(path='/do/read/id/{id}'.format(id=id), coalesce=True)
         return response
 
     def update(self, id=None):
@@ -83,9 +87,9 @@ class Opportunities(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='opportunity', path=None, params=None):
+    def _post(self, object_name='opportunity', path=None, params=None, coalesce=False):
         """POST requests for the Opportunity object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
@@ -1,4 +1,20 @@
-from ..errors import PardotAPIArgumentError
+from concurrent.futures import ThreadPoolExecutor
+
+from ..deadline import propagate
+from ..errors import PardotAPIArgumentError, PardotAPIError
+from ..paging import iter_records, query_params, query_result
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+# Pardot accepts at most 50 prospects per batch request.
+BATCH_SIZE = 50
+
+# Pardot error codes for a prospect id or email address that does not exist.
+INVALID_PROSPECT_ID = 3
+INVALID_PROSPECT_EMAIL = 4
 
 
 class Prospects(object):
@@ -7,24 +23,38 @@ class Prospects(object):
     Prospect field reference: http://developer.pardot.com/kb/api-version-3/object-field-references/#prospect
     """
 
-    def __init__(self, client):
+    def __init__(self, client, cache=None, negative_cache=None):
+        """
+        <cache> is an optional RecordCache (see pypardot.cache) answering read_by_email and read_by_id for recently
+        read prospects. Writes made through this object refresh or invalidate the prospects they change; changes
+        made by other clients, or in Pardot itself, show once the cached record expires.
+
+        <negative_cache> is an optional NegativeCache remembering the ids and emails that were not found, so that
+        read_by_email, read_by_id and delete_by_email fail for them straight away. Creating or upserting a prospect
+        through this object forgets its email.
+        """
         self.client = client
+        self.cache = cache
+        self.negative_cache = negative_cache
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the prospects matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/prospects/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['prospect'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['prospect'] = []
-        elif result['total_results'] == 1:
-            result['prospect'] = [result['prospect']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'prospect')
 
-        return result
+    def iter_query(self, prefetch=False, keyset=False, start_id=None, **kwargs):
+        """
+        Yields the prospects matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        With <keyset>, results are read in id order using <id_greater_than> rather than offsets, which keeps deep
+        scans fast; pass the id of the last record processed as <start_id> to resume an interrupted scan.
+        """
+        return iter_records(self.query, 'prospect', prefetch=prefetch, keyset=keyset, start_id=start_id, **kwargs)
 
     def assign_by_email(self, email=None, **kwargs):
         """
@@ -32,8 +62,7 @@ class Prospects(object):
         of the following parameters must be provided to identify the target user or group: <user_email>, <user_id>, or
         <group_id>. Returns an updated version of the prospect.
         """
-        response = self._post(path='/do/assign/email/{email}'.format(email=email), params=kwargs)
-        return response
+        return self._write('/do/assign/email/{email}'.format(email=email), kwargs, email=email)
 
     def assign_by_id(self, id=None, **kwargs):
         """
@@ -41,18 +70,15 @@ class Prospects(object):
         the following parameters must be provided to identify the target user or group: <user_email>, <user_id>, or
         <group_id>. Returns an updated version of the prospect.
         """
-        response = self._post(path='/do/assign/id/{id}'.format(id=id), params=kwargs)
-        return response
+        return self._write('/do/assign/id/{id}'.format(id=id), kwargs, id=id)
 
     def unassign_by_email(self, email=None, **kwargs):
         """Unassigns the prospect specified by <email>. Returns an updated version of the prospect."""
-        response = self._post(path='/do/unassign/email/{email}'.format(email=email), params=kwargs)
-        return response
+        return self._write('/do/unassign/email/{email}'.format(email=email), kwargs, email=email)
 
     def unassign_by_id(self, id=None, **kwargs):
         """Unassigns the prospect specified by <id>. Returns an updated version of the prospect."""
-        response = self._post(path='/do/unassign/id/{id}'.format(id=id), params=kwargs)
-        return response
+        return self._write('/do/unassign/id/{id}'.format(id=id), kwargs, id=id)
 
     def create_by_email(self, email=None, **kwargs):
         """
@@ -60,8 +86,7 @@ class Prospects(object):
         """
         if not email:
             raise PardotAPIArgumentError('email is required to create a prospect.')
-        response = self._post(path='/do/create/email/{email}'.format(email=email), params=kwargs)
-        return response
+        return self._write('/do/create/email/{email}'.format(email=email), kwargs, email=email, creates=True)
 
     def read_by_email(self, email=None, **kwargs):
         """
@@ -71,8 +96,7 @@ class Prospects(object):
         """
         if not email:
             raise PardotAPIArgumentError('email is required to read a prospect.')
-        response = self._post(path='/do/read/email/{email}'.format(email=email), params=kwargs)
-        return response
+        return self._read('/do/read/email/{email}'.format(email=email), kwargs, email=email)
 
     def read_by_id(self, id=None, **kwargs):
         """
@@ -82,8 +106,7 @@ class Prospects(object):
         """
         if not id:
             raise PardotAPIArgumentError('id is required to read a prospect.')
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
-        return response
+        return self._read('/do/read/id/{id}'.format(id=id), kwargs, id=id)
 
     def update_by_email(self, email=None, **kwargs):
         """
@@ -92,8 +115,7 @@ class Prospects(object):
         """
         if not email:
             raise PardotAPIArgumentError('email is required to update a prospect.')
-        response = self._post(path='/do/update/email/{email}'.format(email=email), params=kwargs)
-        return response
+        return self._write('/do/update/email/{email}'.format(email=email), kwargs, email=email)
 
     def update_by_id(self, id=None, **kwargs):
         """
@@ -102,8 +124,7 @@ class Prospects(object):
         """
         if not id:
             raise PardotAPIArgumentError('id is required to update a prospect.')
-        response = self._post(path='/do/update/id/{id}'.format(id=id), params=kwargs)
-        return response
+        return self._write('/do/update/id/{id}'.format(id=id), kwargs, id=id)
 
     def upsert_by_email(self, email=None, **kwargs):
         """
@@ -113,8 +134,7 @@ class Prospects(object):
         """
         if not email:
             raise PardotAPIArgumentError('email is required to upsert a prospect.')
-        response = self._post(path='/do/upsert/email/{email}'.format(email=email), params=kwargs)
-        return response
+        return self._write('/do/upsert/email/{email}'.format(email=email), kwargs, email=email, creates=True)
 
     def upsert_by_id(self, id=None, **kwargs):
         """
@@ -125,14 +145,14 @@ class Prospects(object):
         """
         if not id:
             raise PardotAPIArgumentError('id is required to upsert a prospect.')
-        response = self._post(path='/do/upsert/id/{id}'.format(id=id), params=kwargs)
-        return response
+        return self._write('/do/upsert/id/{id}'.format(id=id), kwargs, id=id, creates=True)
 
     def delete_by_email(self, email=None, **kwargs):
         """Deletes the prospect specified by <email>. Returns True if operation was successful."""
         if not email:
             raise PardotAPIArgumentError('email is required to delete a prospect.')
-        response = self._post(path='/do/delete/email/{email}'.format(email=email), params=kwargs)
+        response = self._if_found(lambda: self._write('/do/delete/email/{email}'.format(email=email), kwargs,
+                                                      email=email), email=email)
         if response == 204:
             return True
         return False
@@ -141,7 +161,7 @@ class Prospects(object):
         """Deletes the prospect specified by <id>. Returns True if operation was successful."""
         if not id:
             raise PardotAPIArgumentError('id is required to delete a prospect.')
-        response = self._post(path='/do/delete/id/{id}'.format(id=id), params=kwargs)
+        response = self._write('/do/delete/id/{id}'.format(id=id), kwargs, id=id)
         if response == 204:
             return True
         return False
@@ -169,7 +189,181 @@ class Prospects(object):
     def add_to_list(self, prospect_id=None, list_id=None):
         """Adds the prospect specified by <prospect_id> to the list specified by <list_id>."""
         params = {'prospect_id': prospect_id, 'list_id': list_id}
-        response = self._post(object_name='listMembership', path='/do/create', params=params)
+        try:
+            response = self._post(object_name='listMembership', path='/do/create', params=params)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(id=prospect_id)
+        return response
+
+    def batch_create(self, prospects=None, max_workers=4):
+        """
+        Creates the prospects described by the dicts in <prospects>, each of which must include an <email>. The input
+        is split into batches of 50 prospects, up to <max_workers> of which are sent concurrently. Returns one result
+        per prospect, in input order, as a dict with the prospect's data under <prospect>, a <success> flag and the
+        <error> message for prospects that could not be created. Under a deadline (see pypardot.deadline), the batches
+        that cannot be sent in time are reported as failed.
+        """
+        return self._batch('batchCreate', prospects, max_workers, required=('email',))
+
+    def batch_update(self, prospects=None, max_workers=4):
+        """
+        Updates the prospects described by the dicts in <prospects>, each of which must include an <id> or <email>.
+        Batching, concurrency and results are as for batch_create.
+        """
+        return self._batch('batchUpdate', prospects, max_workers, required=('id', 'email'))
+
+    def batch_upsert(self, prospects=None, max_workers=4):
+        """
+        Updates the prospects described by the dicts in <prospects>, creating the ones that do not exist yet. Each
+        dict must include an <id> or <email>. Batching, concurrency and results are as for batch_create.
+        """
+        return self._batch('batchUpsert', prospects, max_workers, required=('id', 'email'))
+
+    def _batch(self, operation, prospects, max_workers, required):
+        """
+        Sends <prospects> to the <operation> batch endpoint in chunks of BATCH_SIZE, on up to <max_workers> threads,
+        and collects the per-prospect results. Prospects lacking all of the <required> fields fail without being sent.
+        """
+        if prospects is None:
+            raise PardotAPIArgumentError('prospects are required for a batch request.')
+        prospects = list(prospects)
+        results = [None] * len(prospects)
+        valid = []
+        for index, prospect in enumerate(prospects):
+            if any(prospect.get(field) for field in required):
+                valid.append(index)
+            else:
+                results[index] = {'prospect': prospect, 'success': False,
+                                  'error': '{0} is required.'.format(' or '.join(required))}
+
+        def invalidate(indexes):
+            for cache in (self.cache, self.negative_cache):
+                if cache is not None:
+                    for index in indexes:
+                        cache.invalidate(id=prospects[index].get('id'), email=prospects[index].get('email'))
+
+        invalidate(valid)
+        chunks = [valid[start:start + BATCH_SIZE] for start in range(0, len(valid), BATCH_SIZE)]
+
+        def send(chunk):
+            try:
+                chunk_results = self._batch_chunk(operation, [prospects[index] for index in chunk])
+            finally:
+                # Invalidated again in case a read cached one of the prospects while the batch was in flight.
+                invalidate(chunk)
+            for index, result in zip(chunk, chunk_results):
+                results[index] = result
+
+        if len(chunks) <= 1 or max_workers <= 1:
+            for chunk in chunks:
+                send(chunk)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(propagate(send), chunks))
+        return results
+
+    def _batch_chunk(self, operation, prospects):
+        """
+        Sends one batch request and returns the per-prospect results. Pardot reports the prospects it rejected under
+        <errors>, keyed by their position in the batch; the rest of the batch succeeds. If the whole request fails,
+        whether with an error, a non-JSON response outside 2xx or an exception, every prospect in it is reported with
+        that error, so that the results of the other chunks are kept.
+        """
+        errors = {}
+        try:
+            response = self._post(path='/do/{0}'.format(operation),
+                                  data={'prospects': json.dumps({'prospects': prospects})})
+            if isinstance(response, dict):
+                errors = _batch_errors(response.get('errors'), prospects)
+            elif not 200 <= response < 300:
+                errors = _chunk_errors('HTTP status {0}'.format(response), prospects)
+        except PardotAPIError as err:
+            errors = _batch_errors(err.response.get('errors'), prospects) or _chunk_errors(str(err), prospects)
+        except Exception as err:
+            errors = _chunk_errors(str(err) or type(err).__name__, prospects)
+        return [{'prospect': prospect, 'success': index not in errors, 'error': errors.get(index)}
+                for index, prospect in enumerate(prospects)]
+
+    def exists(self, id=None, email=None):
+        """
+        Returns True if the prospect specified by <id> or <email> exists. Answered from the client's caches when they
+        know the prospect, otherwise by reading it, which fills them.
+        """
+        if not id and not email:
+            raise PardotAPIArgumentError('id or email is required to check that a prospect exists.')
+        if self.negative_cache is not None and self.negative_cache.get(id=id, email=email) is not None:
+            return False
+        try:
+            if id:
+                self.read_by_id(id=id)
+            else:
+                self.read_by_email(email=email)
+        except PardotAPIError as err:
+            if _not_found(err):
+                return False
+            raise
+        return True
+
+    def _if_found(self, request, id=None, email=None):
+        """
+        Makes <request>, a lookup of the prospect with <id> or <email>, unless the negative cache knows it does not
+        exist, in which case the error Pardot returned for it is raised again. Not-found errors are cached.
+        """
+        if self.negative_cache is None:
+            return request()
+        error = self.negative_cache.get(id=id, email=email)
+        if error is not None:
+            raise PardotAPIError(json_response=error)
+        version = self.negative_cache.version
+        try:
+            return request()
+        except PardotAPIError as err:
+            if _not_found(err):
+                self.negative_cache.add(err.response, id=id, email=email, version=version)
+            raise
+
+    def _read(self, path, kwargs, id=None, email=None):
+        """
+        Reads a prospect, from the cache if it holds it and the read has no extra parameters, failing straight away if
+        it is known not to exist.
+        """
+        return self._if_found(lambda: self._read_through(path, kwargs, id=id, email=email), id=id, email=email)
+
+    def _read_through(self, path, kwargs, id=None, email=None):
+        if self.cache is None or kwargs:
+            return self._post(path=path, params=kwargs, coalesce=True)
+        response = self.cache.get(id=id, email=email)
+        if response is None:
+            version = self.cache.version
+            response = self._post(path=path, params=kwargs, coalesce=True)
+            if isinstance(response, dict) and isinstance(response.get('prospect'), dict):
+                self.cache.set(response['prospect'], response, version=version)
+        return response
+
+    def _write(self, path, kwargs, id=None, email=None, creates=False):
+        """
+        Makes a request changing the prospect with <id> or <email>, then caches the updated prospect returned, if
+        any, in place of the old one. If the request may create the prospect (<creates>), its email is removed from
+        the negative cache.
+        """
+        if creates and self.negative_cache is not None:
+            self.negative_cache.invalidate(email=email or kwargs.get('email'))
+            try:
+                response = self._write(path, kwargs, id=id, email=email)
+            finally:
+                self.negative_cache.invalidate(email=email or kwargs.get('email'))
+            return response
+        if self.cache is None:
+            return self._post(path=path, params=kwargs)
+        self.cache.invalidate(id=id, email=email)
+        try:
+            response = self._post(path=path, params=kwargs)
+        finally:
+            # Invalidated again in case a read cached the prospect while the write was in flight.
+            self.cache.invalidate(id=id, email=email)
+        if isinstance(response, dict) and isinstance(response.get('prospect'), dict):
+            self.cache.set(response['prospect'], response)
         return response
 
     def _get(self, object_name='prospect', path=None, params=None):
@@ -179,9 +373,46 @@ class Prospects(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='prospect', path=None, params=None):
+    def _post(self, object_name='prospect', path=None, params=None, data=None, coalesce=False):
         """POST requests for the Prospect object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, data=data, coalesce=coalesce)
         return response
+
+
+def _not_found(err):
+    """Returns True if the PardotAPIError <err> reports a prospect id or email address that does not exist."""
+    try:
+        return int(err.err_code) in (INVALID_PROSPECT_ID, INVALID_PROSPECT_EMAIL)
+    except (TypeError, ValueError):
+        return False
+
+
+def _chunk_errors(error, prospects):
+    """Reports <error> for every prospect of a batch that failed as a whole."""
+    return dict((index, error) for index in range(len(prospects)))
+
+
+def _batch_errors(errors, prospects):
+    """
+    Maps the <errors> of a batch response to the positions of the failed prospects. Errors are keyed by position in
+    the batch; only keys that cannot be positions are looked up as a prospect's id or email. A list of errors is taken
+    to follow the order of the batch.
+    """
+    if not errors:
+        return {}
+    if isinstance(errors, list):
+        return dict((index, error) for index, error in enumerate(errors) if error)
+    positions = {}
+    for index, prospect in enumerate(prospects):
+        for field in ('id', 'email'):
+            if prospect.get(field) is not None:
+                positions.setdefault(str(prospect[field]), index)
+    mapped = {}
+    for key, error in errors.items():
+        if str(key).isdigit() and int(key) < len(prospects):
+            mapped[int(key)] = error
+        elif str(key) in positions:
+            mapped[positions[str(key)]] = error
+    return mapped
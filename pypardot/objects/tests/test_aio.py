@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from pypardot import aio
+from pypardot.errors import PardotAPIError
+from pypardot.fake import FakePardot, FakePardotServer
+from pypardot.objects.prospects import BATCH_SIZE
+
+
+@unittest.skipIf(aio.aiohttp is None, 'AsyncPardotAPI requires aiohttp')
+class TestAsyncPardotAPI(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.fake.generate('prospect', 250)
+        self.server = FakePardotServer(self.fake).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_client(self, test):
+        async def run():
+            async with aio.AsyncPardotAPI(email='email', password='password', user_key='user_key',
+                                          base_uri=self.server.base_uri) as pardot:
+                return await test(pardot)
+        return asyncio.run(run())
+
+    def test_read_and_query(self):
+        async def test(pardot):
+            prospect = await pardot.prospects.read_by_id(id=3)
+            results = await pardot.prospects.query(id_greater_than=240)
+            with self.assertRaises(PardotAPIError) as context:
+                await pardot.prospects.read_by_email(email='nobody@example.com')
+            return prospect, results, context.exception
+        prospect, results, error = self.run_client(test)
+        self.assertEqual('prospect3@example.com', prospect['prospect']['email'])
+        self.assertEqual(10, results['total_results'])
+        self.assertEqual(list(range(241, 251)), [record['id'] for record in results['prospect']])
+        self.assertEqual(4, error.err_code)
+
+    def test_reauthentication_keeps_post_body(self):
+        async def test(pardot):
+            await pardot.authenticate()
+            self.fake.expire_api_keys()
+            return await pardot.prospects.batch_upsert([{'email': 'prospect1@example.com', 'first_name': 'New'},
+                                                        {'email': 'new@example.com'}])
+        results = self.run_client(test)
+        self.assertEqual([True, True], [result['success'] for result in results])
+        self.assertEqual(2, self.fake.logins)
+        self.assertEqual('New', self.fake.objects['prospect'][1]['first_name'])
+        self.assertEqual(251, len(self.fake.objects['prospect']))
+
+    def test_batch_partial_failure(self):
+        prospects = [{'email': 'new{0}@example.com'.format(index)} for index in range(BATCH_SIZE * 2 + 20)]
+
+        async def test(pardot):
+            await pardot.authenticate()
+            self.fake.fail_next(err_code=66, match='batch')
+            return await pardot.prospects.batch_create(prospects)
+        results = self.run_client(test)
+        self.assertEqual([prospect['email'] for prospect in prospects],
+                         [result['prospect']['email'] for result in results])
+        failed = [result for result in results if not result['success']]
+        self.assertIn(len(failed), (BATCH_SIZE, 20))
+        self.assertTrue(all('#66' in result['error'] for result in failed))
+        self.assertEqual(250 + len(prospects) - len(failed), len(self.fake.objects['prospect']))
+
+    def test_exists(self):
+        async def test(pardot):
+            return (await pardot.prospects.exists(id=1), await pardot.prospects.exists(id=999),
+                    await pardot.prospects.exists(email='nobody@example.com'))
+        self.assertEqual((True, False, False), self.run_client(test))
+
+
+if __name__ == '__main__':
+    unittest.main()
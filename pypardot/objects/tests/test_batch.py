@@ -0,0 +1,74 @@
+import random
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.fake import FakePardot, FakeResponse, FakeTransport
+from pypardot.objects.prospects import BATCH_SIZE
+
+
+class MalformedTransport(FakeTransport):
+    """Answers the <fail>th batch request with a JSON content type but a body that is not JSON."""
+
+    def __init__(self, fake, fail):
+        FakeTransport.__init__(self, fake)
+        self.fail = fail
+        self.batches = 0
+
+    def request(self, method, url, **kwargs):
+        if '/do/batch' in url:
+            self.batches += 1
+            if self.batches == self.fail:
+                return FakeResponse(200, {'Content-Type': 'application/json'}, b'{"prospects": ')
+        return FakeTransport.request(self, method, url, **kwargs)
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(0)
+        self.fake = FakePardot(latency=lambda: rand.uniform(0, 0.01))
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+        self.prospects = [{'email': 'prospect{0}@example.com'.format(index)} for index in range(BATCH_SIZE * 2 + 20)]
+
+    def test_chunks_in_input_order(self):
+        results = self.pardot.prospects.batch_create(self.prospects, max_workers=4)
+        self.assertEqual([prospect['email'] for prospect in self.prospects],
+                         [result['prospect']['email'] for result in results])
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(len(self.prospects), len(self.fake.objects['prospect']))
+        # 3 batch requests and the login.
+        self.assertEqual(4, self.fake.requests)
+
+    def test_failed_chunk_keeps_other_results(self):
+        self.fake.fail_next(err_code=66, match='batch')
+        results = self.pardot.prospects.batch_create(self.prospects, max_workers=4)
+        failed = [index for index, result in enumerate(results) if not result['success']]
+        self.assertIn(len(failed), (BATCH_SIZE, 20))
+        self.assertTrue(all('#66' in results[index]['error'] for index in failed))
+        self.assertEqual(len(self.prospects) - len(failed), len(self.fake.objects['prospect']))
+
+    def test_non_json_error_fails_chunk(self):
+        self.fake.fail_next(status=503, match='batch')
+        results = self.pardot.prospects.batch_create(self.prospects[:BATCH_SIZE])
+        self.assertEqual([False] * BATCH_SIZE, [result['success'] for result in results])
+        self.assertEqual('HTTP status 503', results[0]['error'])
+        self.assertNotIn('prospect', self.fake.objects)
+
+    def test_exception_fails_only_its_chunk(self):
+        pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                           transport=MalformedTransport(self.fake, fail=2))
+        results = pardot.prospects.batch_create(self.prospects, max_workers=1)
+        self.assertEqual([True] * BATCH_SIZE + [False] * BATCH_SIZE + [True] * 20,
+                         [result['success'] for result in results])
+        self.assertEqual(BATCH_SIZE + 20, len(self.fake.objects['prospect']))
+
+    def test_errors_by_position(self):
+        # Pardot reports the failed prospect by its position, 1, which is also the id of the prospect at position 0.
+        self.fake.add('prospect', id=1, email='joe@example.com')
+        results = self.pardot.prospects.batch_update([{'id': 1, 'first_name': 'Joe'}, {'id': 999, 'first_name': 'X'}])
+        self.assertEqual([True, False], [result['success'] for result in results])
+        self.assertEqual('Joe', self.fake.objects['prospect'][1]['first_name'])
+
+
+if __name__ == '__main__':
+    unittest.main()
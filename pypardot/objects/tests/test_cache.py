@@ -0,0 +1,118 @@
+import time
+import unittest
+
+from pypardot.cache import NegativeCache, RecordCache
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError
+from pypardot.fake import FakePardot, FakeTransport
+
+
+class TestRecordCache(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        cache = RecordCache(max_size=2, ttl=0.1)
+        for record_id in (1, 2):
+            prospect = {'id': record_id, 'email': 'p{0}@example.com'.format(record_id)}
+            cache.set(prospect, {'prospect': prospect})
+        self.assertEqual(1, cache.get(email='P1@example.com')['prospect']['id'])
+        cache.set({'id': 3, 'email': 'p3@example.com'}, {'prospect': {'id': 3}})
+        self.assertIsNone(cache.get(id=2))
+        self.assertIsNone(cache.get(email='p2@example.com'))
+        self.assertIsNotNone(cache.get(id='1'))
+        time.sleep(0.15)
+        self.assertIsNone(cache.get(id=1))
+        self.assertEqual((2, 3), (cache.hits, cache.misses))
+
+    def test_stale_read_not_cached(self):
+        cache = RecordCache()
+        version = cache.version
+        cache.invalidate(id=1)
+        cache.set({'id': 1}, {'prospect': {'id': 1}}, version=version)
+        self.assertIsNone(cache.get(id=1))
+
+
+class TestProspectCache(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.fake.add('prospect', email='joe@example.com', first_name='Joe')
+        self.cache = RecordCache()
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake), prospect_cache=self.cache)
+        self.pardot.authenticate()
+
+    def test_reads_share_entry(self):
+        self.pardot.prospects.read_by_id(id=1)
+        requests = self.fake.requests
+        prospect = self.pardot.prospects.read_by_email(email='joe@example.com')['prospect']
+        prospect['first_name'] = 'Changed'
+        self.assertEqual('Joe', self.pardot.prospects.read_by_id(id=1)['prospect']['first_name'])
+        self.assertEqual(requests, self.fake.requests)
+
+    def test_writes_refresh_and_invalidate(self):
+        self.pardot.prospects.read_by_email(email='joe@example.com')
+        self.pardot.prospects.update_by_id(id=1, first_name='Joseph')
+        requests = self.fake.requests
+        self.assertEqual('Joseph', self.pardot.prospects.read_by_email(email='joe@example.com')['prospect']
+                         ['first_name'])
+        self.assertEqual(requests, self.fake.requests)
+
+        self.pardot.prospects.batch_update([{'id': 1, 'first_name': 'Jo'}])
+        self.assertEqual('Jo', self.pardot.prospects.read_by_id(id=1)['prospect']['first_name'])
+        self.assertEqual(requests + 2, self.fake.requests)
+
+        self.assertTrue(self.pardot.prospects.delete_by_email(email='joe@example.com'))
+        self.assertEqual(0, len(self.cache))
+
+
+class TestProspectNegativeCache(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.negative_cache = NegativeCache(ttl=60)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake), prospect_negative_cache=self.negative_cache)
+        self.pardot.authenticate()
+
+    def test_not_found_cached(self):
+        for read in (lambda: self.pardot.prospects.read_by_email(email='missing@example.com'),
+                     lambda: self.pardot.prospects.delete_by_email(email='Missing@example.com'),
+                     lambda: self.pardot.prospects.read_by_id(id=42)):
+            with self.assertRaises(PardotAPIError):
+                read()
+        requests = self.fake.requests
+        with self.assertRaises(PardotAPIError) as context:
+            self.pardot.prospects.read_by_email(email='missing@example.com')
+        self.assertEqual(4, context.exception.err_code)
+        with self.assertRaises(PardotAPIError) as context:
+            self.pardot.prospects.read_by_id(id=42)
+        self.assertEqual(3, context.exception.err_code)
+        self.assertFalse(self.pardot.prospects.exists(email='missing@example.com'))
+        self.assertEqual(requests, self.fake.requests)
+
+    def test_create_invalidates(self):
+        self.assertFalse(self.pardot.prospects.exists(email='new@example.com'))
+        self.pardot.prospects.create_by_email(email='new@example.com')
+        self.assertTrue(self.pardot.prospects.exists(email='new@example.com'))
+
+        self.assertFalse(self.pardot.prospects.exists(email='upserted@example.com'))
+        self.pardot.prospects.upsert_by_email(email='upserted@example.com')
+        self.assertEqual('upserted@example.com',
+                         self.pardot.prospects.read_by_email(email='upserted@example.com')['prospect']['email'])
+
+
+    def test_batch_invalidates_after_request(self):
+        # A read made while the batch is in flight finds the prospect missing; the batch must not leave that cached.
+        transport = self.pardot.transport
+        request = transport.request
+
+        def read_during_batch(method, url, **kwargs):
+            if '/do/batchCreate' in url:
+                self.assertFalse(self.pardot.prospects.exists(email='batched@example.com'))
+            return request(method, url, **kwargs)
+
+        transport.request = read_during_batch
+        results = self.pardot.prospects.batch_create([{'email': 'batched@example.com'}])
+        transport.request = request
+        self.assertTrue(results[0]['success'])
+        self.assertTrue(self.pardot.prospects.exists(email='batched@example.com'))
+
+if __name__ == '__main__':
+    unittest.main()
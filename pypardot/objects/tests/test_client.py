@@ -0,0 +1,183 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError
+from pypardot.fake import FakePardot, FakePardotServer
+from pypardot.hooks import RequestHook
+from pypardot.keystore import FileKeyStore, SQLiteKeyStore
+from pypardot.retry import RetryPolicy
+
+
+def start_fake():
+    fake = FakePardot()
+    fake.add('prospect', id=1, email='prospect@example.com')
+    return FakePardotServer(fake).start()
+
+
+class TestReauthentication(unittest.TestCase):
+    def setUp(self):
+        self.server = start_fake()
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                base_uri=self.server.base_uri, pool_maxsize=32)
+
+    def tearDown(self):
+        self.pardot.close()
+        self.server.stop()
+
+    def _read_concurrently(self, threads):
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def read():
+            barrier.wait()
+            try:
+                self.pardot.prospects.read_by_id(id=1)
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=read) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual([], errors)
+
+    def test_concurrent_first_login(self):
+        self._read_concurrently(32)
+        self.assertEqual(1, self.server.fake.logins)
+
+    def test_concurrent_expired_key(self):
+        self.pardot.authenticate()
+        self.assertEqual(1, self.server.fake.logins)
+
+        for expected_logins in (2, 3):
+            self.server.fake.expire_api_keys()
+            self._read_concurrently(32)
+            self.assertEqual(expected_logins, self.server.fake.logins)
+            self.assertEqual('fake-api-key-{0}'.format(expected_logins), self.pardot.api_key)
+
+
+class TestApiKeyRefresh(unittest.TestCase):
+    def setUp(self):
+        self.server = start_fake()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_expired_key_replaced_before_call(self):
+        with PardotAPI(email='email', password='password', user_key='user_key', base_uri=self.server.base_uri,
+                       api_key_lifetime=0.2) as pardot:
+            pardot.prospects.read_by_id(id=1)
+            self.server.fake.expire_api_keys()
+            time.sleep(0.3)
+            pardot.prospects.read_by_id(id=1)
+        self.assertEqual(2, self.server.fake.logins)
+        self.assertEqual(0, self.server.fake.rejected)
+
+    def test_auto_refresh(self):
+        with PardotAPI(email='email', password='password', user_key='user_key', base_uri=self.server.base_uri,
+                       api_key_lifetime=60, refresh_margin=59.6, auto_refresh=True) as pardot:
+            pardot.authenticate()
+            time.sleep(0.6)
+            self.assertEqual(2, self.server.fake.logins)
+            self.assertEqual('fake-api-key-2', pardot.api_key)
+            pardot.prospects.read_by_id(id=1)
+        self.assertEqual(0, self.server.fake.rejected)
+
+
+class TestKeyStores(unittest.TestCase):
+    def setUp(self):
+        self.server = start_fake()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _check_shared_keys(self, key_store):
+        # Each client stands in for a separate worker process sharing the store.
+        first, second = [PardotAPI(email='email', password='password', user_key='user_key',
+                                   base_uri=self.server.base_uri, key_store=key_store) for _ in range(2)]
+        first.prospects.read_by_id(id=1)
+        second.prospects.read_by_id(id=1)
+        self.assertEqual(1, self.server.fake.logins)
+        self.assertEqual(first.api_key, second.api_key)
+
+        self.server.fake.expire_api_keys()
+        first.prospects.read_by_id(id=1)
+        second.prospects.read_by_id(id=1)
+        self.assertEqual(2, self.server.fake.logins)
+        self.assertEqual('fake-api-key-2', second.api_key)
+
+        # A client started later picks up the stored key without logging in.
+        third = PardotAPI(email='email', password='password', user_key='user_key', base_uri=self.server.base_uri,
+                          key_store=key_store)
+        third.prospects.read_by_id(id=1)
+        self.assertEqual(2, self.server.fake.logins)
+
+    def test_file_key_store(self):
+        self._check_shared_keys(FileKeyStore(os.path.join(self.directory, 'keys.json')))
+
+    def test_sqlite_key_store(self):
+        self._check_shared_keys(SQLiteKeyStore(os.path.join(self.directory, 'keys.db')))
+
+
+class RecordingHook(RequestHook):
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def on_request_start(self, event):
+        self.started.append(event)
+
+    def on_request_end(self, event):
+        self.ended.append(event)
+
+
+class TestHooks(unittest.TestCase):
+    def setUp(self):
+        self.server = start_fake()
+        self.hook = RecordingHook()
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                base_uri=self.server.base_uri, hooks=[self.hook],
+                                retry_policy=RetryPolicy(backoff=0, jitter=False))
+
+    def tearDown(self):
+        self.pardot.close()
+        self.server.stop()
+
+    def test_events(self):
+        self.pardot.prospects.read_by_id(id=1)
+        login, read = self.hook.ended
+        self.assertEqual(self.hook.started, [read, login])
+        self.assertEqual(('post', 'login'), (login.method, login.object_name))
+        self.assertEqual(('post', 'prospect', '/do/read/id/1'), (read.method, read.object_name, read.path))
+        self.assertTrue(read.auth_refreshed)
+        self.assertIsNotNone(login.connect)
+        self.assertIsNone(read.connect)
+        for event in (login, read):
+            self.assertEqual(200, event.status_code)
+            self.assertGreater(event.response_bytes, 0)
+            self.assertIsNone(event.dns)
+            self.assertGreaterEqual(event.duration, event.server + event.transfer + event.decode)
+
+    def test_retries_and_errors(self):
+        self.pardot.authenticate()
+        self.server.fake.fail_next(err_code=66, count=2)
+        self.pardot.prospects.read_by_id(id=1)
+        self.assertEqual(2, self.hook.ended[-1].retries)
+        self.assertIsNone(self.hook.ended[-1].error)
+
+        with self.assertRaises(PardotAPIError):
+            self.pardot.prospects.read_by_id(id=2)
+        self.assertEqual(3, self.hook.ended[-1].err_code)
+        self.assertFalse(self.hook.ended[-1].auth_refreshed)
+
+
+if __name__ == '__main__':
+    unittest.main()
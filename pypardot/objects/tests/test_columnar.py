@@ -0,0 +1,75 @@
+import unittest
+
+from pypardot import columnar
+from pypardot.client import PardotAPI
+from pypardot.columnar import read_columns
+from pypardot.fake import FakePardot, FakeTransport
+
+
+class TestColumns(unittest.TestCase):
+    def test_kinds_and_missing_values(self):
+        result = read_columns([
+            {'id': 1, 'type_name': 'Visit', 'created_at': '2015-01-01 00:00:00', 'campaign': {'name': 'A'}},
+            {'id': 2, 'type_name': 'Click', 'created_at': None, 'campaign': {'name': 'A'}, 'score': 1.5},
+            {'id': 3, 'type_name': 'Visit', 'created_at': '2015-01-02 12:30:00', 'campaign': {'name': 'B'}}])
+        self.assertEqual(['id', 'type_name', 'created_at', 'campaign.name', 'score'], list(result.columns))
+        self.assertEqual(
+            ['int', 'category', 'datetime', 'category', 'float'],
+            [column.kind for column in result.columns.values()])
+        self.assertEqual(['Visit', 'Click'], result['type_name'].categories)
+        self.assertEqual([None, 1.5, None], result['score'].to_list())
+        self.assertEqual({'id': 3, 'type_name': 'Visit', 'created_at': '2015-01-02 12:30:00', 'campaign.name': 'B',
+                          'score': None}, result.to_records()[2])
+
+    def test_widening(self):
+        result = read_columns([{'value': 1, 'name': 'a', 'when': '2015-01-01 00:00:00'},
+                               {'value': 2.5, 'name': 'b', 'when': 'yesterday'},
+                               {'value': 'x', 'name': 'c', 'when': None}], max_categories=2)
+        self.assertEqual(('object', 'string', 'string'),
+                         (result['value'].kind, result['name'].kind, result['when'].kind))
+        self.assertEqual([1.0, 2.5, 'x'], result['value'].to_list())
+        self.assertEqual(['a', 'b', 'c'], result['name'].to_list())
+        self.assertEqual(['2015-01-01 00:00:00', 'yesterday', None], result['when'].to_list())
+
+    def test_selected_columns_from_query(self):
+        fake = FakePardot()
+        fake.generate('visitorActivity', 450)
+        pardot = PardotAPI(email='email', password='password', user_key='user_key', transport=FakeTransport(fake))
+        result = read_columns(pardot.visitoractivities.iter_query(keyset=True),
+                              columns=['id', 'type_name', 'campaign.name', 'missing'])
+        self.assertEqual(450, len(result))
+        self.assertEqual(list(range(1, 451)), result['id'].to_list())
+        self.assertEqual('category', result['campaign.name'].kind)
+        self.assertEqual([None] * 450, result['missing'].to_list())
+        self.assertLess(result['type_name'].nbytes, 450 * 8)
+
+    @unittest.skipIf(columnar.numpy is None, 'numpy is not installed')
+    def test_append_after_export(self):
+        result = read_columns([{'id': 1, 'score': 1.5, 'type_name': 'Visit'}])
+        exported = result.to_numpy()
+        for record in ({'id': 2, 'score': None, 'type_name': 'Click'}, {'id': 3, 'score': 2.5, 'type_name': 'Visit'}):
+            result.append(record)
+        self.assertEqual([1], list(exported['id']))
+        self.assertEqual([1, 2, 3], list(result.to_numpy()['id']))
+        self.assertEqual(['Visit', 'Click', 'Visit'], list(result.to_numpy()['type_name']))
+        if columnar.pyarrow is not None:
+            table = result.to_arrow()
+            result.append({'id': 4})
+            self.assertEqual([1, 2, 3], table.column('id').to_pylist())
+            self.assertEqual([1.5, None, 2.5, None], result['score'].to_list())
+
+    @unittest.skipIf(columnar.pandas is None, 'pandas is not installed')
+    def test_to_pandas(self):
+        frame = read_columns([{'id': 1, 'type_name': 'Visit'}, {'id': None, 'type_name': 'Click'}]).to_pandas()
+        self.assertEqual('Int64', str(frame['id'].dtype))
+        self.assertEqual('category', str(frame['type_name'].dtype))
+
+    @unittest.skipIf(columnar.pyarrow is None, 'pyarrow is not installed')
+    def test_to_arrow(self):
+        table = read_columns([{'id': 1, 'type_name': 'Visit'}, {'id': None, 'type_name': 'Click'}]).to_arrow()
+        self.assertEqual([1, None], table.column('id').to_pylist())
+        self.assertEqual(['Visit', 'Click'], table.column('type_name').to_pylist())
+
+
+if __name__ == '__main__':
+    unittest.main()
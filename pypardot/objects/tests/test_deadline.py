@@ -0,0 +1,68 @@
+import time
+import unittest
+
+import requests
+
+from pypardot.client import PardotAPI
+from pypardot.deadline import deadline, request_timeout
+from pypardot.errors import PardotAPIError, PardotDeadlineExceeded
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.retry import RetryPolicy
+
+
+class TestTimeouts(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.fake.generate('prospect', 1000)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake), timeout=(1, 0.1))
+        self.pardot.authenticate()
+
+    def test_client_and_call_timeouts(self):
+        self.fake.latency = 0.2
+        with self.assertRaises(requests.Timeout):
+            self.pardot.prospects.read_by_id(id=1)
+        self.assertEqual(1, self.pardot.get('prospect', path='/do/read/id/1', timeout=1)['prospect']['id'])
+        with request_timeout(1):
+            self.assertEqual(1, self.pardot.prospects.read_by_id(id=1)['prospect']['id'])
+
+    def test_deadline(self):
+        self.fake.latency = 0.05
+        start = time.time()
+        with self.assertRaises(PardotDeadlineExceeded):
+            with deadline(0.2):
+                while True:
+                    self.pardot.prospects.read_by_id(id=1)
+        self.assertLess(time.time() - start, 0.3)
+
+        # A call in progress when the deadline passes times out with it.
+        self.fake.latency = 0.08
+        with self.assertRaises(PardotDeadlineExceeded):
+            with deadline(0.05):
+                self.pardot.prospects.read_by_id(id=1)
+
+    def test_deadline_stops_retries(self):
+        self.pardot.retry_policy = RetryPolicy(max_attempts=5, backoff=1, jitter=False)
+        self.fake.fail_next(err_code=66, count=5)
+        start = time.time()
+        with self.assertRaises(PardotAPIError):
+            with deadline(0.5):
+                self.pardot.prospects.read_by_id(id=1)
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_deadline_propagates_to_background_threads(self):
+        self.fake.latency = 0.05
+        with self.assertRaises(PardotDeadlineExceeded):
+            with deadline(0.2):
+                for _ in self.pardot.prospects.iter_query(prefetch=True):
+                    pass
+
+        self.fake.latency = 0
+        prospects = [{'email': 'new{0}@example.com'.format(i)} for i in range(200)]
+        with deadline(0):
+            results = self.pardot.prospects.batch_create(prospects)
+        self.assertFalse(any(result['success'] for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
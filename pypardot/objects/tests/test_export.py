@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime, timedelta
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError
+from pypardot.export import PartitionedExport, date_shards, id_shards
+from pypardot.fake import FakePardot, FakeTransport
+
+START = datetime(2015, 1, 1)
+COUNT = 1000
+
+
+class TestPartitionedExport(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        for object_name in ('prospect', 'opportunity'):
+            self.fake.generate(object_name, COUNT, start=START, interval=timedelta(minutes=1))
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+        # Prospects are read with keyset paging, opportunities with offsets.
+        self.objects = (self.pardot.prospects, self.pardot.opportunities)
+
+    def test_shards_cover_every_record_once(self):
+        for objects in self.objects:
+            for shards in (id_shards(1, COUNT, 7),
+                           date_shards(START, START + timedelta(minutes=COUNT), 7)):
+                export = PartitionedExport(objects, shards, max_workers=3)
+                ids = sorted(record['id'] for record in export)
+                self.assertEqual(list(range(1, COUNT + 1)), ids)
+                self.assertEqual(COUNT, export.records)
+                self.assertTrue(all(shard.done for shard in shards))
+
+    def test_failed_shard_is_retried(self):
+        for objects in self.objects:
+            self.fake.fail_next(err_code=66, match='/do/query')
+            export = PartitionedExport(objects, id_shards(1, COUNT, 4), max_workers=2, retry_delay=0)
+            self.assertEqual(list(range(1, COUNT + 1)), sorted(record['id'] for record in export))
+            self.assertEqual(5, sum(shard.attempts for shard in export.shards))
+
+    def test_rerun_resumes(self):
+        for objects in self.objects:
+            export = PartitionedExport(objects, id_shards(1, COUNT, 4), max_workers=2, max_retries=0, buffer_size=10)
+            ids = []
+            with self.assertRaises(PardotAPIError):
+                for record in export:
+                    ids.append(record['id'])
+                    if len(ids) == 300:
+                        self.fake.fail_next(err_code=66, match='/do/query')
+            self.assertEqual(1, len([shard for shard in export.shards if shard.error is not None]))
+            self.assertEqual(len(ids), export.records)
+
+            ids.extend(record['id'] for record in export)
+            self.assertEqual(list(range(1, COUNT + 1)), sorted(ids))
+            self.assertTrue(all(shard.done for shard in export.shards))
+            # A complete export has nothing left to read.
+            self.assertEqual([], list(export))
+
+
+if __name__ == '__main__':
+    unittest.main()
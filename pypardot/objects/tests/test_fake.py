@@ -0,0 +1,69 @@
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.retry import RetryPolicy
+
+
+class TestFakePardot(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot(email='email', password='password', user_key='user_key')
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+
+    def test_query(self):
+        self.fake.generate('prospect', 450)
+        results = self.pardot.prospects.query(id_greater_than=400)
+        self.assertEqual(50, results['total_results'])
+        self.assertEqual(401, results['prospect'][0]['id'])
+
+        results = self.pardot.prospects.query(ids='7')
+        self.assertEqual(1, results['total_results'])
+        self.assertEqual([7], [prospect['id'] for prospect in results['prospect']])
+
+        results = self.pardot.prospects.query(id_greater_than=450)
+        self.assertEqual([], results['prospect'])
+
+        ids = [prospect['id'] for prospect in self.pardot.prospects.iter_query()]
+        self.assertEqual(list(range(1, 451)), ids)
+
+    def test_batch_upsert(self):
+        self.fake.add('prospect', email='existing@example.com', first_name='Old')
+        results = self.pardot.prospects.batch_upsert([
+            {'email': 'existing@example.com', 'first_name': 'New'},
+            {'email': 'new@example.com'},
+            {'id': 999, 'first_name': 'Missing'},
+        ])
+        self.assertEqual([True, True, False], [result['success'] for result in results])
+        self.assertEqual('New', self.pardot.prospects.read_by_email(email='existing@example.com')['prospect']
+                         ['first_name'])
+        self.assertEqual(2, len(self.fake.objects['prospect']))
+
+    def test_error_injection(self):
+        self.fake.add('prospect', email='joe@example.com')
+        self.fake.fail_next(err_code=66, count=2, match='/do/read')
+        with self.assertRaises(PardotAPIError) as context:
+            self.pardot.prospects.read_by_id(id=1)
+        self.assertEqual(66, context.exception.err_code)
+
+        retrying = PardotAPI(email='email', password='password', user_key='user_key',
+                             transport=FakeTransport(self.fake),
+                             retry_policy=RetryPolicy(max_attempts=2, backoff=0, jitter=False))
+        self.assertEqual(1, retrying.prospects.read_by_id(id=1)['prospect']['id'])
+
+    def test_daily_limit_and_invalid_login(self):
+        self.fake.daily_limit = 2
+        self.pardot.authenticate()
+        self.pardot.prospects.query()
+        with self.assertRaises(PardotAPIError) as context:
+            self.pardot.prospects.query()
+        self.assertEqual(122, context.exception.err_code)
+
+        wrong = PardotAPI(email='email', password='wrong', user_key='user_key', transport=FakeTransport(FakePardot(
+            password='password')))
+        self.assertFalse(wrong.authenticate())
+
+
+if __name__ == '__main__':
+    unittest.main()
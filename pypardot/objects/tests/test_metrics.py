@@ -0,0 +1,60 @@
+import unittest
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.metrics import MetricsRegistry
+
+
+class Cache(object):
+    hits = 3
+    misses = 1
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.fake.add('prospect', email='joe@example.com')
+        self.metrics = MetricsRegistry(daily_limit=1000)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake), hooks=[self.metrics])
+
+    def test_render(self):
+        self.pardot.prospects.read_by_id(id=1)
+        self.pardot.prospects.read_by_email(email='joe@example.com')
+        with self.assertRaises(PardotAPIError):
+            self.pardot.prospects.read_by_id(id=2)
+        self.metrics.track_cache('prospects', Cache())
+
+        text = self.metrics.render()
+        lines = text.splitlines()
+        self.assertIn('# TYPE pardot_request_duration_seconds histogram', lines)
+        self.assertIn('pardot_request_duration_seconds_bucket{object="prospect",operation="read",le="+Inf"} 3',
+                      lines)
+        self.assertIn('pardot_request_duration_seconds_count{object="prospect",operation="read"} 3', lines)
+        self.assertIn('pardot_api_calls_total{object="login",operation=""} 1', lines)
+        self.assertIn('pardot_errors_total{object="prospect",operation="read",err_code="3"} 1', lines)
+        self.assertIn('pardot_requests_in_flight 0', lines)
+        self.assertIn('pardot_api_quota_used 4', lines)
+        self.assertIn('pardot_api_quota_remaining 996', lines)
+        self.assertIn('pardot_auth_refreshes_total 1', lines)
+        self.assertIn('pardot_cache_hit_ratio{cache="prospects"} 0.75', lines)
+
+    def test_serve(self):
+        self.pardot.prospects.read_by_id(id=1)
+        server = self.metrics.serve(port=0)
+        try:
+            response = urlopen('http://127.0.0.1:{0}/metrics'.format(server.server_address[1]))
+            self.assertEqual(self.metrics.render(), response.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError, PardotMirrorStale
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.mirror import Mirror
+
+
+class TestMirror(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fake = FakePardot()
+        self.fake.generate('prospect', 300)
+        self.fake.generate('visitor', 20)
+        self.fake.generate('visit', 50)
+        self.fake.generate('visitorActivity', 250)
+        self.fake.generate('campaign', 5)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+        self.mirror = Mirror(self.pardot, os.path.join(self.directory, 'mirror.db'))
+
+    def tearDown(self):
+        self.mirror.close()
+        shutil.rmtree(self.directory)
+
+    def test_reads_and_queries_are_local(self):
+        counts = self.mirror.refresh()
+        self.assertEqual(300, counts['prospects'])
+        self.assertEqual(5, counts['campaigns'])
+        self.assertEqual(len([visit for visit in self.fake.objects['visit'].values() if visit['visitor_id'] <= 20]),
+                         counts['visits'])
+        self.assertEqual(7, self.mirror.prospects.read_by_id(id=7)['prospect']['id'])
+        self.assertEqual(7, self.mirror.prospects.read_by_email(email='PROSPECT7@example.com')['prospect']['id'])
+        self.assertEqual(self.pardot.prospects.query(limit=5, offset=10, sort_by='updated_at',
+                                                     sort_order='descending'),
+                         self.mirror.prospects.query(limit=5, offset=10, sort_by='updated_at',
+                                                     sort_order='descending'))
+        requests = self.fake.requests
+        activities = list(self.mirror.visitoractivities.iter_query(prospect_ids='1,2,3', output='bulk'))
+        self.assertEqual(sorted(activity['id'] for activity in self.fake.objects['visitorActivity'].values()
+                                if activity['prospect_id'] in (1, 2, 3)), [activity['id'] for activity in activities])
+        self.assertEqual(['id', 'email'], list(self.mirror.prospects.query(fields=['email'], limit=1)['prospect'][0]))
+        self.assertEqual(requests, self.fake.requests)
+        self.assertEqual(5, self.mirror.hits)
+
+    def test_changes_and_fallbacks(self):
+        self.mirror.refresh()
+        self.pardot.prospects.update_by_id(id=3, first_name='Changed')
+        self.fake.generate('visitorActivity', 2)
+        counts = self.mirror.refresh()
+        self.assertEqual((1, 2), (counts['prospects'], counts['visitoractivities']))
+        self.assertEqual('Changed', self.mirror.prospects.read_by_id(id=3)['prospect']['first_name'])
+
+        self.pardot.prospects.create_by_email(email='new@example.com')
+        requests = self.fake.requests
+        self.assertEqual(301, self.mirror.prospects.read_by_email(email='new@example.com')['prospect']['id'])
+        self.mirror.prospects.query(created_after='today')
+        self.assertRaises(PardotAPIError, self.mirror.prospects.read_by_id, id=999)
+        self.assertEqual(requests + 3, self.fake.requests)
+        self.assertEqual(3, self.mirror.misses)
+
+    def test_staleness(self):
+        self.assertEqual(1, self.mirror.prospects.read_by_id(id=1)['prospect']['id'])
+        self.assertEqual(1, self.mirror.misses)
+        stale = Mirror(self.pardot, self.mirror.path, objects=['prospects'], max_staleness=0.5, stale='raise')
+        stale.refresh()
+        stale.prospects.read_by_id(id=1)
+        time.sleep(0.6)
+        self.assertRaises(PardotMirrorStale, stale.prospects.read_by_id, id=1)
+        stale.stale = 'refresh'
+        stale.prospects.read_by_id(id=1)
+        self.assertEqual(2, stale.hits)
+        stale.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIArgumentError
+from pypardot.fake import FakePardot, FakeTransport
+
+
+class TestQueryOutput(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.fake.generate('prospect', 450)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+
+    def test_bulk_output_without_total_results(self):
+        result = self.pardot.prospects.query(output='bulk', id_greater_than=449)
+        self.assertNotIn('total_results', result)
+        self.assertEqual([450], [prospect['id'] for prospect in result['prospect']])
+        self.assertEqual([], self.pardot.prospects.query(output='bulk', id_greater_than=450)['prospect'])
+
+        for keyset in (False, True):
+            prospects = list(self.pardot.prospects.iter_query(output='bulk', keyset=keyset))
+            self.assertEqual(list(range(1, 451)), [prospect['id'] for prospect in prospects])
+            self.assertNotIn('visitor_activities', prospects[0])
+
+    def test_fields(self):
+        prospects = self.pardot.prospects.query(fields=['email', 'score'], limit=2)['prospect']
+        self.assertEqual({'id', 'email', 'score'}, set(prospects[0]))
+        prospect = self.pardot.prospects.query(fields='email,score', limit=1)['prospect'][0]
+        self.assertEqual({'id', 'email', 'score'}, set(prospect))
+
+    def test_invalid_output(self):
+        requests = self.fake.requests
+        self.assertRaises(PardotAPIArgumentError, self.pardot.prospects.query, output='compact')
+        self.assertEqual(requests, self.fake.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
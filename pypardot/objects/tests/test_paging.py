@@ -0,0 +1,31 @@
+import unittest
+
+from pypardot.errors import PardotAPIArgumentError
+from pypardot.paging import PAGE_SIZE, iter_keyset_pages
+
+
+class TestKeysetPaging(unittest.TestCase):
+    def test_resumes_after_start_id(self):
+        records = [{'id': record_id} for record_id in range(1, 451)]
+
+        def query(limit, id_greater_than=0, **criteria):
+            return {'prospect': [record for record in records if record['id'] > id_greater_than][:limit]}
+
+        pages = list(iter_keyset_pages(query, 'prospect', start_id=50))
+        self.assertEqual([PAGE_SIZE, PAGE_SIZE], [len(page) for page in pages])
+        self.assertEqual(list(range(51, 451)), [record['id'] for page in pages for record in page])
+
+    def test_ignored_id_greater_than(self):
+        page = [{'id': record_id} for record_id in range(1, PAGE_SIZE + 1)]
+
+        def query(**criteria):
+            return {'visit': list(page)}
+
+        pages = iter_keyset_pages(query, 'visit')
+        self.assertEqual(page, next(pages))
+        with self.assertRaises(PardotAPIArgumentError):
+            next(pages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,18 +2,23 @@ import unittest
 
 from pypardot.client import PardotAPI
 from pypardot.errors import PardotAPIArgumentError, PardotAPIError
+from pypardot.fake import FakePardot, FakeTransport
 
 try:
     from pypardot.objects.tests.config import *
     CONFIG_EXISTS = True
-except SystemError as e:
+except (SystemError, ImportError) as e:
     CONFIG_EXISTS = False
 
 
-@unittest.skipUnless(CONFIG_EXISTS, 'Requires Pardot configuration in config.py')
 class TestProspects(unittest.TestCase):
     def setUp(self):
-        self.pardot = PardotAPI(email=PARDOT_USER, password=PARDOT_PASSWORD, user_key=PARDOT_USER_KEY)
+        if CONFIG_EXISTS:
+            self.pardot = PardotAPI(email=PARDOT_USER, password=PARDOT_PASSWORD, user_key=PARDOT_USER_KEY)
+        else:
+            # Without a Pardot configuration in config.py, run against the fake Pardot instead.
+            self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                    transport=FakeTransport(FakePardot()))
         self.pardot.authenticate()
 
         self.email_address = 'parrot@harbles.com'
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.ratelimit import RateLimiter, fcntl
+
+
+def run_calls(limiters, calls, hold=0.0):
+    """Makes <calls> calls through each of <limiters> on a thread of its own, and returns the most in flight at once."""
+    state = {'in_flight': 0, 'max_in_flight': 0}
+    lock = threading.Lock()
+
+    def call(limiter):
+        with limiter.limit():
+            with lock:
+                state['in_flight'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            time.sleep(hold)
+            with lock:
+                state['in_flight'] -= 1
+
+    threads = [threading.Thread(target=call, args=(limiter,)) for limiter in limiters for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return state['max_in_flight']
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rate_and_burst(self):
+        limiter = RateLimiter(rate=20, burst=5)
+        start = time.time()
+        for _ in range(5):
+            with limiter.limit() as permit:
+                pass
+        self.assertLess(time.time() - start, 0.05)
+        for _ in range(10):
+            with limiter.limit() as permit:
+                pass
+        self.assertGreater(permit.waited, 0.02)
+        self.assertGreaterEqual(time.time() - start, 0.45)
+        self.assertEqual(15, limiter.calls)
+
+    def test_max_concurrent(self):
+        limiter = RateLimiter(max_concurrent=2)
+        self.assertEqual(2, run_calls([limiter], 6, hold=0.05))
+        self.assertEqual(6, limiter.calls)
+
+    def test_rate_limit_wait(self):
+        limiter = RateLimiter(rate=10, burst=1)
+        pardot = PardotAPI(email='email', password='password', user_key='user_key', rate_limiter=limiter,
+                           transport=FakeTransport(FakePardot()))
+        pardot.authenticate()
+        self.assertLess(pardot.rate_limit_wait, 0.05)
+        pardot.prospects.query()
+        self.assertGreater(pardot.rate_limit_wait, 0.05)
+        self.assertEqual(2, limiter.calls)
+        self.assertGreaterEqual(limiter.total_wait, pardot.rate_limit_wait)
+
+
+@unittest.skipIf(fcntl is None, 'Sharing a RateLimiter between processes requires fcntl')
+class TestSharedRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_shared_rate(self):
+        limiters = [RateLimiter(rate=20, burst=2, path=self.path) for _ in range(2)]
+        start = time.time()
+        run_calls(limiters, 6)
+        # 12 calls, 2 of them in the burst, at 20 per second between the two limiters.
+        self.assertGreaterEqual(time.time() - start, 0.45)
+
+    def test_shared_max_concurrent(self):
+        limiters = [RateLimiter(max_concurrent=2, path=self.path) for _ in range(2)]
+        self.assertEqual(2, run_calls(limiters, 4, hold=0.05))
+
+
+if __name__ == '__main__':
+    unittest.main()
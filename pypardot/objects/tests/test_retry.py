@@ -0,0 +1,99 @@
+import socket
+import unittest
+
+import requests
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.retry import RetryBudget, RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot()
+        self.fake.add('prospect', id=1, email='joe@example.com')
+        self.pardot = self._client(RetryPolicy(max_attempts=3, backoff=0, jitter=False))
+        self.pardot.authenticate()
+
+    def _client(self, policy, **kwargs):
+        return PardotAPI(email='email', password='password', user_key='user_key', transport=FakeTransport(self.fake),
+                         retry_policy=policy, **kwargs)
+
+    def test_statuses(self):
+        self.fake.fail_next(status=503, count=2, match='/do/read')
+        self.assertEqual(1, self.pardot.prospects.read_by_id(id=1)['prospect']['id'])
+        self.assertEqual(2, self.pardot.retry_count)
+
+        self.fake.fail_next(status=503, count=3, match='/do/read')
+        self.assertEqual(503, self.pardot.prospects.read_by_id(id=1))
+        self.assertEqual(2, self.pardot.retry_count)
+
+        self.fake.fail_next(status=404, match='/do/read')
+        self.assertEqual(404, self.pardot.prospects.read_by_id(id=1))
+        self.assertEqual(0, self.pardot.retry_count)
+
+    def test_writes(self):
+        # A write answered with a 5xx page may have been applied, and is not repeated.
+        self.fake.fail_next(status=503, match='/do/update')
+        self.assertEqual(503, self.pardot.prospects.update_by_id(id=1, first_name='Joe'))
+        self.assertEqual(0, self.pardot.retry_count)
+
+        # Pardot refuses requests with error 66 before processing them, so writes are retried.
+        self.fake.fail_next(err_code=66, match='/do/update')
+        self.pardot.prospects.update_by_id(id=1, first_name='Joe')
+        self.assertEqual(1, self.pardot.retry_count)
+
+        # A read timeout may come after Pardot received the request: reads are retried, writes aren't.
+        self.pardot.timeout = 0.05
+        self.fake.latency = 0.1
+        requests_made = self.fake.requests
+        self.assertRaises(requests.ReadTimeout, self.pardot.prospects.read_by_id, id=1)
+        self.assertRaises(requests.ReadTimeout, self.pardot.prospects.update_by_id, id=1, first_name='Joe')
+        self.assertEqual(4, self.fake.requests - requests_made)
+
+        writer = self._client(RetryPolicy(max_attempts=3, backoff=0, jitter=False, retry_writes=True), timeout=0.05)
+        writer.api_key = self.pardot.api_key
+        self.assertRaises(requests.ReadTimeout, writer.prospects.update_by_id, id=1, first_name='Joe')
+        self.assertEqual(2, writer.retry_count)
+
+    def test_connection_failures_retry_writes(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        port = server.getsockname()[1]
+        server.close()
+        pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                           base_uri='http://127.0.0.1:{0}'.format(port),
+                           retry_policy=RetryPolicy(max_attempts=3, backoff=0, jitter=False))
+        pardot.api_key = 'api_key'
+        self.assertRaises(requests.ConnectionError, pardot.prospects.create_by_email, email='new@example.com')
+        self.assertEqual(2, pardot.retry_count)
+        pardot.close()
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, initial=0, max_tokens=2)
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        for _ in range(10):
+            budget.deposit()
+        self.assertEqual(2, budget.tokens)
+
+        # Once the budget is spent, failures are raised without a retry.
+        pardot = self._client(RetryPolicy(max_attempts=5, backoff=0, jitter=False,
+                                          budget=RetryBudget(ratio=0, initial=1)))
+        pardot.api_key = self.pardot.api_key
+        self.fake.fail_next(err_code=66, count=3, match='/do/read')
+        with self.assertRaises(PardotAPIError):
+            pardot.prospects.read_by_id(id=1)
+        self.assertEqual(1, pardot.retry_count)
+        with self.assertRaises(PardotAPIError):
+            pardot.prospects.read_by_id(id=1)
+        self.assertEqual(0, pardot.retry_count)
+        self.assertEqual(1, pardot.prospects.read_by_id(id=1)['prospect']['id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.errors import PardotAPIError, PardotDeadlineExceeded
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_followers_share_error(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError('failed')
+
+        def follow():
+            started.wait()
+            try:
+                flight.do('key', lambda: 'not called')
+            except ValueError as err:
+                errors.append(err)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        self.assertRaises(ValueError, flight.do, 'key', fail)
+        follower.join()
+        self.assertEqual(1, len(errors))
+        self.assertEqual((2, 1), (flight.calls, flight.saved))
+
+    def test_follower_timeout(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        leader = threading.Thread(target=flight.do, args=('key', lambda: started.set() or time.sleep(0.3)))
+        leader.start()
+        started.wait()
+        self.assertRaises(PardotDeadlineExceeded, flight.do, 'key', lambda: 'not called', timeout=0.05)
+        leader.join()
+
+
+class TestCoalescedReads(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakePardot(latency=0.2)
+        self.fake.add('prospect', email='joe@example.com', first_name='Joe')
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake), coalesce_reads=True)
+        self.pardot.authenticate()
+
+    def read_concurrently(self, read, threads=16):
+        barrier = threading.Barrier(threads)
+        results = [None] * threads
+
+        def run(index):
+            barrier.wait()
+            try:
+                results[index] = read()
+            except PardotAPIError as err:
+                results[index] = err
+
+        workers = [threading.Thread(target=run, args=(index,)) for index in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_identical_reads_share_one_request(self):
+        requests = self.fake.requests
+        results = self.read_concurrently(lambda: self.pardot.prospects.read_by_id(id=1))
+        self.assertEqual(requests + 1, self.fake.requests)
+        self.assertEqual((16, 15), (self.pardot.single_flight.calls, self.pardot.single_flight.saved))
+        self.assertTrue(all(result['prospect']['first_name'] == 'Joe' for result in results))
+        results[0]['prospect']['first_name'] = 'Changed'
+        self.assertEqual('Joe', results[1]['prospect']['first_name'])
+
+    def test_errors_shared(self):
+        requests = self.fake.requests
+        results = self.read_concurrently(lambda: self.pardot.prospects.read_by_id(id=99))
+        self.assertEqual(requests + 1, self.fake.requests)
+        self.assertTrue(all(isinstance(result, PardotAPIError) for result in results))
+
+    def test_writes_not_coalesced(self):
+        requests = self.fake.requests
+        self.read_concurrently(lambda: self.pardot.prospects.update_by_id(id=1, first_name='Jo'), threads=4)
+        self.assertEqual(requests + 4, self.fake.requests)
+        self.assertEqual(0, self.pardot.single_flight.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
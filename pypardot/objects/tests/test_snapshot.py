@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pypardot.client import PardotAPI
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.snapshot import Snapshot, write_snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'prospects.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookups(self):
+        fake = FakePardot()
+        fake.generate('prospect', 450)
+        pardot = PardotAPI(email='email', password='password', user_key='user_key', transport=FakeTransport(fake))
+        self.assertEqual(450, write_snapshot(self.path, pardot.prospects.iter_query(keyset=True)))
+        self.assertEqual(['prospects.snapshot'], os.listdir(self.directory))
+
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(450, len(snapshot))
+            expected = fake.objects['prospect'][123]
+            prospect = snapshot.by_email('Prospect123@Example.com')
+            self.assertEqual((123, expected['first_name'], expected['score'], expected['campaign']['id']),
+                             (prospect['id'], prospect['first_name'], prospect['score'], prospect['campaign.id']))
+            self.assertEqual(prospect, snapshot.by_id(123))
+            self.assertEqual(prospect, snapshot.by_id('123'))
+            self.assertIsNone(snapshot.by_id(451))
+            self.assertIsNone(snapshot.by_email('nobody@example.com'))
+            self.assertEqual(list(range(1, 451)), [record['id'] for record in snapshot])
+
+    def test_missing_values_truncation_and_duplicates(self):
+        long_email = 'x' * 200 + '@example.com'
+        write_snapshot(self.path, [
+            {'id': 1, 'email': 'shared@example.com', 'first_name': None},
+            {'id': 2, 'email': long_email, 'company': u'é' * 100},
+            {'id': 3, 'email': 'SHARED@example.com', 'first_name': 'Later'}])
+        with Snapshot(self.path) as snapshot:
+            self.assertIsNone(snapshot.by_id(1)['first_name'])
+            self.assertIsNone(snapshot.by_id(1)['score'])
+            self.assertEqual(3, snapshot.by_email('shared@example.com')['id'])
+            self.assertEqual(2, snapshot.by_email(long_email)['id'])
+            self.assertEqual(u'é' * 64, snapshot.by_id(2)['company'])
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 256)
+        self.assertRaises(ValueError, Snapshot, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
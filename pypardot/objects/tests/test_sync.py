@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from pypardot.client import PardotAPI
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.sync import IncrementalSync
+from pypardot.util import DATE_FORMAT
+
+
+class TestIncrementalSync(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, 'prospects.sync.json')
+        self.fake = FakePardot()
+        self.fake.generate('prospect', 450)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def sync(self, objects=None, **kwargs):
+        return IncrementalSync(objects or self.pardot.prospects, self.checkpoint, **kwargs)
+
+    def test_only_changes_after_first_run(self):
+        sync = self.sync()
+        self.assertEqual(450, len(list(sync)))
+        self.assertEqual('2015-01-01 07:29:00', sync.watermark)
+
+        for _ in range(2):
+            sync = self.sync()
+            self.assertEqual([], list(sync))
+            self.assertEqual(5, sync.skipped)
+
+        self.pardot.prospects.update_by_id(id=7, first_name='Changed')
+        self.pardot.prospects.update_by_id(id=300, first_name='Changed')
+        self.assertEqual([7, 300], [prospect['id'] for prospect in self.sync()])
+        self.assertEqual([], list(self.sync()))
+
+    def test_overlap_catches_late_records(self):
+        list(self.sync())
+        late = (datetime.strptime(self.sync().watermark, DATE_FORMAT) - timedelta(seconds=60)).strftime(DATE_FORMAT)
+        self.fake.add('prospect', email='late@example.com', updated_at=late, created_at=late)
+        self.assertEqual(['late@example.com'], [prospect['email'] for prospect in self.sync()])
+
+    def test_resume_interrupted_run(self):
+        delivered = []
+        for prospect in self.sync():
+            delivered.append(prospect['id'])
+            if len(delivered) == 250:
+                break
+        with open(self.checkpoint) as f:
+            self.assertEqual(200, json.load(f)['scan']['last_id'])
+        delivered.extend(prospect['id'] for prospect in self.sync())
+        self.assertEqual(list(range(1, 451)), sorted(set(delivered)))
+        self.assertEqual(500, len(delivered))
+
+    def test_id_watermark(self):
+        self.fake.generate('visitorActivity', 250)
+        sync = self.sync(self.pardot.visitoractivities, field='id')
+        self.assertEqual(250, sync.run(lambda activity: None))
+        self.fake.generate('visitorActivity', 3)
+        self.assertEqual([251, 252, 253], [activity['id'] for activity in self.sync(self.pardot.visitoractivities,
+                                                                                    field='id')])
+
+    def test_offset_paging_objects(self):
+        self.fake.generate('opportunity', 250)
+        self.assertEqual(250, len(list(self.sync(self.pardot.opportunities))))
+        self.pardot.opportunities.update(id=3)
+        self.assertEqual([3], [opportunity['id'] for opportunity in self.sync(self.pardot.opportunities)])
+
+
+if __name__ == '__main__':
+    unittest.main()
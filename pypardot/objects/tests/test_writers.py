@@ -0,0 +1,95 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pypardot import writers
+from pypardot.client import PardotAPI
+from pypardot.fake import FakePardot, FakeTransport
+from pypardot.util import atomic_file, write_atomic
+from pypardot.writers import StreamingExport
+
+
+class TestStreamingExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fake = FakePardot()
+        self.fake.generate('prospect', 450)
+        self.pardot = PardotAPI(email='email', password='password', user_key='user_key',
+                                transport=FakeTransport(self.fake))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_jsonl(self, paths):
+        rows = []
+        for path in paths:
+            with gzip.open(path, 'rt') as f:
+                rows.extend(json.loads(line) for line in f)
+        return rows
+
+    def test_atomic_file(self):
+        path = os.path.join(self.directory, 'state.json')
+        write_atomic(path, 'old')
+        with self.assertRaises(ValueError):
+            with atomic_file(path, 'w', encoding='utf-8') as f:
+                f.write('partial')
+                raise ValueError('interrupted')
+        with open(path) as f:
+            self.assertEqual('old', f.read())
+        self.assertEqual(['state.json'], os.listdir(self.directory))
+
+    def test_jsonl_parts_and_flattening(self):
+        paths = StreamingExport(self.pardot.prospects, self.directory, part_size=200).run()
+        self.assertEqual(['prospects-00000.jsonl.gz', 'prospects-00001.jsonl.gz', 'prospects-00002.jsonl.gz'],
+                         [os.path.basename(path) for path in paths])
+        rows = self.read_jsonl(paths)
+        self.assertEqual(list(range(1, 451)), [row['id'] for row in rows])
+        self.assertIn('campaign.name', rows[0])
+        self.assertEqual(list(rows[0]), list(rows[-1]))
+
+    def test_resume_after_interruption(self):
+        self.fake.add('prospect', email='late@example.com', nickname='new field')
+        export = StreamingExport(self.pardot.prospects, self.directory, format='csv', part_size=100, sample_size=50)
+        queries = []
+        original = self.pardot.prospects.query
+
+        def failing_query(**kwargs):
+            queries.append(kwargs)
+            if len(queries) == 3:
+                raise RuntimeError('interrupted')
+            return original(**kwargs)
+
+        self.pardot.prospects.query = failing_query
+        self.assertRaises(Exception, export.run)
+        self.pardot.prospects.query = original
+        completed = StreamingExport(self.pardot.prospects, self.directory, format='csv', part_size=100,
+                                    sample_size=50)
+        paths = completed.run()
+        self.assertEqual(5, len(paths))
+        rows = []
+        for path in paths:
+            with gzip.open(path, 'rt', newline='') as f:
+                rows.extend(csv.DictReader(f))
+        self.assertEqual([str(i) for i in range(1, 452)], [row['id'] for row in rows])
+        self.assertEqual({'nickname'}, completed.unknown_columns)
+        self.assertEqual(paths, StreamingExport(self.pardot.prospects, self.directory, format='csv').run())
+
+    @unittest.skipIf(writers.pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        import pyarrow.parquet
+        paths = StreamingExport(self.pardot.prospects, self.directory, format='parquet', output='bulk',
+                                options={'row_group_size': 100}).run()
+        parquet = pyarrow.parquet.ParquetFile(paths[0])
+        self.assertEqual(5, parquet.num_row_groups)
+        table = parquet.read()
+        self.assertEqual(450, table.num_rows)
+        self.assertTrue(str(table.schema.field('created_at').type).startswith('timestamp'))
+        self.assertEqual('int64', str(table.schema.field('score').type))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Users(object):
     """
     A class to query and use Pardot users.
@@ -7,32 +10,33 @@ class Users(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the users matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/users/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['users'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['user'] = []
-        elif result['total_results'] == 1:
-            result['user'] = [result['user']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'user')
 
-        return result
+    def iter_query(self, prefetch=False, **kwargs):
+        """
+        Yields the users matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        """
+        return iter_records(self.query, 'user', prefetch=prefetch, **kwargs)
 
     def read_by_id(self, id=None, **kwargs):
         """
         Returns the data for the user specified by <id>. <id> is the Pardot ID of the target user."""
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
+        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs, coalesce=True)
         return response
 
     def read_by_email(self, email=None, **kwargs):
         """
         Returns the data for the user specified by <email>. <email> is the email address of the target user."""
-        response = self._post(path='/do/read/email/{email}'.format(email=email), params=kwargs)
+        response = self._post(path='/do/read/email/{email}'.format(email=email), params=kwargs, coalesce=True)
         return response
 
     def _get(self, object_name='user', path=None, params=None):
@@ -42,9 +46,9 @@ class Users(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='user', path=None, params=None):
+    def _post(self, object_name='user', path=None, params=None, coalesce=False):
         """POST requests for the User object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class VisitorActivities(object):
     """
     A class to query and use Pardot visitor activities.
@@ -7,27 +10,31 @@ class VisitorActivities(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the visitor activities matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/visitor-activities/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['visitor_activity'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['visitor_activity'] = []
-        elif result['total_results'] == 1:
-            result['visitor_activity'] = [result['visitor_activity']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'visitor_activity')
 
-        return result
+    def iter_query(self, prefetch=False, keyset=False, start_id=None, **kwargs):
+        """
+        Yields the visitor activities matching the specified criteria parameters one at a time, paging through all
+        results. Set <prefetch> to fetch the next page on a background thread while the current one is being
+        consumed. With <keyset>, results are read in id order using <id_greater_than> rather than offsets, which
+        keeps deep scans fast; pass the id of the last record processed as <start_id> to resume an interrupted scan.
+        """
+        return iter_records(self.query, 'visitor_activity', prefetch=prefetch, keyset=keyset, start_id=start_id,
+                            **kwargs)
 
     def read(self, id=None, **kwargs):
         """
         Returns the data for the visitor activity specified by <id>. <id> is the Pardot ID for the target visitor activity.
         """
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
+        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs, coalesce=True)
         return response
 
     def _get(self, object_name='visitorActivity', path=None, params=None):
@@ -37,9 +44,9 @@ class VisitorActivities(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='visitorActivity', path=None, params=None):
+    def _post(self, object_name='visitorActivity', path=None, params=None, coalesce=False):
         """POST requests for the Visitor Activity object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Visitors(object):
     """
     A class to query and use Pardot visitors.
@@ -7,21 +10,24 @@ class Visitors(object):
     def __init__(self, client):
         self.client = client
 
-    def query(self, **kwargs):
+    def query(self, output=None, fields=None, **kwargs):
         """
         Returns the visitors matching the specified criteria parameters.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
         Supported search criteria: http://developer.pardot.com/kb/api-version-3/visitors/#supported-search-criteria
         """
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['visitor'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['visitor'] = []
-        elif result['total_results'] == 1:
-            result['visitor'] = [result['visitor']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'visitor')
 
-        return result
+    def iter_query(self, prefetch=False, keyset=False, start_id=None, **kwargs):
+        """
+        Yields the visitors matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        With <keyset>, results are read in id order using <id_greater_than> rather than offsets, which keeps deep
+        scans fast; pass the id of the last record processed as <start_id> to resume an interrupted scan.
+        """
+        return iter_records(self.query, 'visitor', prefetch=prefetch, keyset=keyset, start_id=start_id, **kwargs)
 
     def assign(self, id=None, **kwargs):
         """
@@ -37,7 +43,7 @@ class Visitors(object):
         Returns the data for the visitor specified by <id>, including associated visitor activities, identified
         company data, and visitor referrers. <id> is the Pardot ID for the target visitor.
         """
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
+        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs, coalesce=True)
         return response
 
     def _get(self, object_name='visitor', path=None, params=None):
@@ -47,9 +53,9 @@ class Visitors(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='visitor', path=None, params=None):
+    def _post(self, object_name='visitor', path=None, params=None, coalesce=False):
         """POST requests for the Visitor object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
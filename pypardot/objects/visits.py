@@ -1,3 +1,6 @@
+from ..paging import iter_records, query_params, query_result
+
+
 class Visits(object):
     """
     A class to query and use Pardot visits.
@@ -7,58 +10,52 @@ class Visits(object):
     def __init__(self, client):
         self.client = client
 
-    def query_by_ids(self, ids=None, **kwargs):
-        """Returns the visits matching the given <ids>. The <ids> should be comma separated integers (no spaces)."""
-        kwargs['ids'] = ids.replace(' ', '')
-        response = self._get(path='/do/query', params=kwargs)
+    def query(self, output=None, fields=None, **kwargs):
+        """
+        Returns the visits matching the specified criteria parameters. One of <ids>, <visitor_ids> or <prospect_ids>
+        is required.
+        <output> selects the output format, one of full (the default), simple, mobile or bulk, and <fields> the
+        fields to return, as a list of names.
+        Supported search criteria: http://developer.pardot.com/kb/api-version-3/visits/#supported-search-criteria
+        """
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'visit')
 
-        # Ensure result['visit'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['visit'] = []
-        elif result['total_results'] == 1:
-            result['visit'] = [result['visit']]
+    def iter_query(self, prefetch=False, **kwargs):
+        """
+        Yields the visits matching the specified criteria parameters one at a time, paging through all results.
+        Set <prefetch> to fetch the next page on a background thread while the current one is being consumed.
+        """
+        return iter_records(self.query, 'visit', prefetch=prefetch, **kwargs)
 
-        return result
+    def query_by_ids(self, ids=None, output=None, fields=None, **kwargs):
+        """Returns the visits matching the given <ids>. The <ids> should be comma separated integers (no spaces)."""
+        kwargs['ids'] = ids.replace(' ', '')
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'visit')
 
-    def query_by_visitor_ids(self, visitor_ids=None, **kwargs):
+    def query_by_visitor_ids(self, visitor_ids=None, output=None, fields=None, **kwargs):
         """
         Returns the visits matching the given <visitor ids>. The <visitor ids> should be comma separated integers
         (no spaces).
         """
         kwargs['visitor_ids'] = visitor_ids.replace(' ', '')
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['visit'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['visit'] = []
-        elif result['total_results'] == 1:
-            result['visit'] = [result['visit']]
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'visit')
 
-        return result
-
-    def query_by_prospect_ids(self, prospect_ids=None, **kwargs):
+    def query_by_prospect_ids(self, prospect_ids=None, output=None, fields=None, **kwargs):
         """
         Returns the visits matching the given <prospect ids>. The <prospect ids> should be comma separated integers
         (no spaces).
         """
         kwargs['prospect_ids'] = prospect_ids.replace(' ', '')
-        response = self._get(path='/do/query', params=kwargs)
-
-        # Ensure result['visit'] is a list, no matter what.
-        result = response.get('result')
-        if result['total_results'] == 0:
-            result['visit'] = []
-        elif result['total_results'] == 1:
-            result['visit'] = [result['visit']]
-
-        return result
+        response = self._get(path='/do/query', params=query_params(kwargs, output, fields))
+        return query_result(response, 'visit')
 
     def read(self, id=None, **kwargs):
         """
         Returns the data for the visit specified by <id>. <id> is the Pardot ID of the target visit."""
-        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs)
+        response = self._post(path='/do/read/id/{id}'.format(id=id), params=kwargs, coalesce=True)
         return response
 
     def _get(self, object_name='visit', path=None, params=None):
@@ -68,9 +65,9 @@ class Visits(object):
         response = self.client.get(object_name=object_name, path=path, params=params)
         return response
 
-    def _post(self, object_name='visit', path=None, params=None):
+    def _post(self, object_name='visit', path=None, params=None, coalesce=False):
         """POST requests for the Visit object."""
         if params is None:
             params = {}
-        response = self.client.post(object_name=object_name, path=path, params=params)
+        response = self.client.post(object_name=object_name, path=path, params=params, coalesce=coalesce)
         return response
@@ -0,0 +1,153 @@
+import threading
+
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full
+
+from .deadline import propagate
+from .errors import PardotAPIArgumentError
+
+# Pardot returns at most 200 records per query request.
+PAGE_SIZE = 200
+
+# Output formats accepted by query requests, from the most to the least detailed. Full output includes nested data
+# (e.g. a prospect's visitor activities and list subscriptions), simple and bulk output only the record's own fields,
+# and mobile output a handful of them. Bulk output also leaves out <total_results>, which Pardot would otherwise have
+# to count for every page.
+OUTPUT_FORMATS = ('full', 'simple', 'mobile', 'bulk')
+
+
+def query_params(criteria, output=None, fields=None):
+    """
+    Returns the parameters of a query request for <criteria>, in the <output> format, and, if <fields> (a list of
+    field names) is given, with only those fields and the id in each record.
+    """
+    params = dict(criteria)
+    if output is not None:
+        if output not in OUTPUT_FORMATS:
+            raise PardotAPIArgumentError('output must be one of {0}, not {1!r}'.format(', '.join(OUTPUT_FORMATS),
+                                                                                     output))
+        params['output'] = output
+    if fields is not None:
+        if not isinstance(fields, str):
+            fields = ','.join(['id'] + [field for field in fields if field != 'id'])
+        params['fields'] = fields
+    return params
+
+
+def query_result(response, result_key):
+    """
+    Returns the result of a query <response>, with result[<result_key>] always a list of records: Pardot leaves it
+    out when nothing matched, and returns a single record rather than a list of one.
+    """
+    result = response.get('result') or {}
+    records = result.get(result_key)
+    if records is None:
+        result[result_key] = []
+    elif not isinstance(records, list):
+        result[result_key] = [records]
+    return result
+
+
+def iter_records(query, result_key, prefetch=False, keyset=False, start_id=None, limit=PAGE_SIZE, **criteria):
+    """
+    Pages through every record matching <criteria> by calling <query> (one of the object classes' query methods)
+    with increasing offsets, and yields the records under result[<result_key>] one at a time. Only the current page
+    is held in memory, or, with <prefetch>, the current page plus the next one, which is fetched on a background
+    thread while the current page is consumed. With <keyset>, pages are read in id order, each starting after the
+    last id seen instead of at an offset (see iter_keyset_pages), and the scan starts after <start_id> if given.
+    """
+    if keyset:
+        pages = iter_keyset_pages(query, result_key, start_id=start_id, limit=limit, **criteria)
+    else:
+        pages = iter_pages(query, result_key, limit=limit, **criteria)
+    if prefetch:
+        pages = prefetch_pages(pages)
+    for page in pages:
+        for record in page:
+            yield record
+
+
+def iter_pages(query, result_key, limit=PAGE_SIZE, **criteria):
+    """Yields the pages (lists of records) of the query results, following <offset> until all results are read."""
+    offset = int(criteria.pop('offset', 0))
+    while True:
+        result = query(limit=limit, offset=offset, **criteria)
+        page = result[result_key]
+        if page:
+            yield page
+        offset += len(page)
+        # Bulk output has no total_results; a short page then marks the end.
+        if len(page) < limit or offset >= int(result.get('total_results', offset + 1)):
+            return
+
+
+def iter_keyset_pages(query, result_key, start_id=None, limit=PAGE_SIZE, **criteria):
+    """
+    Yields the pages of the query results sorted by ascending id, requesting each page with <id_greater_than> set to
+    the last id of the previous one. Unlike offsets, which the API has to skip over, every request costs the same no
+    matter how deep into the results it is, and an interrupted scan can be resumed by passing the last id it
+    processed as <start_id>. Only objects supporting the id_greater_than criterion can be paged this way; if a page
+    does not start after the previous one, the criterion was ignored and PardotAPIArgumentError is raised rather than
+    reading the same page forever.
+    """
+    last_id = start_id if start_id is not None else criteria.pop('id_greater_than', None)
+    criteria.pop('offset', None)
+    criteria.update({'sort_by': 'id', 'sort_order': 'ascending'})
+    while True:
+        if last_id is not None:
+            criteria['id_greater_than'] = last_id
+        result = query(limit=limit, **criteria)
+        page = result[result_key]
+        if page:
+            if last_id is not None and int(page[-1]['id']) <= int(last_id):
+                raise PardotAPIArgumentError('Keyset paging needs the id_greater_than criterion, which the query of '
+                                             '{0} ignored.'.format(result_key))
+            last_id = page[-1]['id']
+            yield page
+        if len(page) < limit:
+            return
+
+
+def prefetch_pages(pages):
+    """
+    Iterates <pages> on a background thread, staying at most one page ahead of the consumer. Errors raised while
+    fetching are re-raised in the consumer, and closing the iterator early stops the background thread. The
+    background thread inherits the consumer's deadline and request timeout (see pypardot.deadline).
+    """
+    queue = Queue(maxsize=1)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+        except Exception as err:
+            put((None, err))
+            return
+        put((None, None))
+
+    thread = threading.Thread(target=propagate(produce), name='pypardot-prefetch')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            page, error = queue.get()
+            if error is not None:
+                raise error
+            if page is None:
+                return
+            yield page
+    finally:
+        stop.set()
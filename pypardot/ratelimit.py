@@ -0,0 +1,168 @@
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class Permit(object):
+    """Handed out by RateLimiter.limit() for the duration of one call. <waited> is the time it queued, in seconds."""
+
+    def __init__(self, waited):
+        self.waited = waited
+
+
+class RateLimiter(object):
+    """
+    Limits API calls to <rate> per second, allowing bursts of up to <burst> calls (defaults to <rate>), and to at
+    most <max_concurrent> calls in flight at once. Either limit may be None. Calls over a limit wait their turn rather
+    than fail. A limiter can be shared by any number of clients and threads; to also share it between processes on
+    the same host, give every process the same <path>, a directory where the limiter keeps its state in small locked
+    files (e.g. under /dev/shm).
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrent=None, path=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.max_concurrent = max_concurrent
+        self.calls = 0
+        self.total_wait = 0.0
+        self._lock = threading.Lock()
+        if path is None:
+            self._bucket = _LocalBucket(rate, self.burst) if rate else None
+            self._slots = _LocalSlots(max_concurrent) if max_concurrent else None
+        else:
+            if fcntl is None:
+                raise RuntimeError('Sharing a RateLimiter between processes requires fcntl (POSIX systems only).')
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self._bucket = _FileBucket(os.path.join(path, 'bucket'), rate, self.burst) if rate else None
+            self._slots = _FileSlots(path, max_concurrent) if max_concurrent else None
+
+    @contextmanager
+    def limit(self):
+        """
+        Waits until a call is allowed, then holds a concurrency slot for the duration of the with block. Yields a
+        Permit recording how long the call waited.
+        """
+        start = time.time()
+        slot = self._slots.acquire() if self._slots else None
+        try:
+            if self._bucket:
+                self._bucket.take()
+            permit = Permit(time.time() - start)
+            with self._lock:
+                self.calls += 1
+                self.total_wait += permit.waited
+            yield permit
+        finally:
+            if slot is not None:
+                self._slots.release(slot)
+
+
+class _LocalBucket(object):
+    """Token bucket shared by the threads of one process."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class _LocalSlots(object):
+    """In-flight call slots shared by the threads of one process."""
+
+    def __init__(self, count):
+        self.semaphore = threading.BoundedSemaphore(count)
+
+    def acquire(self):
+        self.semaphore.acquire()
+        return True
+
+    def release(self, slot):
+        self.semaphore.release()
+
+
+class _FileBucket(object):
+    """
+    Token bucket shared between processes. The token count and the time it was last updated are stored in a file that
+    is locked while a process takes a token.
+    """
+    STATE = struct.Struct('dd')
+
+    def __init__(self, path, rate, burst):
+        self.path = path
+        self.rate = float(rate)
+        self.burst = float(burst)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+
+    def take(self):
+        while True:
+            with open(self.path, 'r+b') as state:
+                fcntl.flock(state, fcntl.LOCK_EX)
+                try:
+                    data = state.read(self.STATE.size)
+                    now = time.time()
+                    if len(data) == self.STATE.size:
+                        tokens, updated = self.STATE.unpack(data)
+                        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                    else:
+                        tokens = self.burst
+                    taken = tokens >= 1
+                    if taken:
+                        tokens -= 1
+                    state.seek(0)
+                    state.write(self.STATE.pack(tokens, now))
+                    state.flush()
+                finally:
+                    fcntl.flock(state, fcntl.LOCK_UN)
+            if taken:
+                return
+            time.sleep((1 - tokens) / self.rate)
+
+
+class _FileSlots(object):
+    """
+    In-flight call slots shared between processes: one lock file per slot, held with flock for the duration of the
+    call. The operating system releases the locks of a process that dies, so crashed workers never leak slots.
+    """
+
+    def __init__(self, path, count):
+        self.paths = [os.path.join(path, 'slot-{0}.lock'.format(index)) for index in range(count)]
+
+    def acquire(self):
+        delay = 0.001
+        while True:
+            for path in self.paths:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except (IOError, OSError):
+                    os.close(fd)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
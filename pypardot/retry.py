@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+from .errors import PardotAPIError
+
+# Pardot error code returned when an account has too many requests in flight.
+TOO_MANY_CONCURRENT_REQUESTS = 66
+
+
+class RetryBudget(object):
+    """
+    Limits retries to a fraction of the calls made, so that retries cannot multiply the load on Pardot during an
+    outage. Every call deposits <ratio> tokens, up to <max_tokens>, and every retry spends one; once the budget is
+    spent, failures are raised straight away until enough calls have succeeded in being sent again. Starts with
+    <initial> tokens. A budget is thread-safe and can be shared by several clients.
+    """
+
+    def __init__(self, ratio=0.1, initial=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min(initial, max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Spends a token for a retry. Returns False if the budget is exhausted."""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Decides which failed calls PardotAPI retries and how long it waits in between. A call is retried when it fails with
+    a PardotAPIError whose code is in <err_codes>, raises one of <exceptions>, or gets back a non-JSON response with
+    an HTTP status in <statuses>.
+
+    Calls that change data (creates, updates, deletes, sends, batches, ...) may have reached Pardot even though they
+    timed out or got back an error page, and repeating them could e.g. send an email twice. Unless <retry_writes> is
+    set, they are only retried on the errors in <err_codes>, which Pardot returns without processing the request, and
+    on connection failures, when the request provably never reached Pardot.
+
+    A call is tried at most <max_attempts> times, waiting an exponential backoff starting at <backoff> seconds and
+    capped at <max_backoff>; with <jitter> the wait is drawn at random up to that value, so clients that failed
+    together don't retry together. No retry is started that would end after <deadline> seconds from the first
+    attempt, and retries are only made while the optional RetryBudget <budget> allows them.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30.0, jitter=True,
+                 err_codes=(TOO_MANY_CONCURRENT_REQUESTS,), statuses=(500, 502, 503, 504),
+                 exceptions=(requests.ConnectionError, requests.Timeout), deadline=None, budget=None,
+                 retry_writes=False):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.err_codes = set(int(code) for code in err_codes)
+        self.statuses = set(statuses)
+        self.exceptions = tuple(exceptions)
+        self.deadline = deadline
+        self.budget = budget
+        self.retry_writes = retry_writes
+
+    def record_call(self):
+        """Called once for every call made, before its first attempt."""
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def retryable(self, error=None, status=None, write=False):
+        """
+        Returns True if a call failing with <error>, or answered with HTTP <status>, may be retried. <write> is True
+        for calls that change data.
+        """
+        if error is not None:
+            if isinstance(error, PardotAPIError):
+                return int(error.err_code) in self.err_codes
+            if not isinstance(error, self.exceptions):
+                return False
+            return not write or self.retry_writes or _not_sent(error)
+        return status in self.statuses and (not write or self.retry_writes)
+
+    def delay(self, attempt):
+        """Returns the time to wait before the retry following the <attempt>th attempt."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    def next_delay(self, attempt, started, error=None, status=None, write=False):
+        """
+        Returns the time to wait before retrying a call whose <attempt>th attempt failed with <error> or <status>, or
+        None if it should not be retried. <started> is the time of the first attempt, and <write> is True for calls
+        that change data.
+        """
+        if attempt >= self.max_attempts or not self.retryable(error=error, status=status, write=write):
+            return None
+        delay = self.delay(attempt)
+        if self.deadline is not None and time.time() + delay - started >= self.deadline:
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            return None
+        return delay
+
+
+def _not_sent(error):
+    """Returns True if the requests exception <error> shows that the connection to Pardot could not be made."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if isinstance(error, requests.ConnectionError) and error.args \
+        else None
+    # urllib3 reports refused connections and failed DNS lookups as NewConnectionError, a ConnectTimeoutError.
+    return isinstance(reason, ConnectTimeoutError)
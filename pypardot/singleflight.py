@@ -0,0 +1,73 @@
+import copy
+import threading
+
+from .errors import PardotDeadlineExceeded
+
+
+class SingleFlight(object):
+    """
+    Coalesces identical calls made at the same time: the first call for a key runs, and the calls for the same key
+    arriving while it is in flight wait for it and share its result (each getting its own copy) or its error.
+
+    <calls> counts the calls made, and <saved> those that were answered by another call instead of running.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, timeout=None):
+        """
+        Returns the result of <function>(), or of the call for <key> already in flight. A waiting call gives up after
+        <timeout> seconds, if given, with PardotDeadlineExceeded.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                flight.followers += 1
+                self.saved += 1
+                leader = False
+        if leader:
+            return self._lead(key, flight, function)
+        if not flight.done.wait(timeout):
+            raise PardotDeadlineExceeded('Deadline exceeded waiting for an identical request in flight')
+        if flight.error is not None:
+            raise flight.error
+        if flight.result is _NO_RESULT:
+            raise PardotDeadlineExceeded('The identical request in flight was interrupted')
+        return copy.deepcopy(flight.result)
+
+    def _lead(self, key, flight, function):
+        result = succeeded = None
+        try:
+            result = function()
+            succeeded = True
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                followers = flight.followers
+            if followers and succeeded:
+                # Followers copy a snapshot taken now, as the caller may modify the result as soon as it is returned.
+                flight.result = copy.deepcopy(result)
+            flight.done.set()
+        return result
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = _NO_RESULT
+        self.error = None
+
+
+_NO_RESULT = object()
@@ -0,0 +1,292 @@
+import hashlib
+import io
+import json
+import mmap
+import struct
+import time
+from array import array
+
+from .util import atomic_file
+
+# Fields of a prospect snapshot by default: (name, type, width), with dotted names for nested fields. Strings are
+# stored in <width> bytes of UTF-8, and truncated to fit.
+PROSPECT_FIELDS = (
+    ('id', 'int'),
+    ('email', 'str', 128),
+    ('first_name', 'str', 40),
+    ('last_name', 'str', 80),
+    ('company', 'str', 128),
+    ('score', 'int'),
+    ('grade', 'str', 4),
+    ('is_do_not_email', 'bool'),
+    ('campaign.id', 'int'),
+    ('created_at', 'str', 19),
+    ('updated_at', 'str', 19),
+)
+
+MAGIC = b'PYPARDOT-SNAPSHOT'
+VERSION = 1
+
+# magic, version, record size, records, slots per index, then the offset of the schema, its length, and the
+# offsets of the records, the id index and the email index.
+_HEADER = struct.Struct('<17sxHIQQQQQQQ')
+# One index slot: the key's 8-byte hash (0 for an empty slot) and the record's number plus one.
+_SLOT = struct.Struct('<QQ')
+_FORMATS = {'int': 'q', 'float': 'd', 'bool': '?'}
+
+
+def write_snapshot(path, records, fields=PROSPECT_FIELDS):
+    """
+    Writes <records>, e.g. p.prospects.iter_query(keyset=True), to a snapshot file at <path>, and returns the
+    number written. Records are read one at a time and stored in the fixed-width layout given by <fields>, followed
+    by hash indexes on id and email. The file is written next to <path> and then moved into place, so processes
+    reading the previous snapshot keep reading it until they open the new one.
+    """
+    layout = _Layout([list(field) for field in fields])
+    ids, emails = array('Q'), array('Q')
+    schema = json.dumps({'fields': layout.fields, 'created': time.time()}).encode('utf-8')
+    schema_offset = _HEADER.size
+    records_offset = _align(schema_offset + len(schema))
+    with atomic_file(path, 'w+b') as f:
+        f.write(b'\0' * records_offset)
+        count = 0
+        for record in records:
+            values = layout.values(record)
+            f.write(layout.pack(values))
+            ids.append(_hash(_id_key(values[layout.id_index])))
+            emails.append(_hash(layout.email_key(values[layout.email_index]))
+                          if layout.email_index is not None and values[layout.email_index] else 0)
+            count += 1
+        slots = _slot_count(count)
+        id_index_offset = _align(records_offset + count * layout.size)
+        email_index_offset = id_index_offset + slots * _SLOT.size
+        f.write(b'\0' * (email_index_offset + slots * _SLOT.size - f.tell()))
+        f.flush()
+        with _map(f.fileno(), write=True) as data:
+            reader = _Records(data, layout, records_offset, count)
+            _build_index(data, id_index_offset, slots, ids, reader, layout.id_index)
+            if layout.email_index is not None:
+                _build_index(data, email_index_offset, slots, emails, reader, layout.email_index)
+            data[:_HEADER.size] = _HEADER.pack(MAGIC, VERSION, layout.size, count, slots, schema_offset,
+                                               len(schema), records_offset, id_index_offset, email_index_offset)
+            data[schema_offset:schema_offset + len(schema)] = schema
+            data.flush()
+    return count
+
+
+class Snapshot(object):
+    """
+    A read-only snapshot of prospects written by write_snapshot(), memory-mapped so that every process opening the
+    same file shares its pages through the operating system's page cache. Lookups hash the id or email address,
+    probe the index and decode only the record found, so they take constant time whatever the size of the file:
+
+        snapshot = Snapshot('/var/lib/pardot/prospects.snapshot')
+        prospect = snapshot.by_email('joe@company.com')
+
+    Records are returned as flat dicts of the snapshot's fields, with dotted names for nested ones. Emails are
+    matched case-insensitively; if several prospects share an email address, the one written last is returned.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with io.open(path, 'rb') as f:
+            self.data = _map(f.fileno())
+        (magic, version, record_size, self.count, self.slots, schema_offset, schema_length, records_offset,
+         self.id_index_offset, self.email_index_offset) = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError('{0} is not a snapshot this version of pypardot can read'.format(path))
+        schema = json.loads(self.data[schema_offset:schema_offset + schema_length].decode('utf-8'))
+        self.created = schema['created']
+        self.layout = _Layout(schema['fields'])
+        if self.layout.size != record_size:
+            self.data.close()
+            raise ValueError('{0} has records of {1} bytes, not {2}'.format(path, record_size, self.layout.size))
+        self.records = _Records(self.data, self.layout, records_offset, self.count)
+
+    def by_id(self, id):
+        """Returns the prospect with <id>, or None."""
+        key = _id_key(id)
+        values = _lookup(self.data, self.id_index_offset, self.slots, _hash(key), self.records,
+                         self.layout.id_index, key)
+        return self.layout.unpack(values) if values is not None else None
+
+    def by_email(self, email):
+        """Returns the prospect with the email address <email>, or None."""
+        if self.layout.email_index is None or not email:
+            return None
+        key = self.layout.email_key(email)
+        values = _lookup(self.data, self.email_index_offset, self.slots, _hash(key), self.records,
+                         self.layout.email_index, key)
+        return self.layout.unpack(values) if values is not None else None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for number in range(self.count):
+            yield self.records.record(number)
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _Layout(object):
+    """The fixed-width layout of the records: a null flag per field, then the fields in the order given."""
+
+    def __init__(self, fields):
+        self.fields = [list(field) for field in fields]
+        self.names = [field[0] for field in fields]
+        self.paths = [name.split('.') for name in self.names]
+        self.types = [field[1] for field in fields]
+        self.widths = [field[2] if field[1] == 'str' else None for field in fields]
+        if 'id' not in self.names:
+            raise ValueError('A snapshot needs an id field')
+        self.id_index = self.names.index('id')
+        self.email_index = self.names.index('email') if 'email' in self.names else None
+        self.struct = struct.Struct('<{0}s'.format(len(fields)) + ''.join(
+            '{0}s'.format(width) if kind == 'str' else _FORMATS[kind] for kind, width in zip(self.types, self.widths)))
+        self.size = self.struct.size
+        self.defaults = [b'' if kind == 'str' else False if kind == 'bool' else 0 for kind in self.types]
+
+    def email_key(self, email):
+        """The index key of <email>: lowercased, as truncated in the records."""
+        return _email_key(_truncate(email, self.widths[self.email_index]).decode('utf-8'))
+
+    def values(self, record):
+        values = []
+        for path in self.paths:
+            value = record
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value)
+        return values
+
+    def pack(self, values):
+        present = bytes(bytearray(value is not None for value in values))
+        packed = [present]
+        for value, kind, width, default in zip(values, self.types, self.widths, self.defaults):
+            if value is None:
+                packed.append(default)
+            elif kind == 'str':
+                packed.append(_truncate(value, width))
+            elif kind == 'int':
+                packed.append(int(value))
+            elif kind == 'float':
+                packed.append(float(value))
+            else:
+                packed.append(value in (True, 'true', '1', 1))
+        return self.struct.pack(*packed)
+
+    def unpack(self, values):
+        record = {}
+        present = values[0]
+        for index, (name, kind, value) in enumerate(zip(self.names, self.types, values[1:])):
+            if not present[index]:
+                record[name] = None
+            elif kind == 'str':
+                record[name] = value.rstrip(b'\0').decode('utf-8')
+            else:
+                record[name] = value
+        return record
+
+
+class _Records(object):
+    """The records section of a mapped snapshot."""
+
+    def __init__(self, data, layout, offset, count):
+        self.data = data
+        self.layout = layout
+        self.offset = offset
+        self.count = count
+
+    def values(self, number):
+        return self.layout.struct.unpack_from(self.data, self.offset + number * self.layout.size)
+
+    def record(self, number):
+        return self.layout.unpack(self.values(number))
+
+    def key(self, values, field):
+        """The index key of <field> in the record's unpacked <values>."""
+        value = values[field + 1]
+        if field == self.layout.id_index:
+            return _id_key(value)
+        return _email_key(value.rstrip(b'\0').decode('utf-8'))
+
+
+def _build_index(data, offset, slots, hashes, records, field):
+    """
+    Fills the open-addressing table at <offset> with the records' <hashes>, probing linearly from the slot the hash
+    selects. A later record replaces an earlier one with the same key.
+    """
+    mask = slots - 1
+    for number, key_hash in enumerate(hashes):
+        if not key_hash:
+            continue
+        slot = key_hash & mask
+        while True:
+            position = offset + slot * _SLOT.size
+            stored_hash, stored = _SLOT.unpack_from(data, position)
+            if not stored_hash or (stored_hash == key_hash and records.key(records.values(stored - 1), field) ==
+                                   records.key(records.values(number), field)):
+                _SLOT.pack_into(data, position, key_hash, number + 1)
+                break
+            slot = (slot + 1) & mask
+
+
+def _lookup(data, offset, slots, key_hash, records, field, key):
+    """Probes the index at <offset> for <key>, and returns the unpacked values of its record, or None."""
+    mask = slots - 1
+    slot = key_hash & mask
+    while True:
+        stored_hash, stored = _SLOT.unpack_from(data, offset + slot * _SLOT.size)
+        if not stored_hash:
+            return None
+        if stored_hash == key_hash:
+            values = records.values(stored - 1)
+            if records.key(values, field) == key:
+                return values
+        slot = (slot + 1) & mask
+
+
+def _hash(key):
+    """The 8-byte BLAKE2b hash of <key> as an integer, never 0, which marks empty index slots."""
+    return struct.unpack('<Q', hashlib.blake2b(key, digest_size=8).digest())[0] or 1
+
+
+def _id_key(value):
+    return str(int(value)).encode('ascii')
+
+
+def _email_key(value):
+    return value.strip().lower().encode('utf-8')
+
+
+def _truncate(value, width):
+    """<value> as UTF-8, cut to at most <width> bytes without splitting a character."""
+    encoded = str(value).encode('utf-8')
+    if len(encoded) <= width:
+        return encoded
+    return encoded[:width].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def _slot_count(count):
+    """A power of two at least twice <count>, which keeps probe sequences short."""
+    slots = 8
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _map(fileno, write=False):
+    return mmap.mmap(fileno, 0, access=mmap.ACCESS_WRITE if write else mmap.ACCESS_READ)
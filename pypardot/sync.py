@@ -0,0 +1,171 @@
+import inspect
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+from .paging import PAGE_SIZE
+from .util import DATE_FORMAT, write_atomic
+
+# Fields a sync can track changes by: the time records were last updated or created, or their id, for objects whose
+# records never change (e.g. visitor activities).
+WATERMARK_FIELDS = ('updated', 'created', 'id')
+
+
+class IncrementalSync(object):
+    """
+    Reads the records of one object (any accessor with an iter_query method, e.g. client.prospects) that are new or
+    have changed since the previous run, keeping its progress in a checkpoint file at <checkpoint_path>:
+
+        sync = IncrementalSync(p.prospects, '/var/lib/pardot/prospects.sync.json')
+        for prospect in sync:
+            upsert(prospect)
+
+    With <field> 'updated' (the default) or 'created', the checkpoint holds a watermark, the latest updated_at or
+    created_at seen, and each run reads the records updated (or created) after the watermark less <overlap> seconds.
+    The overlap catches records whose timestamps were behind the watermark when the previous run read past them,
+    because of clock skew between Pardot's servers or because they changed while that run was in progress; it
+    should be larger than both. Records read in the overlap that were already delivered, with the same timestamp,
+    are not delivered again. With <field> 'id', each run reads the records with ids above the largest id seen.
+
+    A run reads its window in id order and saves the checkpoint after every page, once the consumer has taken its
+    records, so an interrupted run resumes after the last complete page; records are delivered at least once. The
+    checkpoint is replaced atomically, so it is never left half written. The first run, without a checkpoint, reads
+    every record, or those after <start> (a datetime or Pardot date and time string) if given. <on_checkpoint>, if
+    given, is called before every checkpoint is saved, for the consumer to make what it did with the records
+    delivered so far durable first (e.g. commit a transaction). Extra keyword arguments are passed to every query as
+    criteria. <delivered> and <skipped> count the records delivered and those skipped as already delivered by the
+    last run.
+    """
+
+    def __init__(self, objects, checkpoint_path, field='updated', overlap=300, start=None, on_checkpoint=None,
+                 **criteria):
+        if field not in WATERMARK_FIELDS:
+            raise ValueError('field must be one of {0}, not {1!r}'.format(', '.join(WATERMARK_FIELDS), field))
+        self.objects = objects
+        self.checkpoint_path = checkpoint_path
+        self.field = field
+        self.overlap = overlap
+        self.start = start.strftime(DATE_FORMAT) if isinstance(start, datetime) else start
+        self.on_checkpoint = on_checkpoint
+        self.criteria = criteria
+        self.keyset = 'keyset' in inspect.signature(objects.iter_query).parameters
+        self.delivered = 0
+        self.skipped = 0
+        self.state = None
+
+    @property
+    def watermark(self):
+        """The latest timestamp (or largest id) delivered by a complete run, or None before the first one."""
+        state = self.state if self.state is not None else self._load_checkpoint()
+        return state['watermark']
+
+    def __iter__(self):
+        self.state = self._load_checkpoint()
+        self.delivered = self.skipped = 0
+        if self.state['scan'] is None:
+            self.state['scan'] = self._new_scan()
+        scan = self.state['scan']
+        stamp = self.field + '_at' if self.field != 'id' else 'id'
+
+        for page in self._iter_pages(scan):
+            for record in page:
+                value = record.get(stamp)
+                key = str(record['id'])
+                if self.field != 'id' and value is not None and scan['seen'].get(key) == value:
+                    scan['recent'][key] = value
+                    self.skipped += 1
+                    continue
+                yield record
+                self.delivered += 1
+                if value is not None and (scan['max'] is None or _after(value, scan['max'])):
+                    scan['max'] = value
+                if self.field != 'id' and value is not None:
+                    scan['recent'][key] = value
+            scan['last_id'] = page[-1]['id']
+            scan['offset'] += len(page)
+            self._prune(scan)
+            self._save_checkpoint()
+
+        self.state['watermark'] = scan['max'] if scan['max'] is not None else self.state['watermark']
+        self._prune(scan)
+        self.state['boundary'] = scan['recent']
+        self.state['scan'] = None
+        self.state['runs'] += 1
+        self._save_checkpoint()
+
+    def run(self, handler):
+        """Passes every new or changed record to <handler>, and returns the number of records delivered."""
+        for record in self:
+            handler(record)
+        return self.delivered
+
+    def _new_scan(self):
+        """The window of a new run: after the watermark, less the overlap, and the records already delivered in it."""
+        watermark = self.state['watermark']
+        since = None
+        if self.field == 'id':
+            since = watermark
+        elif watermark is not None:
+            since = (datetime.strptime(watermark, DATE_FORMAT) - timedelta(seconds=self.overlap)).strftime(DATE_FORMAT)
+        elif self.start is not None:
+            since = self.start
+        return {'since': since, 'last_id': None, 'offset': 0, 'max': watermark,
+                'seen': dict(self.state['boundary']), 'recent': {}}
+
+    def _iter_pages(self, scan):
+        """Iterates the pages of the scan's window in id order, from where the scan got to."""
+        criteria = dict(self.criteria)
+        fields = criteria.get('fields')
+        if isinstance(fields, (list, tuple)) and self.field != 'id' and self.field + '_at' not in fields:
+            criteria['fields'] = list(fields) + [self.field + '_at']
+        if self.field == 'id':
+            start_id = scan['last_id'] if scan['last_id'] is not None else scan['since']
+        else:
+            start_id = scan['last_id']
+            if scan['since'] is not None:
+                criteria[self.field + '_after'] = scan['since']
+        if self.keyset:
+            records = self.objects.iter_query(keyset=True, start_id=start_id, **criteria)
+        else:
+            if self.field == 'id' and start_id is not None:
+                criteria['id_greater_than'] = start_id
+            records = self.objects.iter_query(sort_by='id', sort_order='ascending',
+                                              offset=scan['offset'] if self.field != 'id' else 0, **criteria)
+        page = []
+        for record in records:
+            page.append(record)
+            if len(page) == PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _prune(self, scan):
+        """Forgets the delivered records that are too old to be read again by the next run's overlap."""
+        if self.field == 'id' or scan['max'] is None:
+            return
+        horizon = (datetime.strptime(scan['max'], DATE_FORMAT) -
+                   timedelta(seconds=self.overlap)).strftime(DATE_FORMAT)
+        scan['recent'] = dict((key, value) for key, value in scan['recent'].items() if not _after(horizon, value))
+
+    def _load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with io.open(self.checkpoint_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state['field'] != self.field:
+                raise ValueError('{0} is the checkpoint of a sync by {1}'.format(self.checkpoint_path, state['field']))
+            return state
+        return {'field': self.field, 'watermark': None, 'boundary': {}, 'scan': None, 'runs': 0}
+
+    def _save_checkpoint(self):
+        if self.on_checkpoint is not None:
+            self.on_checkpoint()
+        write_atomic(self.checkpoint_path, json.dumps(self.state, indent=2, sort_keys=True))
+
+
+def _after(first, second):
+    """Whether the timestamp (or id) <first> is later than <second>."""
+    if isinstance(first, str):
+        return first > second
+    return int(first) > int(second)
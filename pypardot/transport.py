@@ -0,0 +1,95 @@
+import threading
+import time
+
+import requests
+import requests.adapters
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Connection set-up times of the request the current thread is sending, filled in by the timed connections below.
+_connect_timings = threading.local()
+
+
+class RequestsTransport(object):
+    """
+    Sends PardotAPI's HTTP requests over a pooled requests session, so connections to Pardot are kept alive and
+    reused instead of paying for a new TCP and TLS handshake on every call. <pool_connections> is the number of
+    per-host pools to cache, <pool_maxsize> the maximum number of connections kept open to a single host and
+    <pool_block> whether callers wait for a free connection instead of opening extra, unpooled ones. Set
+    <keep_alive> to False to close the connection after every request.
+
+    A transport is any object with this class's request() and close() methods; request() returns an object with
+    the <status_code>, <headers>, <content> and json() of a requests.Response. See pypardot.fake.FakeTransport for
+    one that answers from an in-process fake Pardot instead of the network. Responses may also have a <timings> dict
+    with the <dns>, <connect>, <tls>, <server> and <transfer> times reported to request hooks (see pypardot.hooks).
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True):
+        self.session = requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                     pool_block=pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        """
+        Sends the request and returns the response, with its <timings>. <timeout> is a number of seconds, a (connect,
+        read) tuple or None, as for requests. Name resolution is timed together with the connection, so <dns> is
+        always None, and <connect> and <tls> are None when a pooled connection was reused.
+        """
+        _connect_timings.connect = _connect_timings.tls = None
+        start = time.time()
+        response = self.session.request(method, url, params=params, data=data, headers=headers, timeout=timeout)
+        total = time.time() - start
+        # requests' <elapsed> runs from sending the request until the headers were parsed, connecting included.
+        headers_received = response.elapsed.total_seconds()
+        server = headers_received - (_connect_timings.connect or 0.0) - (_connect_timings.tls or 0.0)
+        response.timings = {'dns': None, 'connect': _connect_timings.connect, 'tls': _connect_timings.tls,
+                            'server': max(0.0, server), 'transfer': max(0.0, total - headers_received)}
+        return response
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        start = time.time()
+        try:
+            return HTTPConnection._new_conn(self)
+        finally:
+            _connect_timings.connect = time.time() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = time.time()
+        try:
+            return HTTPSConnection._new_conn(self)
+        finally:
+            _connect_timings.connect = time.time() - start
+
+    def connect(self):
+        start = time.time()
+        HTTPSConnection.connect(self)
+        _connect_timings.tls = max(0.0, time.time() - start - (_connect_timings.connect or 0.0))
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter whose connections record how long connecting and the TLS handshake took."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        requests.adapters.HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
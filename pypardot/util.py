@@ -0,0 +1,58 @@
+import calendar
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Format of the dates and times returned by Pardot, in the account's time zone.
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def flatten(record, prefix=''):
+    """Yields the (name, value) pairs of <record>, with nested objects flattened into dotted names (campaign.name)."""
+    for key, value in record.items():
+        if isinstance(value, dict):
+            for item in flatten(value, prefix + key + '.'):
+                yield item
+        else:
+            yield prefix + key, value
+
+
+def is_datetime(value):
+    """Returns True if the string <value> has the form of the dates and times Pardot returns."""
+    return len(value) == 19 and value[4] == '-' and value[7] == '-' and value[10] == ' ' and value[13] == ':'
+
+
+def parse_datetime(value):
+    """Seconds since the epoch of a Pardot date and time, read as UTC; raises ValueError for anything else."""
+    if not isinstance(value, str) or not is_datetime(value):
+        raise ValueError(value)
+    return calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19]), 0, 0, 0))
+
+
+@contextmanager
+def atomic_file(path, mode='wb', encoding=None):
+    """
+    Opens a temporary file in the directory of <path> for the with block, and once the block completes syncs it to
+    disk and moves it over <path>. The file at <path> therefore holds either the old or the new contents, even if the
+    process dies while writing. If the block fails, the temporary file is removed and <path> is left as it was.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with io.open(descriptor, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def write_atomic(path, text):
+    """Replaces the file at <path> with <text> through atomic_file()."""
+    with atomic_file(path, 'w', encoding='utf-8') as f:
+        f.write(text)
@@ -0,0 +1,279 @@
+import csv
+import gzip
+import inspect
+import io
+import json
+import os
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .paging import PAGE_SIZE
+from .util import flatten, is_datetime, parse_datetime, write_atomic
+
+# Column types of an export schema. Dates and times are timestamps in Parquet files and Pardot's strings elsewhere.
+INT = 'int'
+FLOAT = 'float'
+BOOL = 'bool'
+TIMESTAMP = 'timestamp'
+STRING = 'string'
+
+
+class JSONLWriter(object):
+    """Writes flattened records to <path>.jsonl, or <path>.jsonl.gz with <compress>, one JSON object per line."""
+
+    def __init__(self, path, schema, compress=True):
+        self.path = path + ('.jsonl.gz' if compress else '.jsonl')
+        self.columns = [name for name, kind in schema]
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8') if compress else \
+            io.open(self.path, 'w', encoding='utf-8')
+
+    def write(self, row):
+        self.file.write(json.dumps(dict(zip(self.columns, row))) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CSVWriter(object):
+    """
+    Writes flattened records to <path>.csv.gz, or <path>.csv without <compress>, with a header row. Missing values are
+    empty, and lists (e.g. a prospect's visitor activities in full output) are written as JSON.
+    """
+
+    def __init__(self, path, schema, compress=True):
+        self.path = path + ('.csv.gz' if compress else '.csv')
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8', newline='') if compress else \
+            io.open(self.path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, kind in schema])
+
+    def write(self, row):
+        self.writer.writerow(['' if value is None else json.dumps(value) if isinstance(value, list) else value
+                              for value in row])
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(object):
+    """
+    Writes flattened records to <path>.parquet in row groups of <row_group_size> records, typed by the schema. A value
+    that does not fit its column's type is written as null and counted in <invalid_values>. Requires pyarrow.
+    """
+
+    def __init__(self, path, schema, row_group_size=50000, compression='snappy'):
+        if pyarrow is None:
+            raise ImportError('ParquetWriter requires pyarrow, install it with: pip install pyarrow')
+        self.path = path + '.parquet'
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.invalid_values = 0
+        self.arrow_schema = pyarrow.schema([(name, _ARROW_TYPES[kind]()) for name, kind in schema])
+        self.writer = pyarrow.parquet.ParquetWriter(self.path, self.arrow_schema, compression=compression)
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        arrays = []
+        for index, (name, kind) in enumerate(self.schema):
+            values = []
+            for row in self.rows:
+                try:
+                    values.append(_coerce(row[index], kind))
+                except (TypeError, ValueError):
+                    values.append(None)
+                    self.invalid_values += 1
+            arrays.append(pyarrow.array(values, self.arrow_schema.field(name).type))
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.arrow_schema))
+        self.rows = []
+
+
+WRITERS = {'jsonl': JSONLWriter, 'csv': CSVWriter, 'parquet': ParquetWriter}
+
+
+class StreamingExport(object):
+    """
+    Exports every record of one object (any accessor with an iter_query method, e.g. client.prospects) to files in
+    <directory>, in <format> ('jsonl', 'csv' or 'parquet'), streaming the query results so that memory use does not
+    grow with the export:
+
+        export = StreamingExport(p.prospects, '/data/pardot', format='parquet', output='bulk')
+        paths = export.run()
+
+    Records are flattened into dotted column names (e.g. campaign.name). The schema is the columns of the first
+    <sample_size> records, in the order they were first seen, with their types, unless <columns> gives the column
+    names (or a list of (name, type) pairs); it stays the same for the whole export, including after a resume.
+    Columns missing from a record are written as null, and columns outside the schema are left out and listed in
+    <unknown_columns>.
+
+    The files are parts of <part_size> records each, named <name>-00000.<extension> and so on, where <name> defaults
+    to the object's name. After every part, a checkpoint (<name>.checkpoint.json) records the parts written and
+    where the query got to. If the export is interrupted, running it again resumes after the last complete part;
+    once it has completed, run() returns its parts straight away. Extra keyword arguments are passed to every query
+    as criteria, and <options> to the writer (e.g. compress=False, row_group_size=10000).
+    """
+
+    def __init__(self, objects, directory, format='jsonl', name=None, columns=None, part_size=100000,
+                 sample_size=PAGE_SIZE, options=None, **criteria):
+        if format not in WRITERS:
+            raise ValueError('format must be one of {0}, not {1!r}'.format(', '.join(sorted(WRITERS)), format))
+        self.objects = objects
+        self.directory = directory
+        self.format = format
+        self.name = name or type(objects).__name__.lower()
+        self.columns = columns
+        self.part_size = part_size
+        self.sample_size = sample_size
+        self.options = options or {}
+        self.criteria = criteria
+        self.keyset = 'keyset' in inspect.signature(objects.iter_query).parameters
+        self.checkpoint_path = os.path.join(directory, self.name + '.checkpoint.json')
+        self.unknown_columns = set()
+        self.state = None
+
+    @property
+    def records(self):
+        """Number of records in the complete parts."""
+        return self.state['records'] if self.state else 0
+
+    def run(self):
+        """Runs or resumes the export, and returns the paths of its parts."""
+        self.state = self._load_checkpoint()
+        if self.state['format'] != self.format:
+            raise ValueError('{0} is the checkpoint of a {1} export'.format(self.checkpoint_path, self.state['format']))
+        if self.state['done']:
+            return list(self.state['parts'])
+        records = self._iter_remaining()
+        sample = []
+        if self.state['schema'] is None:
+            for record in records:
+                sample.append(dict(flatten(record)))
+                if len(sample) >= self.sample_size:
+                    break
+            self.state['schema'] = _schema(sample, self.columns)
+        columns = [name for name, kind in self.state['schema']]
+        known = set(columns)
+        writer = None
+        count = 0
+        last_id = self.state['last_id']
+        for flat in _chain(sample, (dict(flatten(record)) for record in records)):
+            if writer is None:
+                writer = self._open_part()
+            self.unknown_columns.update(key for key in flat if key not in known)
+            writer.write([flat.get(name) for name in columns])
+            count += 1
+            last_id = flat.get('id', last_id)
+            if count == self.part_size:
+                self._close_part(writer, count, last_id)
+                writer, count = None, 0
+        if writer is not None:
+            self._close_part(writer, count, last_id)
+        self.state['done'] = True
+        self._save_checkpoint()
+        return list(self.state['parts'])
+
+    def _iter_remaining(self):
+        """Iterates the records after the last complete part, in id order."""
+        if self.keyset:
+            return self.objects.iter_query(keyset=True, start_id=self.state['last_id'], **self.criteria)
+        return self.objects.iter_query(sort_by='id', sort_order='ascending', offset=self.state['records'],
+                                       **self.criteria)
+
+    def _open_part(self):
+        path = os.path.join(self.directory, '{0}-{1:05d}'.format(self.name, len(self.state['parts'])))
+        return WRITERS[self.format](path, self.state['schema'], **self.options)
+
+    def _close_part(self, writer, count, last_id):
+        writer.close()
+        self.state['parts'].append(writer.path)
+        self.state['records'] += count
+        self.state['last_id'] = last_id
+        self._save_checkpoint()
+
+    def _load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with io.open(self.checkpoint_path, encoding='utf-8') as f:
+                state = json.load(f)
+            state['schema'] = [tuple(column) for column in state['schema']] if state['schema'] else None
+            return state
+        return {'format': self.format, 'schema': None, 'parts': [], 'records': 0, 'last_id': None, 'done': False}
+
+    def _save_checkpoint(self):
+        write_atomic(self.checkpoint_path, json.dumps(self.state, indent=2))
+
+
+def _chain(first, rest):
+    for item in first:
+        yield item
+    for item in rest:
+        yield item
+
+
+def _schema(sample, columns=None):
+    """The (name, type) pairs of <columns>, or of every column in the <sample> records, with types from the sample."""
+    if columns is not None and all(isinstance(column, (tuple, list)) for column in columns):
+        return [tuple(column) for column in columns]
+    names = list(columns) if columns is not None else []
+    if columns is None:
+        seen = set()
+        for flat in sample:
+            for key in flat:
+                if key not in seen:
+                    seen.add(key)
+                    names.append(key)
+    return [(name, _kind([flat.get(name) for flat in sample])) for name in names]
+
+
+def _kind(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return STRING
+    if all(isinstance(value, bool) for value in values):
+        return BOOL
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return INT
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return FLOAT
+    if all(isinstance(value, str) and is_datetime(value) for value in values):
+        return TIMESTAMP
+    return STRING
+
+
+def _coerce(value, kind):
+    """Converts <value> to the Python value pyarrow expects for a column of <kind>, raising ValueError if it can't."""
+    if value is None:
+        return None
+    if kind == STRING:
+        return json.dumps(value) if isinstance(value, (list, dict)) else str(value)
+    if isinstance(value, (list, dict)):
+        raise ValueError(value)
+    if kind == INT:
+        return int(value)
+    if kind == FLOAT:
+        return float(value)
+    if kind == BOOL:
+        if isinstance(value, str):
+            if value.lower() not in ('true', 'false', '1', '0'):
+                raise ValueError(value)
+            return value.lower() in ('true', '1')
+        return bool(value)
+    return parse_datetime(value)
+
+
+if pyarrow is not None:
+    _ARROW_TYPES = {INT: pyarrow.int64, FLOAT: pyarrow.float64, BOOL: pyarrow.bool_,
+                    TIMESTAMP: lambda: pyarrow.timestamp('s'), STRING: pyarrow.string}
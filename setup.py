@@ -12,4 +12,9 @@ setup(
     url="https://github.com/ryoung-mbo/PyPardot",
     packages=['pypardot', 'pypardot.objects'],
     install_requires=['requests'],
+    extras_require={
+        'async': ['aiohttp'],
+        'columnar': ['numpy', 'pandas', 'pyarrow'],
+        'parquet': ['pyarrow'],
+    },
 )